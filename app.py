@@ -1,23 +1,198 @@
-import pyttsx3
-import speech_recognition as sr
-import datetime
-import pyjokes
 import time as time_module
+
+STARTUP_STARTED = time_module.perf_counter()
+
+import datetime
 import json
 import os
+import sys
 import threading
 import subprocess
 import platform
-import psutil
 import random
 import math
+import re
+import ast
+import argparse
+import functools
+import importlib
+import importlib.util
+import contextlib
+import heapq
+import itertools
+import queue
+import collections
+import bisect
+import hashlib
+import shutil
+import shlex
+import signal
+import wave
+import array
+
+# Startup timing, printed with --startup-report
+startup_timings = {}
+startup_report = False
+first_listen = None
+
+@contextlib.contextmanager
+def timed_startup(label):
+    start = time_module.perf_counter()
+    try:
+        yield
+    finally:
+        startup_timings[label] = time_module.perf_counter() - start
+
+# Per-turn latency tracing, enabled with --trace or VIRUS_TRACE
+TRACE_BUCKETS = [0.0001 * 2 ** (i / 4) for i in range(96)]  # 0.1 ms up to about 25 minutes, 19% apart
+
+class Tracer:
+    """Times pipeline stages into per-stage histograms and optional JSON lines"""
+
+    def __init__(self):
+        self.enabled = False
+        self.turn = 0
+        self.stages = {}
+        self.export = None
+        self._lock = threading.Lock()
+        self._off = contextlib.nullcontext()
+
+    def enable(self, path=None):
+        """Start collecting spans, appending each one to path when given"""
+        if path:
+            self.export = open(path, 'a', encoding='utf-8', buffering=1)
+        self.enabled = True
+
+    def begin_turn(self):
+        if self.enabled:
+            self.turn += 1
+
+    def span(self, stage, **fields):
+        """Context manager timing one stage; a shared no-op when tracing is off"""
+        if not self.enabled:
+            return self._off
+        return self._span(stage, fields)
+
+    @contextlib.contextmanager
+    def _span(self, stage, fields):
+        turn = self.turn
+        start = time_module.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time_module.perf_counter() - start, turn, **fields)
+
+    def record(self, stage, seconds, turn=None, **fields):
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = {"count": 0, "total": 0.0, "max": 0.0,
+                                                  "buckets": [0] * (len(TRACE_BUCKETS) + 1)}
+            histogram["count"] += 1
+            histogram["total"] += seconds
+            histogram["max"] = max(histogram["max"], seconds)
+            histogram["buckets"][bisect.bisect_left(TRACE_BUCKETS, seconds)] += 1
+            if self.export is not None:
+                span = {"turn": self.turn if turn is None else turn, "stage": stage,
+                        "at": round(time_module.time(), 3), "ms": round(seconds * 1000, 3)}
+                span.update(fields)
+                self.export.write(json.dumps(span) + "\n")
+
+    def load(self, path):
+        """Rebuild the histograms from a JSON lines export"""
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    span = json.loads(line)
+                except ValueError:
+                    continue
+                self.record(span["stage"], span["ms"] / 1000, span.get("turn"))
+        return self
+
+    def percentile(self, stage, fraction):
+        """Upper bound of the histogram bucket holding the given fraction of spans"""
+        histogram = self.stages[stage]
+        target = fraction * histogram["count"]
+        seen = 0
+        for i, count in enumerate(histogram["buckets"]):
+            seen += count
+            if count and seen >= target:
+                return min(TRACE_BUCKETS[i], histogram["max"]) if i < len(TRACE_BUCKETS) else histogram["max"]
+        return histogram["max"]
+
+    def report(self):
+        """Per-stage table of counts and latencies, slowest stage first"""
+        lines = [f"{'stage':<14} {'count':>6} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}"]
+        with self._lock:
+            stages = sorted(self.stages.items(), key=lambda item: -item[1]["total"])
+            for stage, histogram in stages:
+                lines.append(f"{stage:<14} {histogram['count']:>6} "
+                             f"{histogram['total'] / histogram['count'] * 1000:>9.1f} "
+                             f"{self.percentile(stage, 0.5) * 1000:>9.1f} "
+                             f"{self.percentile(stage, 0.95) * 1000:>9.1f} "
+                             f"{histogram['max'] * 1000:>9.1f}")
+        return "\n".join(lines)
+
+tracer = Tracer()
+if os.environ.get("VIRUS_TRACE"):
+    tracer.enable(None if os.environ["VIRUS_TRACE"] == "1" else os.environ["VIRUS_TRACE"])
+
+class LazyModule:
+    """Module proxy that imports the module on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            with timed_startup(f"import {self._name}"):
+                self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+def optional_module(name):
+    """Lazy proxy for an optional dependency, or None when it is not installed"""
+    return LazyModule(name) if importlib.util.find_spec(name) is not None else None
+
+class LazyObject:
+    """Proxy that builds its target with a factory on first attribute access"""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._target = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr):
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    self._target = self._factory()
+        return getattr(self._target, attr)
+
+pyttsx3 = LazyModule("pyttsx3")
+sr = LazyModule("speech_recognition")
+pyjokes = LazyModule("pyjokes")
+psutil = LazyModule("psutil")
+# Standard modules only some code paths need; asyncio alone costs about 57 ms to import
+sqlite3 = LazyModule("sqlite3")
+asyncio = LazyModule("asyncio")
+multiprocessing = LazyModule("multiprocessing")
+concurrent_futures = LazyModule("concurrent.futures")
+np = optional_module("numpy")
+resource = optional_module("resource")  # POSIX only
 
-# Initialize TTS engine once
-engine = pyttsx3.init()
-voices = engine.getProperty('voices')
-engine.setProperty('voice', voices[1].id if len(voices) > 1 else voices[0].id)
-engine.setProperty('rate', 165)
-engine.setProperty('volume', 1.0)
+def init_engine():
+    """Initialize the TTS engine"""
+    with timed_startup("tts engine init"):
+        tts = pyttsx3.init()
+        voices = tts.getProperty('voices')
+        tts.setProperty('voice', voices[1].id if len(voices) > 1 else voices[0].id)
+        tts.setProperty('rate', 165)
+        tts.setProperty('volume', 1.0)
+    return tts
+
+# Created on first use, normally on the speech worker thread
+engine = LazyObject(init_engine)
 
 # File paths for data storage
 REMINDERS_FILE = "virus_reminders.json"
@@ -25,59 +200,1534 @@ ALARMS_FILE = "virus_alarms.json"
 NOTES_FILE = "virus_notes.txt"
 CONTACTS_FILE = "virus_contacts.json"
 TODO_FILE = "virus_todo.json"
+MEETINGS_FILE = "virus_meetings.json"
+DATABASE_FILE = "virus.db"
+
+# "json" keeps the journaled JSON files, "sqlite" uses DATABASE_FILE
+STORAGE_BACKEND = os.environ.get("VIRUS_STORAGE", "json")
+LIST_PAGE_SIZE = 25
+
+# Server clients that name a user get their own copy of every data file here
+USERS_DIR = os.environ.get("VIRUS_USERS_DIR", "virus_users")
+
+# The client session a thread is serving, if any
+session_state = threading.local()
+# Held while shared collections, journals and timers are changed. Never take
+# init_lock while holding it: lazy initializers load collections under init_lock.
+data_lock = threading.RLock()
+
+def current_session():
+    return getattr(session_state, "session", None)
+
+def current_batch():
+    """The chained command whose writes and replies this thread is holding back, if any"""
+    return getattr(session_state, "batch", None)
+
+def current_user():
+    """Name of the user whose data the current thread works on; None for the local user"""
+    session = getattr(session_state, "session", None)
+    return session.user if session is not None else None
+
+def user_path(filename, user=None):
+    """Path of a data file in the current user's namespace"""
+    user = user or current_user()
+    if user is None:
+        return filename
+    directory = os.path.join(USERS_DIR, user)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, filename)
+
+def run_in_session(session, func, *args):
+    """Call func with replies and data routed to session's client"""
+    previous = getattr(session_state, "session", None)
+    session_state.session = session
+    try:
+        return func(*args)
+    finally:
+        session_state.session = previous
+
+# Records
+# Reminders, todos and alarms are slotted objects in memory, with times as
+# epoch seconds. They become JSON dicts or SQLite rows only when stored.
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M"
+NO_TIME = 2 ** 62  # sorts after every real time in a time column
+
+def to_epoch(value):
+    """Epoch seconds from a stored time: an int, or a "%Y-%m-%d %H:%M" string from older files"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(datetime.datetime.fromisoformat(value).timestamp())
+    except ValueError:
+        return None
+
+def format_epoch(seconds):
+    return None if seconds is None else datetime.datetime.fromtimestamp(seconds).strftime(TIMESTAMP_FORMAT)
+
+def now_epoch():
+    """The current minute in epoch seconds, matching the minute resolution of older files"""
+    now = int(time_module.time())
+    return now - now % 60
+
+class Record:
+    """Base for the slotted record types; subclasses list their fields in __slots__"""
+    __slots__ = ()
+    TIMES = ()  # fields holding epoch seconds
+    DEFAULTS = {}
+    OPEN = "completed"  # flag field; a record is open while it is false (or true, for "active")
+    SORT_TIME = None  # field used as the time column of a RecordList
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name, self.DEFAULTS.get(name)))
+
+    @classmethod
+    def from_json(cls, value):
+        record = cls.__new__(cls)
+        for name in cls.__slots__:
+            field = value.get(name, cls.DEFAULTS.get(name))
+            setattr(record, name, to_epoch(field) if name in cls.TIMES else field)
+        return record
+
+    def to_json(self):
+        return {name: value for name in self.__slots__ if (value := getattr(self, name)) is not None}
+
+    def to_row(self):
+        """Column values for SQLite, which keeps times as text"""
+        return {name: format_epoch(value) if name in self.TIMES else value
+                for name in self.__slots__ if (value := getattr(self, name)) is not None}
+
+    def update(self, changes):
+        for name, value in changes.items():
+            setattr(self, name, to_epoch(value) if name in self.TIMES else value)
+
+    def is_open(self):
+        flag = getattr(self, self.OPEN)
+        return not flag if self.OPEN == "completed" else bool(flag)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_json()})"
+
+class Reminder(Record):
+    __slots__ = ("id", "text", "time", "created", "completed")
+    TIMES = ("time", "created")
+    DEFAULTS = {"completed": False}
+    SORT_TIME = "time"
+
+class Todo(Record):
+    __slots__ = ("id", "task", "created", "completed", "priority", "due")
+    TIMES = ("created", "due")
+    DEFAULTS = {"completed": False, "priority": 2}
+    SORT_TIME = "due"
+
+class Alarm(Record):
+    __slots__ = ("id", "time", "label", "active")  # time is the HH:MM it rings at each day
+    DEFAULTS = {"active": True}
+    OPEN = "active"
+
+class RecordList:
+    """A list of records with columns of their open flags and times for bulk scans.
+
+    Filters such as "open only" and "due before" run over a bytearray and an
+    int64 array instead of touching every record object. next_id is one past
+    the highest id ever stored, deleted records included; snapshots keep it.
+    """
+
+    def __init__(self, kind, records=(), next_id=1):
+        self.kind = kind
+        self.records = []
+        self.open = bytearray()
+        self.times = array.array('q')
+        self.next_id = next_id
+        for record in records:
+            self.append(record)
+
+    def _columns(self, record):
+        time_value = getattr(record, self.kind.SORT_TIME) if self.kind.SORT_TIME else None
+        return record.is_open(), NO_TIME if time_value is None else time_value
+
+    def append(self, record):
+        if not isinstance(record, Record):
+            record = self.kind.from_json(record)
+        is_open, time_value = self._columns(record)
+        if getattr(record, "id", None) is not None:
+            self.next_id = max(self.next_id, record.id + 1)
+        self.records.append(record)
+        self.open.append(is_open)
+        self.times.append(time_value)
+
+    def update(self, index, changes):
+        record = self.records[index]
+        record.update(changes)
+        self.open[index], self.times[index] = self._columns(record)
+
+    def __delitem__(self, index):
+        del self.records[index]
+        del self.open[index]
+        del self.times[index]
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def count_open(self):
+        return self.open.count(1)
+
+    def open_records(self, offset=0, limit=None):
+        """Open records in list order, skipping offset of them"""
+        found = itertools.compress(self.records, self.open)
+        return list(itertools.islice(found, offset, None if limit is None else offset + limit))
+
+    def due_before(self, moment):
+        """Open records whose time column is earlier than moment (epoch seconds)"""
+        if np is not None and self.records:
+            times = np.frombuffer(self.times, dtype=np.int64)
+            hits = (times < moment) & np.frombuffer(self.open, dtype=np.bool_)
+            return list(itertools.compress(self.records, hits.tobytes()))
+        return [record for record, is_open, time_value in zip(self.records, self.open, self.times)
+                if is_open and time_value < moment]
+
+    def to_json(self):
+        return [record.to_json() for record in self.records]
+
+def encode_record(value):
+    """json.dumps default for records and record lists"""
+    if isinstance(value, (Record, RecordList)):
+        return value.to_json()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+RECORD_FILES = {REMINDERS_FILE: Reminder, TODO_FILE: Todo, ALARMS_FILE: Alarm}
+RECORD_TABLES = {"reminders": Reminder, "todos": Todo, "alarms": Alarm}
+
+# Data storage
+# Each collection is a JSON snapshot plus an append-only journal of changes
+# made since the snapshot. Snapshots written by older versions are plain JSON
+# and are read as-is.
+JOURNAL_SUFFIX = ".journal"
+JOURNAL_COMPACT_MIN = 1000
+SNAPSHOT_VERSION = 1
+
+journals = {}
+
+def empty_data(filename):
+    return [] if os.path.basename(filename) != CONTACTS_FILE else {}
+
+def apply_journal_entry(data, entry):
+    """Apply one journal entry to an in-memory collection"""
+    op = entry["op"]
+    if op == "append":
+        data.append(entry["value"])
+    elif op == "set":
+        data[entry["key"]] = entry["value"]
+    elif op == "update":
+        if isinstance(data, RecordList):
+            data.update(entry["key"], entry["value"])
+        else:
+            data[entry["key"]].update(entry["value"])
+    elif op == "delete":
+        del data[entry["key"]]
 
-# Initialize data storage
 def load_data(filename):
+    """Load a snapshot and replay its journal"""
+    data, seq, next_id = empty_data(filename), 0, 1
     if os.path.exists(filename):
         try:
             with open(filename, 'r') as f:
-                return json.load(f)
+                snapshot = json.load(f)
+            if isinstance(snapshot, dict) and snapshot.get("version") == SNAPSHOT_VERSION and "data" in snapshot:
+                data, seq, next_id = snapshot["data"], snapshot["seq"], snapshot.get("next_id", 1)
+            else:
+                data = snapshot
         except:
-            return [] if filename != CONTACTS_FILE else {}
-    return [] if filename != CONTACTS_FILE else {}
+            data = empty_data(filename)
+    kind = RECORD_FILES.get(os.path.basename(filename))
+    if kind is not None:
+        data = RecordList(kind, data, next_id)
+    replayed = 0
+    if os.path.exists(filename + JOURNAL_SUFFIX):
+        good = 0  # bytes up to the end of the last complete line
+        with open(filename + JOURNAL_SUFFIX, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("line has no end")
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # torn write from a crash; everything after it is lost anyway
+                good += len(line)
+                # Entries up to the snapshot's seq were already compacted into it
+                if entry["seq"] <= seq:
+                    continue
+                apply_journal_entry(data, entry)
+                seq = entry["seq"]
+                replayed += 1
+        # Cut the torn tail off, or the next append would be glued onto it and lost with it
+        if good < os.path.getsize(filename + JOURNAL_SUFFIX):
+            os.truncate(filename + JOURNAL_SUFFIX, good)
+    journals[filename] = {"seq": seq, "entries": replayed}
+    return data
+
+class LazyCollection:
+    """Proxy for the current user's copy of a data file, loaded on first use"""
+
+    def __init__(self, filename, loader=load_data):
+        self.filename = filename
+        self.loader = loader
+        self._data = {}
+
+    @property
+    def path(self):
+        return user_path(self.filename)
+
+    @property
+    def data(self):
+        user = current_user()
+        data = self._data.get(user)
+        if data is None:
+            with data_lock:
+                data = self._data.get(user)
+                if data is None:
+                    with timed_startup(f"load {self.filename}"):
+                        data = self._data[user] = self.loader(self.path)
+        return data
+
+    def __getattr__(self, attr):
+        return getattr(self.data, attr)
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __bool__(self):
+        return bool(self.data)
+
+    def __contains__(self, item):
+        return item in self.data
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+
+    def __delitem__(self, key):
+        del self.data[key]
+
+    def __repr__(self):
+        return repr(self.data)
 
 def save_data(filename, data):
-    with open(filename, 'w') as f:
-        json.dump(data, f, indent=2)
+    """Write a full snapshot atomically and start a fresh journal"""
+    if isinstance(data, LazyCollection):
+        filename, data = data.path, data.data
+    with data_lock:
+        state = journals.setdefault(filename, {"seq": 0, "entries": 0})
+        # The snapshot already holds any changes still waiting for a journal flush
+        pending_journal.pop(filename, None)
+        temp = filename + ".tmp"
+        with tracer.span("save_data", file=filename):
+            snapshot = {"version": SNAPSHOT_VERSION, "seq": state["seq"], "data": data}
+            if isinstance(data, RecordList):
+                # Ids of deleted records are not handed out again, so the counter outlives them
+                snapshot["next_id"] = data.next_id
+            with open(temp, 'w') as f:
+                json.dump(snapshot, f, indent=2, default=encode_record)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp, filename)
+        if os.path.exists(filename + JOURNAL_SUFFIX):
+            os.remove(filename + JOURNAL_SUFFIX)
+        state["entries"] = 0
+
+# Journal lines applied in memory but not yet on disk, in seq order per file
+pending_journal = {}
+
+def write_journal(filename, data, entry):
+    """Apply a change in memory, append it to the journal and compact when it grows.
+
+    Inside a chained command the line is held back and written with the
+    command's other changes in one flush.
+    """
+    if isinstance(data, LazyCollection):
+        filename, data = data.path, data.data
+    with data_lock:
+        if filename not in journals:
+            load_data(filename)
+        state = journals[filename]
+        apply_journal_entry(data, entry)
+        state["seq"] += 1
+        entry["seq"] = state["seq"]
+        pending_journal.setdefault(filename, []).append(json.dumps(entry, default=encode_record) + "\n")
+        batch = current_batch()
+        if batch is not None:
+            batch.journals[filename] = data
+            return
+        flush_journal(filename, data)
+
+def flush_journal(filename, data):
+    """Write every pending line of a journal with a single fsync"""
+    with data_lock:
+        # Anything held back by a chained command goes first, keeping the file in seq order
+        lines = pending_journal.pop(filename, None)
+        if not lines:
+            return
+        state = journals[filename]
+        with tracer.span("journal", file=filename), open(filename + JOURNAL_SUFFIX, 'a', encoding='utf-8') as f:
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+        state["entries"] += len(lines)
+        # Compacting only once the journal outgrows the data keeps writes O(1) amortized
+        if state["entries"] >= max(JOURNAL_COMPACT_MIN, len(data)):
+            save_data(filename, data)
+
+def append_record(filename, data, value):
+    write_journal(filename, data, {"op": "append", "value": value})
+
+def set_record(filename, data, key, value):
+    write_journal(filename, data, {"op": "set", "key": key, "value": value})
+
+def update_record(filename, data, key, **changes):
+    write_journal(filename, data, {"op": "update", "key": key, "value": changes})
+
+def delete_record(filename, data, key):
+    write_journal(filename, data, {"op": "delete", "key": key})
+
+class SQLiteStore:
+    """Indexed SQLite storage for reminders, todos, alarms, contacts and meetings"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS reminders (
+            id INTEGER PRIMARY KEY, text TEXT NOT NULL, time TEXT, created TEXT, completed INTEGER NOT NULL DEFAULT 0);
+        CREATE INDEX IF NOT EXISTS idx_reminders_active ON reminders (completed, time);
+        CREATE TABLE IF NOT EXISTS todos (
+            id INTEGER PRIMARY KEY, task TEXT NOT NULL, created TEXT, completed INTEGER NOT NULL DEFAULT 0,
+            priority INTEGER NOT NULL DEFAULT 2, due TEXT);
+        CREATE INDEX IF NOT EXISTS idx_todos_active ON todos (completed, id);
+        CREATE TABLE IF NOT EXISTS alarms (
+            id INTEGER PRIMARY KEY, time TEXT NOT NULL, label TEXT, active INTEGER NOT NULL DEFAULT 1);
+        CREATE INDEX IF NOT EXISTS idx_alarms_active ON alarms (active);
+        CREATE TABLE IF NOT EXISTS contacts (name TEXT PRIMARY KEY, number TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS meetings (
+            id INTEGER PRIMARY KEY, title TEXT NOT NULL, time TEXT, end_time TEXT, created TEXT);
+        CREATE INDEX IF NOT EXISTS idx_meetings_time ON meetings (time);
+    """
+
+    COLUMNS = {
+        "reminders": ("text", "time", "created", "completed"),
+        "todos": ("task", "created", "completed", "priority", "due"),
+        "alarms": ("time", "label", "active"),
+        "meetings": ("title", "time", "end_time", "created"),
+    }
+    FLAGS = ("completed", "active")
+    # Columns added after the first release, for databases created before them
+    ADDED_COLUMNS = (("meetings", "end_time", "TEXT"), ("todos", "priority", "INTEGER NOT NULL DEFAULT 2"),
+                     ("todos", "due", "TEXT"))
+    # Indexes over added columns, created once those columns exist
+    ADDED_INDEXES = ("CREATE INDEX IF NOT EXISTS idx_todos_due ON todos (completed, due)",)
+
+    def __init__(self, path=DATABASE_FILE):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+        self._depth = 0
+        with self.transaction():
+            self.conn.executescript(self.SCHEMA)
+            for table, column, kind in self.ADDED_COLUMNS:
+                if column not in [row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")]:
+                    self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+            for statement in self.ADDED_INDEXES:
+                self.conn.execute(statement)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Commit everything done inside the block at once, or nothing on error.
+
+        Nested blocks join the outermost transaction.
+        """
+        with self.lock:
+            if self._depth:
+                self._depth += 1
+                try:
+                    yield self.conn
+                finally:
+                    self._depth -= 1
+                return
+            batch = current_batch()
+            if batch is not None:
+                # Left open for the chained command to commit with its other changes
+                batch.stores.add(self)
+                self._depth = 1
+                try:
+                    yield self.conn
+                finally:
+                    self._depth = 0
+                return
+            self._depth = 1
+            try:
+                with self.conn:
+                    yield self.conn
+            finally:
+                self._depth = 0
+
+    def commit(self):
+        with self.lock:
+            self.conn.commit()
+
+    def _record(self, row, table=None):
+        record = dict(row)
+        for flag in self.FLAGS:
+            if flag in record:
+                record[flag] = bool(record[flag])
+        kind = RECORD_TABLES.get(table)
+        return kind.from_json(record) if kind is not None else record
+
+    def add(self, table, record, keep_id=False):
+        """Insert a record and return its id; keep_id inserts under the id the record already has.
+
+        New ids come from a counter in meta rather than SQLite's highest id plus
+        one, so the id of a deleted task is never given to the next one.
+        """
+        if isinstance(record, Record):
+            record = record.to_row()
+        counter = f"next_id_{table}"
+        with self.transaction() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (counter,)).fetchone()
+            next_id = int(row[0]) if row else 1
+            if not keep_id:
+                highest = conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0] or 0
+                record = dict(record, id=max(next_id, highest + 1))
+            columns = [c for c in ("id",) + self.COLUMNS[table] if c in record]
+            cursor = conn.execute(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                [record[c] for c in columns])
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                         (counter, max(next_id, cursor.lastrowid + 1)))
+            return cursor.lastrowid
 
-reminders = load_data(REMINDERS_FILE)
-alarms = load_data(ALARMS_FILE)
-contacts = load_data(CONTACTS_FILE)
-todos = load_data(TODO_FILE)
+    def update(self, table, record_id, **changes):
+        kind = RECORD_TABLES.get(table)
+        if kind is not None:
+            changes = {c: format_epoch(v) if c in kind.TIMES else v for c, v in changes.items()}
+        with self.transaction() as conn:
+            conn.execute(f"UPDATE {table} SET {', '.join(f'{c} = ?' for c in changes)} WHERE id = ?",
+                         [*changes.values(), record_id])
+
+    def delete(self, table, record_id):
+        with self.transaction() as conn:
+            conn.execute(f"DELETE FROM {table} WHERE id = ?", (record_id,))
+
+    def active(self, table, limit=LIST_PAGE_SIZE, offset=0):
+        """One page of records that are not completed, oldest first"""
+        order = "time, id" if table == "reminders" else "id"
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT * FROM {table} WHERE completed = 0 ORDER BY {order} LIMIT ? OFFSET ?", (limit, offset))
+            return [self._record(row, table) for row in rows]
+
+    def count_active(self, table):
+        with self.lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM {table} WHERE completed = 0").fetchone()[0]
+
+    def active_alarms(self):
+        with self.lock:
+            return [self._record(row, "alarms") for row in self.conn.execute("SELECT * FROM alarms WHERE active = 1")]
+
+    def set_contact(self, name, number):
+        with self.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO contacts (name, number) VALUES (?, ?)", (name, number))
+
+    def get_contact(self, name):
+        with self.lock:
+            row = self.conn.execute("SELECT number FROM contacts WHERE name = ?", (name,)).fetchone()
+            return row[0] if row else None
+
+    def contacts(self, limit=LIST_PAGE_SIZE, offset=0):
+        with self.lock:
+            rows = self.conn.execute("SELECT name, number FROM contacts ORDER BY name LIMIT ? OFFSET ?", (limit, offset))
+            return [(row[0], row[1]) for row in rows]
+
+    def count_contacts(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+
+    def meetings(self):
+        with self.lock:
+            return [self._record(row) for row in self.conn.execute("SELECT * FROM meetings ORDER BY time, id")]
+
+    def import_json(self, directory=""):
+        """One-shot import of the JSON data files in directory; later calls do nothing"""
+        with self.transaction() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'json_imported'").fetchone():
+                return False
+            for table, filename in (("reminders", REMINDERS_FILE), ("todos", TODO_FILE),
+                                    ("alarms", ALARMS_FILE), ("meetings", MEETINGS_FILE)):
+                for record in load_data(os.path.join(directory, filename)):
+                    # Ids are what users say back ("complete task 3"), so they must not change
+                    self.add(table, record, keep_id=True)
+            for name, number in load_data(os.path.join(directory, CONTACTS_FILE)).items():
+                self.set_contact(name, number)
+            conn.execute("INSERT INTO meta (key, value) VALUES ('json_imported', ?)",
+                         (datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),))
+            return True
+
+def open_store(path):
+    """Open a user's database, importing the JSON files beside it the first time"""
+    opened = SQLiteStore(path)
+    opened.import_json(os.path.dirname(path))
+    return opened
+
+store = None
+if STORAGE_BACKEND == "sqlite":
+    store = LazyCollection(DATABASE_FILE, open_store)
+    # Only active alarms are kept in memory; everything else is queried on demand
+    reminders, contacts, todos, meetings = [], {}, [], []
+    alarms = LazyCollection(ALARMS_FILE, lambda path: store.active_alarms())
+else:
+    reminders = LazyCollection(REMINDERS_FILE)
+    alarms = LazyCollection(ALARMS_FILE)
+    contacts = LazyCollection(CONTACTS_FILE)
+    todos = LazyCollection(TODO_FILE)
+    meetings = LazyCollection(MEETINGS_FILE)
 timers = []
+alarm_jobs = {}
+
+# Speech capture
+LISTEN_TIMEOUT = 5
+PHRASE_TIME_LIMIT = 10
+
+RECOGNITION_BACKEND = os.environ.get("VIRUS_RECOGNIZER", "google")
+VOSK_MODEL_PATH = os.environ.get("VIRUS_VOSK_MODEL", "model")
+
+class GoogleBackend:
+    """Google Web Speech recognition; needs a network round-trip per utterance"""
+    name = "google"
+    streaming = False
+
+    def __init__(self, recognizer=None):
+        self.recognizer = recognizer or sr.Recognizer()
+
+    def recognize(self, audio):
+        return self.recognizer.recognize_google(audio)
+
+class VoskBackend:
+    """Offline Vosk recognition that reports partial hypotheses while the user speaks"""
+    name = "vosk"
+    streaming = True
+
+    def __init__(self, model_path=VOSK_MODEL_PATH):
+        try:
+            import vosk
+        except ImportError:
+            raise RuntimeError("Offline recognition needs the vosk package: pip install vosk")
+        if not os.path.isdir(model_path):
+            raise RuntimeError(f"Vosk model not found at {model_path}; set VIRUS_VOSK_MODEL")
+        vosk.SetLogLevel(-1)
+        self.vosk = vosk
+        self.model = vosk.Model(model_path)
+        self.last_result_latency = None
+
+    def recognize(self, audio):
+        recognizer = self.vosk.KaldiRecognizer(self.model, 16000)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=16000, convert_width=2))
+        text = json.loads(recognizer.FinalResult()).get("text", "")
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+    def stream(self, source, on_partial=None):
+        """Read raw chunks from an open source until Vosk detects the end of an utterance.
+
+        Returns the final text, "" for an utterance with no words, or None
+        once the source is exhausted.
+        """
+        if source.SAMPLE_WIDTH != 2:
+            raise ValueError("Vosk needs 16-bit audio")
+        recognizer = self.vosk.KaldiRecognizer(self.model, source.SAMPLE_RATE)
+        last_partial = ""
+        while True:
+            chunk = source.stream.read(source.CHUNK)
+            fed = time_module.perf_counter()
+            if not chunk:
+                text = json.loads(recognizer.FinalResult()).get("text", "")
+                self.last_result_latency = time_module.perf_counter() - fed
+                return text or None
+            if recognizer.AcceptWaveform(chunk):
+                text = json.loads(recognizer.Result()).get("text", "")
+                self.last_result_latency = time_module.perf_counter() - fed
+                if text:
+                    return text
+            elif on_partial:
+                partial = json.loads(recognizer.PartialResult()).get("partial", "")
+                if partial and partial != last_partial:
+                    last_partial = partial
+                    on_partial(partial)
+
+BACKENDS = {"google": GoogleBackend, "vosk": VoskBackend}
+
+def make_backend(name=None):
+    """Create the configured recognition backend"""
+    name = (name or RECOGNITION_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown recognition backend: {name}. Available: {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
+
+class Listener:
+    """Keeps one audio source open and queues finished utterances for the main loop"""
+
+    def __init__(self, source=None, recognizer=None, calibration=0.5, backend=None, on_partial=None, on_audio=None):
+        self.source = source
+        self.recognizer = recognizer or sr.Recognizer()
+        self.backend = backend or GoogleBackend(self.recognizer)
+        self.on_partial = on_partial
+        self.on_audio = on_audio  # called with each captured utterance from non-streaming backends
+        self.calibration = calibration
+        self.utterances = queue.Queue()
+        self.latencies = []
+        self.calibration_time = None
+        self.error = None
+        self.ready = threading.Event()
+        self.finished = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Open the source, calibrate once and start capturing in the background"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        source = self.source if self.source is not None else sr.Microphone()
+        try:
+            with source:
+                if self.backend.streaming:
+                    self._stream(source)
+                else:
+                    self._capture(source)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.ready.set()
+            self.finished.set()
+
+    def _capture(self, source):
+        start = time_module.perf_counter()
+        self.recognizer.adjust_for_ambient_noise(source, duration=self.calibration)
+        self.calibration_time = time_module.perf_counter() - start
+        if tracer.enabled:
+            tracer.record("calibration", self.calibration_time)
+        # The recognizer keeps adapting its energy threshold while listening
+        self.recognizer.dynamic_energy_threshold = True
+        self.ready.set()
+        while True:
+            start = time_module.perf_counter()
+            try:
+                audio = self.recognizer.listen(source, timeout=LISTEN_TIMEOUT, phrase_time_limit=PHRASE_TIME_LIMIT)
+            except sr.WaitTimeoutError:
+                continue
+            if not audio.frame_data:
+                break  # end of a file-backed source
+            # Only listens that caught speech count; silent timeouts would swamp the histogram
+            if tracer.enabled:
+                tracer.record("capture", time_module.perf_counter() - start)
+            self.utterances.put({"audio": audio, "text": None, "ended": time_module.monotonic()})
+            if self.on_audio:
+                self.on_audio(audio)
+
+    def _stream(self, source):
+        # Streaming backends find utterance boundaries themselves and need no calibration
+        self.calibration_time = 0.0
+        self.ready.set()
+        while True:
+            text = self.backend.stream(source, self.on_partial)
+            if text is None:
+                break
+            self.utterances.put({"audio": None, "text": text, "ended": time_module.monotonic()})
+
+    def get(self, since=None, timeout=LISTEN_TIMEOUT + PHRASE_TIME_LIMIT):
+        """Return the next utterance dict that ended after `since`, or None on timeout.
+
+        Utterances carry either captured "audio" or, from streaming backends,
+        the recognized "text".
+        """
+        deadline = time_module.monotonic() + timeout
+        while True:
+            remaining = deadline - time_module.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                utterance = self.utterances.get(timeout=min(remaining, 0.1))
+            except queue.Empty:
+                if self.finished.is_set() and self.utterances.empty():
+                    return None
+                continue
+            # Drop speech that ended before this turn started, e.g. our own voice
+            if since is not None and utterance["ended"] < since:
+                continue
+            self.latencies.append(time_module.monotonic() - utterance["ended"])
+            return utterance
+
+    def stats(self):
+        """Capture latency summary in seconds"""
+        if not self.latencies:
+            return {"turns": 0, "calibration": self.calibration_time}
+        ordered = sorted(self.latencies)
+        return {
+            "turns": len(ordered),
+            "calibration": self.calibration_time,
+            "mean": sum(ordered) / len(ordered),
+            "p50": ordered[len(ordered) // 2],
+            "max": ordered[-1]
+        }
+
+# Wake word gate
+WAKE_PHRASE = "hey virus"
+WAKE_TEMPLATES_DIR = os.environ.get("VIRUS_WAKE_TEMPLATES", "virus_wake")
+WAKE_THRESHOLD = float(os.environ.get("VIRUS_WAKE_THRESHOLD", 0)) or None  # None calibrates from the templates
+WAKE_RATE = 16000
+WAKE_WINDOW = 8  # seconds after a command during which follow-ups need no wake phrase
+WAKE_HOP = WAKE_RATE // 100  # one feature frame per 10 ms
+
+def pcm16(audio):
+    """Mono 16-bit samples at WAKE_RATE from captured AudioData"""
+    return np.frombuffer(audio.get_raw_data(convert_rate=WAKE_RATE, convert_width=2), dtype=np.int16)
+
+def read_wav(path):
+    """Mono 16-bit samples at WAKE_RATE from a WAV file"""
+    with wave.open(path) as clip:
+        rate, width, channels = clip.getframerate(), clip.getsampwidth(), clip.getnchannels()
+        frames = clip.readframes(clip.getnframes())
+    if width != 2:
+        raise ValueError(f"{path}: only 16-bit WAV files are supported")
+    samples = np.frombuffer(frames, dtype=np.int16).astype(np.float64)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != WAKE_RATE:
+        samples = np.interp(np.arange(0, len(samples), rate / WAKE_RATE), np.arange(len(samples)), samples)
+    return samples.astype(np.int16)
+
+def write_wav(path, samples):
+    with wave.open(path, 'wb') as clip:
+        clip.setnchannels(1)
+        clip.setsampwidth(2)
+        clip.setframerate(WAKE_RATE)
+        clip.writeframes(np.asarray(samples, dtype=np.int16).tobytes())
+
+class EnergyVAD:
+    """Finds the speech in a clip from 20 ms frame energies against the clip's own noise floor"""
+
+    def __init__(self, frame=WAKE_RATE // 50, ratio=3.0, min_rms=150.0, min_frames=8, hangover=5):
+        self.frame = frame
+        self.ratio = ratio
+        self.min_rms = min_rms
+        self.min_frames = min_frames
+        self.hangover = hangover
+
+    def speech_span(self, samples):
+        """(start, end) sample range holding speech, or None for silence and steady noise"""
+        count = len(samples) // self.frame
+        if count < self.min_frames:
+            return None
+        frames = samples[:count * self.frame].reshape(count, self.frame).astype(np.float64)
+        energy = np.sqrt((frames ** 2).mean(axis=1))
+        # A clip that is all speech has no quiet frames, so the floor is capped by the peak
+        threshold = max(self.min_rms, min(np.percentile(energy, 10) * self.ratio, energy.max() * 0.25))
+        voiced = np.flatnonzero(energy > threshold)
+        if len(voiced) < self.min_frames:
+            return None
+        start = max(0, voiced[0] - self.hangover) * self.frame
+        end = min(count, voiced[-1] + 1 + self.hangover) * self.frame
+        return start, end
+
+@functools.lru_cache(maxsize=None)
+def mel_filterbank(bands=26, n_fft=512):
+    def mel(hz):
+        return 2595 * np.log10(1 + hz / 700)
+    points = 700 * (10 ** (np.linspace(mel(60), mel(WAKE_RATE / 2), bands + 2) / 2595) - 1)
+    bins = np.floor((n_fft + 1) * points / WAKE_RATE).astype(int)
+    bank = np.zeros((bands, n_fft // 2 + 1))
+    for band in range(bands):
+        left, centre, right = bins[band:band + 3]
+        if centre > left:
+            bank[band, left:centre] = (np.arange(left, centre) - left) / (centre - left)
+        if right > centre:
+            bank[band, centre:right] = (right - np.arange(centre, right)) / (right - centre)
+    return bank
+
+@functools.lru_cache(maxsize=None)
+def dct_matrix(bands=26, coefficients=13):
+    return np.cos(np.pi / bands * np.arange(coefficients)[:, None] * (np.arange(bands) + 0.5)[None, :])
+
+def mfcc(samples, frame=WAKE_RATE // 40, n_fft=512, window=100):
+    """Cepstral features every 10 ms, without c0 and normalised by a one-second running mean"""
+    signal = samples.astype(np.float64)
+    signal = np.append(signal[:1], signal[1:] - 0.97 * signal[:-1])
+    if len(signal) < frame:
+        return np.zeros((0, 12))
+    count = 1 + (len(signal) - frame) // WAKE_HOP
+    frames = signal[np.arange(frame)[None, :] + WAKE_HOP * np.arange(count)[:, None]] * np.hamming(frame)
+    power = np.abs(np.fft.rfft(frames, n_fft)) ** 2 / n_fft
+    features = (np.log(power @ mel_filterbank(n_fft=n_fft).T + 1e-10) @ dct_matrix().T)[:, 1:]
+    # A running mean rather than the clip mean, so the command after the phrase does not shift it
+    sums = np.cumsum(np.vstack([np.zeros((1, features.shape[1])), features]), axis=0)
+    lo = np.clip(np.arange(count) - window // 2, 0, count)
+    hi = np.clip(np.arange(count) + window // 2, 1, count)
+    return features - (sums[hi] - sums[lo]) / (hi - lo)[:, None]
+
+class KeywordSpotter:
+    """Matches the start of a clip against recorded wake phrase templates with dynamic time warping"""
+
+    def __init__(self, templates, threshold=WAKE_THRESHOLD, lead=50):
+        vad = EnergyVAD()
+        spans = [(samples, vad.speech_span(samples)) for samples in templates]
+        trimmed = [samples[span[0]:span[1]] if span else samples for samples, span in spans]
+        self.templates = [features for features in map(mfcc, trimmed) if len(features) >= 10]
+        if not self.templates:
+            raise ValueError("no usable wake phrase templates")
+        self.lead = lead  # frames of lead-in allowed before the phrase starts
+        self.threshold = threshold or self.calibrate()
+        self.last_score = None
+
+    @classmethod
+    def from_directory(cls, directory=WAKE_TEMPLATES_DIR, threshold=WAKE_THRESHOLD):
+        paths = sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(".wav"))
+        return cls([read_wav(path) for path in paths], threshold)
+
+    def calibrate(self):
+        """Threshold with some headroom over the worst match between the templates themselves"""
+        if len(self.templates) < 2:
+            return 9.0
+        scores = [self.match(a, b, lead=1)[0] for a in self.templates for b in self.templates if a is not b]
+        return max(scores) * 1.25
+
+    @staticmethod
+    def match(template, query, lead):
+        """(mean frame distance, last query frame) of the best alignment of template in query"""
+        n, m = len(query), len(template)
+        cost = np.sqrt(((query[:, None, :] - template[None, :, :]) ** 2).sum(axis=2))
+        total = np.full((n, m), np.inf)
+        total[:min(lead, n), 0] = cost[:min(lead, n), 0]
+        # Steps (1,1), (1,2) and (2,1) only look back a row, so each row is one vector operation
+        for i in range(1, n):
+            best = np.full(m, np.inf)
+            best[1:] = total[i - 1, :-1]
+            best[2:] = np.minimum(best[2:], total[i - 1, :-2])
+            if i >= 2:
+                best[1:] = np.minimum(best[1:], total[i - 2, :-1])
+            total[i] = np.minimum(total[i], cost[i] + best)
+        end = int(np.argmin(total[:, -1]))
+        return total[end, -1] / m, end
 
-def speech_to_text():
-    """Convert speech to text"""
+    def spot(self, samples):
+        """Sample offset just past the wake phrase at the start of samples, or None"""
+        longest = max(len(template) for template in self.templates)
+        query = mfcc(samples[:(self.lead + 2 * longest) * WAKE_HOP + WAKE_RATE // 40])
+        if len(query) < 10:
+            return None
+        score, end = min(self.match(template, query, self.lead) for template in self.templates)
+        self.last_score = score
+        if score > self.threshold:
+            return None
+        return (end + 1) * WAKE_HOP + WAKE_RATE // 40
+
+class WakeWordGate:
+    """Passes utterances to full recognition only once the wake phrase has been heard.
+
+    Audio utterances go through the energy VAD and then the keyword spotter;
+    text from streaming backends only has to start with the phrase. After a
+    command the gate stays open for WAKE_WINDOW seconds.
+    """
+
+    def __init__(self, spotter=None, vad=None, window=WAKE_WINDOW):
+        self.spotter = spotter
+        self.vad = vad or EnergyVAD()
+        self.window = window
+        self.awake_until = 0.0
+        self.counts = collections.Counter()
+
+    def awake(self):
+        return time_module.monotonic() < self.awake_until
+
+    def extend(self):
+        self.awake_until = time_module.monotonic() + self.window
+
+    def admit(self, utterance):
+        """The utterance with the wake phrase cut off, or None when it should not be recognized"""
+        if utterance["text"] is not None:
+            words, wake = tokenize(utterance["text"]), tokenize(WAKE_PHRASE)
+            if words[:len(wake)] != wake:
+                self.counts["rejected"] += 1
+                return None
+            self.counts["accepted"] += 1
+            self.extend()
+            rest = " ".join(words[len(wake):])
+            return dict(utterance, text=rest) if rest else None
+        samples = pcm16(utterance["audio"])
+        span = self.vad.speech_span(samples)
+        if span is None:
+            self.counts["silence"] += 1
+            return None
+        end = self.spotter.spot(samples[span[0]:span[1]])
+        if end is None:
+            self.counts["rejected"] += 1
+            return None
+        self.counts["accepted"] += 1
+        self.extend()
+        rest = samples[span[0] + end:]
+        if self.vad.speech_span(rest) is None:
+            print("Wake word heard")
+            return None
+        return dict(utterance, audio=sr.AudioData(rest.tobytes(), WAKE_RATE, 2))
+
+wake_word = None  # None turns the gate on when templates have been enrolled
+wake_gate = None
+
+def get_wake_gate(streaming=False):
+    """Build the wake word gate on first use, or None when it is off"""
+    global wake_gate, wake_word
+    with init_lock:
+        if wake_word is None:
+            wake_word = os.path.isdir(WAKE_TEMPLATES_DIR) and any(
+                f.endswith(".wav") for f in os.listdir(WAKE_TEMPLATES_DIR))
+        if wake_word and wake_gate is None:
+            if streaming:
+                wake_gate = WakeWordGate()
+            elif np is None:
+                print("The wake word gate needs NumPy; every utterance will be recognized")
+                wake_word = False
+            else:
+                try:
+                    wake_gate = WakeWordGate(KeywordSpotter.from_directory())
+                except (OSError, ValueError) as e:
+                    print(f"Wake word gate disabled: {e}")
+                    wake_word = False
+    return wake_gate
+
+def enroll_wake_word(count=3):
+    """Record the wake phrase a few times as keyword spotter templates"""
+    os.makedirs(WAKE_TEMPLATES_DIR, exist_ok=True)
     recognizer = sr.Recognizer()
-    with sr.Microphone() as source:
-        print("\nListening...")
+    vad = EnergyVAD()
+    with sr.Microphone(sample_rate=WAKE_RATE) as source:
         recognizer.adjust_for_ambient_noise(source, duration=0.5)
-        try:
-            audio = recognizer.listen(source, timeout=5, phrase_time_limit=10)
-            print("Processing...")
-            data = recognizer.recognize_google(audio)
-            print(f"You said: {data}")
-            return data.lower()
-        except sr.WaitTimeoutError:
-            return ""
-        except sr.UnknownValueError:
-            print("Could not understand audio")
+        recorded = 0
+        while recorded < count:
+            print(f"Say '{WAKE_PHRASE}' ({recorded + 1} of {count})")
+            try:
+                samples = pcm16(recognizer.listen(source, timeout=LISTEN_TIMEOUT, phrase_time_limit=3))
+            except sr.WaitTimeoutError:
+                continue
+            span = vad.speech_span(samples)
+            if span is None:
+                print("That was too quiet, please try again")
+                continue
+            recorded += 1
+            write_wav(os.path.join(WAKE_TEMPLATES_DIR, f"template_{int(time_module.time())}_{recorded}.wav"),
+                      samples[span[0]:span[1]])
+    print(f"Saved {count} templates in {WAKE_TEMPLATES_DIR}")
+
+class TextInput:
+    """Typed or recorded commands standing in for the microphone.
+
+    Each line is a command. Lines starting with ">" answer the follow-up
+    questions the previous command asks, such as the alarm time or a
+    contact's number. Interactive input needs no markers; the next line
+    typed is the answer. Blank lines and lines starting with "#" are skipped.
+    """
+
+    def __init__(self, lines, interactive=False):
+        self.lines = iter(lines)
+        self.interactive = interactive
+        self._peeked = None
+
+    def _next_line(self):
+        if self._peeked is not None:
+            line, self._peeked = self._peeked, None
+            return line
+        for line in self.lines:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                return line
+        return None
+
+    def command(self):
+        """Next command, skipping answers nothing asked for; None at the end"""
+        while True:
+            line = self._next_line()
+            if line is None or not line.startswith(">"):
+                if line is not None and self.interactive is False:
+                    print(f"\nYou said: {line}")
+                return line.lower() if line else None
+
+    def answer(self):
+        """Answer to a follow-up question, or "" when the transcript has none"""
+        line = self._next_line()
+        if line is None:
             return ""
-        except sr.RequestError as e:
-            print(f"API error: {e}")
+        if line.startswith(">"):
+            line = line[1:].strip()
+        elif not self.interactive:
+            self._peeked = line
             return ""
+        if not self.interactive:
+            print(f"You said: {line}")
+        return line.lower()
+
+text_input = None
+listener = None
+init_lock = threading.RLock()
+
+def get_listener():
+    """Start the shared microphone listener on first use"""
+    global listener
+    with init_lock:
+        if listener is None:
+            def on_partial(partial):
+                barge_in(partial)
+                router.prematch(partial)
+
+            def on_audio(audio):
+                # Without partials, what was heard over our own speech is recognized in full
+                if speech.current is not None:
+                    threading.Thread(target=barge_in_audio, args=(backend, audio), daemon=True).start()
+
+            backend = make_backend()
+            listener = Listener(backend=backend, on_partial=on_partial, on_audio=on_audio).start()
+    return listener
+
+def mark_first_listen():
+    """Note the time to the first listen, for any input, and print the startup report if it was asked for"""
+    global first_listen
+    if first_listen is None:
+        first_listen = time_module.perf_counter() - STARTUP_STARTED
+        if startup_report:
+            print_startup_report()
+
+def speech_to_text(gated=False):
+    """Convert speech to text; a gated call waits for the wake phrase unless a conversation is under way"""
+    batch = current_batch()
+    if batch is not None:
+        with batch.conversation(session_state.clause):
+            return speech_to_text(gated)
+    session = current_session()
+    if session is not None:
+        return session.listen()
+    if text_input is not None:
+        return text_input.answer()
+    active = get_listener()
+    # Wait for our own speech to finish so it is not heard as the answer
+    speech.wait_idle()
+    if first_listen is None:
+        active.ready.wait(timeout=10)
+        if active.calibration_time is not None:
+            startup_timings["microphone calibration"] = active.calibration_time
+        mark_first_listen()
+    gate = get_wake_gate(active.backend.streaming) if gated else None
+    print("\nListening..." if gate is None or gate.awake() else f"\nWaiting for '{WAKE_PHRASE}'...")
+    try:
+        since = time_module.monotonic()
+        while True:
+            utterance = active.get(since=since)
+            if utterance is None:
+                if active.error:
+                    print(f"Error: {active.error}")
+                return ""
+            # Background speech without the wake phrase never reaches the recognizer
+            if gate is not None and not gate.awake():
+                utterance = gate.admit(utterance)
+                if utterance is None:
+                    continue
+            break
+        print("Processing...")
+        data = utterance["text"]
+        if data is None:
+            with tracer.span("recognition", backend=RECOGNITION_BACKEND):
+                data = active.backend.recognize(utterance["audio"])
+        print(f"You said: {data}")
+        return data.lower()
+    except sr.UnknownValueError:
+        print("Could not understand audio")
+        return ""
+    except sr.RequestError as e:
+        print(f"API error: {e}")
+        return ""
+    except Exception as e:
+        print(f"Error: {e}")
+        return ""
+
+# Speech output
+SPEECH_ALERT = 0
+SPEECH_NORMAL = 1
+
+class RecordingEngine:
+    """Stand-in TTS engine that records what would have been spoken"""
+
+    def __init__(self):
+        self.spoken = []
+        self.properties = {"voices": [], "rate": 165, "volume": 1.0}
+        self._pending = []
+
+    def getProperty(self, name):
+        return self.properties.get(name)
+
+    def setProperty(self, name, value):
+        self.properties[name] = value
+
+    def say(self, text):
+        self._pending.append(text)
+
+    def runAndWait(self):
+        self.spoken.extend(self._pending)
+        self._pending = []
+
+    def stop(self):
+        self._pending = []
+
+# Rendered speech cache
+SPEECH_CACHE_DIR = os.environ.get("VIRUS_SPEECH_CACHE", "virus_speech_cache")
+SPEECH_CACHE_BYTES = int(os.environ.get("VIRUS_SPEECH_CACHE_MB", 64)) * 1024 * 1024
+SPEECH_CACHE_AFTER = 2  # a phrase is rendered once it has been spoken live this many times
+
+class SpeechCache:
+    """Content-addressed WAV clips of rendered phrases, evicted least recently used by total size"""
+
+    def __init__(self, directory=SPEECH_CACHE_DIR, max_bytes=SPEECH_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries = None  # key -> size, least recently used first
+        self.size = 0
+        self._lock = threading.Lock()
+
+    def key(self, text, voice, rate, volume):
+        return hashlib.sha256(json.dumps([text, voice, rate, volume]).encode()).hexdigest()[:32]
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".wav")
+
+    def _load(self):
+        # File modification times carry the LRU order across restarts
+        self.entries = collections.OrderedDict()
+        if os.path.isdir(self.directory):
+            clips = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".wav"):
+                    stat = entry.stat()
+                    clips.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+            for _, key, size in sorted(clips):
+                self.entries[key] = size
+                self.size += size
+
+    def get(self, key):
+        """Path of the cached clip, marking it recently used, or None"""
+        with self._lock:
+            if self.entries is None:
+                self._load()
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.size -= self.entries.pop(key, 0)
+            return None
+        return path
+
+    def put(self, key, clip):
+        """Move a freshly rendered clip into the cache and evict down to the size limit"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        os.replace(clip, path)
+        with self._lock:
+            if self.entries is None:
+                self._load()
+            self.size += os.path.getsize(path) - self.entries.pop(key, 0)
+            self.entries[key] = os.path.getsize(path)
+            while self.size > self.max_bytes and len(self.entries) > 1:
+                old, size = self.entries.popitem(last=False)
+                self.size -= size
+                try:
+                    os.remove(self.path(old))
+                except OSError:
+                    pass
+        return path
+
+    def render(self, tts_engine, text, key):
+        """Synthesize text to a WAV file with the engine and cache it"""
+        os.makedirs(self.directory, exist_ok=True)
+        temp = self.path(key) + ".tmp"
+        tts_engine.save_to_file(text, temp)
+        tts_engine.runAndWait()
+        if not os.path.exists(temp) or os.path.getsize(temp) == 0:
+            raise RuntimeError("the TTS engine wrote no audio")
+        return self.put(key, temp)
+
+class ClipPlayer:
+    """Plays WAV clips to completion and can be stopped from another thread"""
+
+    def __init__(self):
+        self.command = None
+        self.winsound = None
+        self.process = None
+        self._stopped = threading.Event()
+        if platform.system() == "Windows":
+            import winsound
+            self.winsound = winsound
+        elif platform.system() == "Darwin":
+            self.command = ["afplay"]
+        else:
+            for command in (["paplay"], ["aplay", "-q"], ["ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet"]):
+                if shutil.which(command[0]):
+                    self.command = command
+                    break
+
+    @property
+    def available(self):
+        return self.winsound is not None or self.command is not None
+
+    def start(self, path):
+        """Begin playback and return once audio is on its way"""
+        self._stopped.clear()
+        if self.winsound is not None:
+            with wave.open(path) as clip:
+                self._duration = clip.getnframes() / clip.getframerate()
+            self.winsound.PlaySound(path, self.winsound.SND_FILENAME | self.winsound.SND_ASYNC)
+        else:
+            self.process = subprocess.Popen(self.command + [path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def wait(self):
+        if self.winsound is not None:
+            self._stopped.wait(self._duration)
+        elif self.process is not None:
+            self.process.wait()
+            self.process = None
+
+    def play(self, path):
+        self.start(path)
+        self.wait()
+
+    def stop(self):
+        self._stopped.set()
+        if self.winsound is not None:
+            self.winsound.PlaySound(None, 0)
+        elif self.process is not None:
+            try:
+                self.process.terminate()
+            except OSError:
+                pass
+
+def static_phrases():
+    """Fixed strings the assistant speaks, read from the text_to_speech calls in this file"""
+    with open(__file__, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    phrases = list(UNKNOWN_RESPONSES)
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "text_to_speech"
+                and node.args and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str)):
+            phrases.append(node.args[0].value)
+    return list(dict.fromkeys(phrases))
+
+class SpeechWorker:
+    """Owns the TTS engine and speaks queued text in priority order on its own thread.
+
+    Consecutive items of the same group are spoken as one utterance, alerts
+    interrupt normal speech, and cancel() drops whatever normal speech is
+    still queued. Phrases found in the cache play the stored clip; phrases
+    that repeat are rendered into the cache while the worker is idle.
+    """
+
+    def __init__(self, tts_engine, cache=None):
+        self.engine = tts_engine
+        self.cache = cache
+        self.player = None
+        self.current = None
+        self._pending_renders = []
+        self._rendering = False
+        self._spoken = collections.Counter()
+        self._voice = None
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._interrupt = None
+
+    def say(self, text, priority=SPEECH_NORMAL, group=None):
+        with self._cond:
+            item = {"text": text, "priority": priority, "group": group, "seq": next(self._seq)}
+            heapq.heappush(self._heap, (priority, item["seq"], item))
+            self.start()
+            if self.current and priority < self.current["priority"]:
+                self._stop_current("preempted")
+            self._cond.notify_all()
+
+    def start(self):
+        """Start the worker thread, which initializes the engine right away"""
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return self
+
+    def cancel(self):
+        """Drop queued and current normal speech; alerts are kept"""
+        with self._cond:
+            self._heap = [entry for entry in self._heap if entry[0] == SPEECH_ALERT]
+            heapq.heapify(self._heap)
+            if self.current and self.current["priority"] != SPEECH_ALERT:
+                self._stop_current("cancelled")
+            self._cond.notify_all()
+
+    def wait_idle(self, timeout=None):
+        """Block until everything queued has been spoken"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._heap and self.current is None, timeout)
+
+    def prerender(self, phrases):
+        """Render phrases into the cache in idle time, skipping ones already there"""
+        with self._cond:
+            if self.cache is not None:
+                self._pending_renders.extend(phrases)
+                self.start()
+                self._cond.notify_all()
+
+    def wait_rendered(self, timeout=None):
+        """Block until queued renders are done or the cache turns out to be unusable"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.cache is None or not (self._pending_renders or self._rendering),
+                                       timeout)
+
+    def _stop_current(self, reason):
+        self._interrupt = reason
+        try:
+            self.engine.stop()
+        except Exception:
+            pass
+        if self.player is not None:
+            self.player.stop()
+
+    def _cache_key(self, text):
+        if self._voice is None:
+            self._voice = (self.engine.getProperty('voice'), self.engine.getProperty('rate'),
+                           self.engine.getProperty('volume'))
+        return self.cache.key(text, *self._voice)
+
+    def _speak(self, text):
+        if self.cache is not None:
+            key = self._cache_key(text)
+            clip = self.cache.get(key)
+            if clip is not None:
+                self.player.play(clip)
+                return
+            self._spoken[text] += 1
+            if self._spoken[text] == SPEECH_CACHE_AFTER:
+                with self._cond:
+                    self._pending_renders.append(text)
+            if len(self._spoken) > 10000:
+                self._spoken.clear()
+        self.engine.say(text)
+        self.engine.runAndWait()
+
+    def _render(self, text):
+        try:
+            key = self._cache_key(text)
+            if self.cache.get(key) is None:
+                self.cache.render(self.engine, text, key)
         except Exception as e:
-            print(f"Error: {e}")
-            return ""
+            print(f"Speech cache error: {e}")
+            with self._cond:
+                self.cache = None
+
+    def _next(self):
+        _, _, item = heapq.heappop(self._heap)
+        texts = [item["text"]]
+        while (item["group"] is not None and self._heap
+               and self._heap[0][2]["group"] == item["group"]
+               and self._heap[0][0] == item["priority"]):
+            texts.append(heapq.heappop(self._heap)[2]["text"])
+        return dict(item, text=". ".join(texts))
 
-def text_to_speech(text):
-    """Convert text to speech"""
+    def _run(self):
+        try:
+            # Touching the engine creates it on this thread, the only one that uses it
+            self.engine.getProperty('rate')
+        except Exception as e:
+            print(f"TTS engine error: {e}")
+        if self.cache is not None:
+            self.player = ClipPlayer()
+            if not self.player.available or not hasattr(self.engine, "save_to_file"):
+                with self._cond:
+                    self.cache = None
+                    self._cond.notify_all()
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._heap or (self._pending_renders and self.cache is not None))
+                if not self._heap:
+                    text = self._pending_renders.pop()
+                    self._rendering = True
+                else:
+                    text = None
+                    self.current = self._next()
+                    self._interrupt = None
+            if text is not None:
+                # Rendering holds the engine, so it only happens with nothing queued to say
+                self._render(text)
+                with self._cond:
+                    self._rendering = False
+                    self._cond.notify_all()
+                continue
+            try:
+                with tracer.span("speech"):
+                    self._speak(self.current["text"])
+            except Exception:
+                pass
+            with self._cond:
+                if self._interrupt == "preempted":
+                    item = self.current
+                    heapq.heappush(self._heap, (item["priority"], item["seq"], item))
+                self.current = None
+                self._cond.notify_all()
+
+speech = SpeechWorker(engine, SpeechCache())
+
+def text_to_speech(text, priority=SPEECH_NORMAL, group=None):
+    """Queue text to be spoken without blocking the caller"""
+    batch = current_batch()
+    if batch is not None:
+        batch.reply(session_state.clause, text)
+        return
+    session = current_session()
+    if session is not None:
+        session.say(text)
+        return
     print(f"\nVirus: {text}")
+    speech.say(text, priority, group)
+
+def barge_in(partial):
+    """Stop talking when the user starts speaking over the assistant"""
+    current = speech.current
+    # Partials made only of words we are saying ourselves are our own echo
+    if current and not set(tokenize(partial)) <= set(tokenize(current["text"])):
+        speech.cancel()
+
+def barge_in_audio(backend, audio):
+    """Barge in on an utterance a non-streaming backend captured while we were talking"""
     try:
-        engine.say(text)
-        engine.runAndWait()
-    except:
-        pass
+        text = backend.recognize(audio)
+    except (sr.UnknownValueError, sr.RequestError):
+        return
+    barge_in(text)
 
 def get_current_time():
     """Get current time"""
@@ -91,196 +1741,1455 @@ def get_current_date():
     current_date = now.strftime("%A, %B %d, %Y")
     text_to_speech(f"Today is {current_date}")
 
+# Scheduler for timers and alarms
+class Scheduler:
+    """Single thread that fires timers and alarms from a min-heap of monotonic deadlines"""
+
+    def __init__(self):
+        self._heap = []
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._thread = None
+        self.wakeups = 0
+        self.last_fired = {}  # user -> the job that fired last for them
+
+    def schedule(self, delay, callback, label=""):
+        """Run callback after delay seconds; returns a job id"""
+        with self._cond:
+            job_id = next(self._ids)
+            deadline = time_module.monotonic() + max(0, delay)
+            # The callback runs for the client that scheduled it
+            self._jobs[job_id] = {"id": job_id, "deadline": deadline, "callback": callback, "label": label,
+                                  "session": current_session()}
+            heapq.heappush(self._heap, (deadline, job_id))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            elif self._heap[0][1] == job_id:
+                self._cond.notify()
+        return job_id
+
+    def cancel(self, job_id):
+        """Cancel a pending job; its heap entry is discarded when it surfaces"""
+        with self._cond:
+            return self._jobs.pop(job_id, None) is not None
+
+    def snooze(self, job_id, delay):
+        """Push a pending or just-fired job back by delay seconds; returns the new job id"""
+        with self._cond:
+            job = self._jobs.pop(job_id, None)
+            last = self.last_fired.get(current_user())
+            if job is None and last and last["id"] == job_id:
+                job = self.last_fired.pop(current_user())
+        if job is None:
+            return None
+        return self.schedule(delay, job["callback"], job["label"])
+
+    def pending(self):
+        """Number of jobs waiting to fire"""
+        with self._cond:
+            return len(self._jobs)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                now = time_module.monotonic()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    _, job_id = heapq.heappop(self._heap)
+                    job = self._jobs.pop(job_id, None)
+                    if job:
+                        due.append(job)
+                if not due:
+                    timeout = self._heap[0][0] - now if self._heap else None
+                    self._cond.wait(timeout)
+                    self.wakeups += 1
+                    continue
+                for job in due:
+                    self.last_fired[job["session"].user if job["session"] else None] = job
+            # Alerts sleep between beeps, so they must not hold up the scheduler
+            for job in due:
+                threading.Thread(target=run_in_session, args=(job["session"], job["callback"]), daemon=True).start()
+
+scheduler = Scheduler()
+
+def seconds_until(clock_time):
+    """Seconds from now until the next occurrence of a 24-hour HH:MM time"""
+    now = datetime.datetime.now()
+    hour, minute = (int(part) for part in clock_time.split(":"))
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += datetime.timedelta(days=1)
+    return (target - now).total_seconds()
+
 def set_timer(seconds, label="Timer"):
     """Set a countdown timer"""
-    def timer_thread():
-        print(f"\nTimer started: {label} for {seconds} seconds")
-        time_module.sleep(seconds)
+    def timer_alert():
         print(f"\n\n*** TIMER ALERT: {label} is up! ***\n")
-        text_to_speech(f"Timer alert! {label} is up!")
+        text_to_speech(f"Timer alert! {label} is up!", SPEECH_ALERT)
         for _ in range(3):
             print("\a")
             time_module.sleep(0.5)
-    
-    thread = threading.Thread(target=timer_thread, daemon=True)
-    thread.start()
-    timers.append({"label": label, "seconds": seconds})
+
+    print(f"\nTimer started: {label} for {seconds} seconds")
+    job_id = scheduler.schedule(seconds, timer_alert, label)
+    with data_lock:
+        timers.append({"label": label, "seconds": seconds, "id": job_id, "user": current_user()})
     text_to_speech(f"{label} set for {seconds} seconds")
 
+def cancel_timer():
+    """Cancel the most recently set timer that is still running"""
+    user = current_user()
+    while True:
+        with data_lock:
+            mine = [i for i, timer in enumerate(timers) if timer["user"] == user]
+            timer = timers.pop(mine[-1]) if mine else None
+        if timer is None:
+            break
+        if scheduler.cancel(timer["id"]):
+            text_to_speech(f"{timer['label']} cancelled")
+            return
+    text_to_speech("You have no running timers")
+
+def arm_alarm(alarm_data):
+    """Schedule an alarm entry for its next HH:MM occurrence"""
+    label = alarm_data.label
+    alarm_time = alarm_data.time
+
+    def alarm_alert():
+        print(f"\n\n*** ALARM RINGING: {label} ***\n")
+        text_to_speech(f"Alarm! {label}! It's {alarm_time}", SPEECH_ALERT)
+        for _ in range(5):
+            print("\a")
+            time_module.sleep(1)
+        update_alarm(alarm_data, active=False)
+
+    job_id = scheduler.schedule(seconds_until(alarm_time), alarm_alert, label)
+    alarm_jobs[job_id] = (current_user(), alarm_data)
+    return job_id
+
 def set_alarm(alarm_time, label="Alarm"):
-    """Set an alarm for specific time"""
-    alarm_data = {"time": alarm_time, "label": label, "active": True}
-    alarms.append(alarm_data)
-    save_data(ALARMS_FILE, alarms)
+    """Set an alarm for specific time; raises ValueError, before anything is saved, for a time like 99:99"""
+    seconds_until(alarm_time)
+    alarm_data = Alarm(time=alarm_time, label=label, active=True)
+    if store is not None:
+        alarm_data.id = store.add("alarms", alarm_data)
+        alarms.append(alarm_data)
+    else:
+        append_record(ALARMS_FILE, alarms, alarm_data)
+    arm_alarm(alarm_data)
     text_to_speech(f"Alarm set for {alarm_time}")
-    
-    def alarm_thread():
-        while alarm_data["active"]:
-            current_time = datetime.datetime.now().strftime("%H:%M")
-            if current_time == alarm_time:
-                print(f"\n\n*** ALARM RINGING: {label} ***\n")
-                text_to_speech(f"Alarm! {label}! It's {alarm_time}")
-                for _ in range(5):
-                    print("\a")
-                    time_module.sleep(1)
-                alarm_data["active"] = False
-                break
-            time_module.sleep(30)
-    
-    thread = threading.Thread(target=alarm_thread, daemon=True)
-    thread.start()
+
+def update_alarm(alarm_data, **changes):
+    """Persist changes to one alarm entry"""
+    if store is not None:
+        alarm_data.update(changes)
+        store.update("alarms", alarm_data.id, **changes)
+        return
+    index = next(i for i, a in enumerate(alarms) if a is alarm_data)
+    update_record(ALARMS_FILE, alarms, index, **changes)
+
+def rearm_alarms():
+    """Re-arm active alarms saved in ALARMS_FILE"""
+    for alarm_data in alarms:
+        if alarm_data.active:
+            try:
+                arm_alarm(alarm_data)
+            except (KeyError, ValueError):
+                print(f"Skipping invalid alarm: {alarm_data}")
+
+def cancel_alarm():
+    """Cancel the most recently set alarm that is still pending"""
+    user = current_user()
+    with data_lock:
+        mine = sorted((job_id for job_id, (owner, _) in alarm_jobs.items() if owner == user), reverse=True)
+    for job_id in mine:
+        _, alarm_data = alarm_jobs.pop(job_id, (None, None))
+        if alarm_data is not None and scheduler.cancel(job_id):
+            update_alarm(alarm_data, active=False)
+            text_to_speech(f"Alarm for {alarm_data.time} cancelled")
+            return
+    text_to_speech("You have no pending alarms")
+
+def snooze_alarm(minutes=5):
+    """Snooze the alarm or timer that rang last"""
+    job = scheduler.last_fired.get(current_user())
+    new_id = scheduler.snooze(job["id"], minutes * 60) if job else None
+    if new_id is None:
+        text_to_speech("There is nothing to snooze")
+        return
+    owner_alarm = alarm_jobs.pop(job["id"], None)
+    if owner_alarm is not None:
+        update_alarm(owner_alarm[1], active=True)
+        alarm_jobs[new_id] = owner_alarm
+    text_to_speech(f"Snoozed for {minutes} minute{'s' if minutes != 1 else ''}")
 
 def add_reminder(reminder_text, remind_time=None):
     """Add a reminder"""
-    reminder = {
-        "text": reminder_text,
-        "time": remind_time if remind_time else datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
-        "created": datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
-        "completed": False
-    }
-    reminders.append(reminder)
-    save_data(REMINDERS_FILE, reminders)
+    reminder = Reminder(text=reminder_text, time=to_epoch(remind_time) or now_epoch(), created=now_epoch(),
+                        completed=False)
+    if store is not None:
+        store.add("reminders", reminder)
+    else:
+        append_record(REMINDERS_FILE, reminders, reminder)
     text_to_speech(f"Reminder added: {reminder_text}")
 
-def show_reminders():
-    """Show all active reminders"""
-    active_reminders = [r for r in reminders if not r.get("completed", False)]
-    if not active_reminders:
+def active_page(table, items, page=1):
+    """Return (total, records) for one page of uncompleted records"""
+    offset = (page - 1) * LIST_PAGE_SIZE
+    if store is not None:
+        return store.count_active(table), store.active(table, LIST_PAGE_SIZE, offset)
+    return items.count_open(), items.open_records(offset, LIST_PAGE_SIZE)
+
+# Last page read out of each paged list, per user, for "more reminders" and "more contacts"
+list_pages = {}
+
+def show_reminders(page=1):
+    """Show active reminders, one page at a time"""
+    total, page_reminders = active_page("reminders", reminders, page)
+    list_pages[current_user(), "reminders"] = page
+    if not total:
         text_to_speech("You have no active reminders")
         return
+    if not page_reminders:
+        text_to_speech(f"That's all {total} of your reminders")
+        return
     
     print("\n--- Your Reminders ---")
-    text_to_speech(f"You have {len(active_reminders)} reminder{'s' if len(active_reminders) != 1 else ''}")
-    for idx, reminder in enumerate(active_reminders, 1):
-        print(f"{idx}. {reminder['text']} - Created: {reminder['created']}")
-        text_to_speech(f"Reminder {idx}: {reminder['text']}")
+    start = (page - 1) * LIST_PAGE_SIZE + 1
+    heading = (f"You have {total} reminder{'s' if total != 1 else ''}" if page == 1
+               else f"Reminders {start} to {start + len(page_reminders) - 1} of {total}")
+    text_to_speech(heading, group="reminders")
+    for idx, reminder in enumerate(page_reminders, start):
+        print(f"{idx}. {reminder.text} - Created: {format_epoch(reminder.created)}")
+        text_to_speech(f"Reminder {idx}: {reminder.text}", group="reminders")
+    remaining = total - (start - 1) - len(page_reminders)
+    if remaining > 0:
+        text_to_speech(f"and {remaining} more. Say more reminders to hear them", group="reminders")
+
+# To-do priorities, most pressing first
+TODO_PRIORITIES = {"urgent": 0, "high": 1, "normal": 2, "low": 3}
+TODO_PRIORITY_WORDS = {"urgent": 0, "critical": 0, "high": 1, "important": 1, "top": 1,
+                       "normal": 2, "medium": 2, "low": 3}
+# Spoken listings read this many tasks at a time
+TODO_SUMMARY_SIZE = 5
+
+class TodoIndex:
+    """Open to-dos by id, with a heap ordered by priority and then due time.
+
+    Completed, deleted and reprioritized tasks leave stale heap entries
+    behind; they are dropped when they reach the top.
+    """
+
+    def __init__(self, records=()):
+        self.items = {}
+        self.positions = {}  # id -> list position, for journal updates of the JSON file
+        self.heap = []
+        self.next_id = getattr(records, "next_id", 1)  # a RecordList remembers ids of deleted tasks
+        self.page = 0  # last page read out, for "more tasks"
+        for position, todo in enumerate(records):
+            self.next_id = max(self.next_id, todo.id + 1)
+            if not todo.completed:
+                self.items[todo.id] = todo
+                self.positions[todo.id] = position
+                self.heap.append(self._entry(todo))
+        heapq.heapify(self.heap)
+
+    @staticmethod
+    def _entry(todo):
+        return todo.priority, NO_TIME if todo.due is None else todo.due, todo.id
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, todo_id):
+        return self.items.get(todo_id)
+
+    def add(self, todo, position=None):
+        self.items[todo.id] = todo
+        self.positions[todo.id] = position
+        self.next_id = max(self.next_id, todo.id + 1)
+        heapq.heappush(self.heap, self._entry(todo))
+
+    def update(self, todo_id, **changes):
+        todo = self.items[todo_id]
+        todo.update(changes)
+        heapq.heappush(self.heap, self._entry(todo))
+        if len(self.heap) > 2 * len(self.items) + 64:
+            self.heap = [self._entry(todo) for todo in self.items.values()]
+            heapq.heapify(self.heap)
+
+    def remove(self, todo_id, shift=False):
+        """Forget a task and return its list position; shift when it was deleted from the list"""
+        del self.items[todo_id]
+        position = self.positions.pop(todo_id)
+        if shift:
+            # Later records move up one place, as they do in the list itself
+            for other, at in self.positions.items():
+                if at > position:
+                    self.positions[other] = at - 1
+        return position
+
+    def top(self, count):
+        """The count most pressing open tasks, in order"""
+        found = []
+        while self.heap and len(found) < count:
+            entry = heapq.heappop(self.heap)
+            todo = self.items.get(entry[2])
+            if todo is not None and self._entry(todo) == entry and (not found or found[-1] is not todo):
+                found.append(todo)
+        for todo in found:
+            heapq.heappush(self.heap, self._entry(todo))
+        return found
+
+todo_indexes = {}
+
+def get_todo_index():
+    """Load the user's open to-dos into the index once, on first use"""
+    user = current_user()
+    with init_lock:
+        if user not in todo_indexes:
+            if store is not None:
+                todo_indexes[user] = TodoIndex(store.active("todos", limit=-1))
+            else:
+                # Lists saved before tasks had ids get them once, in a single snapshot
+                missing = [todo for todo in todos if todo.id is None]
+                if missing:
+                    for todo_id, todo in enumerate(missing, todos.next_id):
+                        todo.id = todo_id
+                    todos.data.next_id += len(missing)
+                    save_data(TODO_FILE, todos)
+                todo_indexes[user] = TodoIndex(todos)
+        return todo_indexes[user]
+
+def read_task(text):
+    """Split "call the bank by friday, high priority" into (task, priority, due)"""
+    priority = TODO_PRIORITIES["normal"]
+    match = re.search(r"[, ]*\b(urgent|(?:high|top|low|normal|medium) priority|important)\b", text, re.I)
+    if match:
+        priority = TODO_PRIORITY_WORDS[match.group(1).split()[0].lower()]
+        text = text[:match.start()] + text[match.end():]
+    due = None
+    # The last "by" is the deadline: "drop the book by the library by friday"
+    for match in reversed(list(re.finditer(r"\b(?:by|due|before)\b", text, re.I))):
+        when = parse_when(text[match.end():])
+        if when is not None:
+            due = int(when[0].timestamp())
+            text = text[:match.start()]
+            break
+    return text.strip(" ,") or text, priority, due
+
+def task_number(words):
+    """The first whole number in a command like "mark task twelve done", or None"""
+    for i in range(len(words)):
+        value, end = read_number(words, i)
+        if end > i and isinstance(value, int):
+            return value
+    return None
+
+def describe_todo(todo, label="Task"):
+    """Spoken form of a task, such as: Task 12: pay rent, due tomorrow at 9:00 AM, high priority"""
+    parts = [f"{label} {todo.id}: {todo.task}"]
+    if todo.due is not None:
+        parts.append(f"due {spoken_when(datetime.datetime.fromtimestamp(todo.due))}")
+    if todo.priority < TODO_PRIORITIES["normal"]:
+        parts.append("urgent" if todo.priority == TODO_PRIORITIES["urgent"] else "high priority")
+    return ", ".join(parts)
 
 def add_todo(task):
     """Add a task to todo list"""
-    todo = {
-        "task": task,
-        "created": datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
-        "completed": False
-    }
-    todos.append(todo)
-    save_data(TODO_FILE, todos)
-    text_to_speech(f"Added to your to-do list: {task}")
-
-def show_todos():
-    """Show all todos"""
-    active_todos = [t for t in todos if not t.get("completed", False)]
-    if not active_todos:
+    task, priority, due = read_task(task)
+    index = get_todo_index()
+    todo = Todo(task=task, created=now_epoch(), completed=False, priority=priority, due=due)
+    with data_lock:
+        if store is not None:
+            todo.id = store.add("todos", todo)
+            position = None
+        else:
+            todo.id = index.next_id
+            position = len(todos)
+            append_record(TODO_FILE, todos, todo)
+        index.add(todo, position)
+    text_to_speech(f"Added to your to-do list as task {todo.id}: {task}")
+    return todo
+
+def show_todos(page=1):
+    """Read out the most pressing open tasks, TODO_SUMMARY_SIZE at a time"""
+    index = get_todo_index()
+    skip = (page - 1) * TODO_SUMMARY_SIZE
+    with data_lock:
+        total = len(index)
+        page_todos = index.top(skip + TODO_SUMMARY_SIZE)[skip:]
+        index.page = page
+    if not total:
         text_to_speech("Your to-do list is empty")
         return
-    
+    if not page_todos:
+        text_to_speech(f"That's all {total} of your tasks")
+        return
+
     print("\n--- Your To-Do List ---")
-    text_to_speech(f"You have {len(active_todos)} task{'s' if len(active_todos) != 1 else ''}")
-    for idx, todo in enumerate(active_todos, 1):
-        print(f"{idx}. {todo['task']}")
-        text_to_speech(f"Task {idx}: {todo['task']}")
+    if page == 1:
+        heading = f"You have {total} task{'s' if total != 1 else ''}"
+        if total > len(page_todos):
+            heading += f", here are the top {len(page_todos)}"
+    else:
+        heading = f"Tasks {skip + 1} to {skip + len(page_todos)} of {total}"
+    text_to_speech(heading, group="todos")
+    for todo in page_todos:
+        print(f"{todo.id}. {todo.task}" + (f" (due {format_epoch(todo.due)})" if todo.due is not None else ""))
+        text_to_speech(describe_todo(todo), group="todos")
+    remaining = total - skip - len(page_todos)
+    if remaining > 0:
+        text_to_speech(f"and {remaining} more. Say more tasks to hear them", group="todos")
+
+def next_todo():
+    """Say which open task to do next: the most urgent, then the soonest due"""
+    index = get_todo_index()
+    with data_lock:
+        found = index.top(1)
+    if not found:
+        text_to_speech("Your to-do list is empty, nothing to do next")
+        return None
+    text_to_speech(f"Next up is {describe_todo(found[0], 'task')}")
+    return found[0]
+
+def change_todo(todo_id, action, priority=None):
+    """Complete, delete or reprioritize an open task by its id"""
+    index = get_todo_index()
+    with data_lock:
+        todo = index.get(todo_id)
+        if todo is not None:
+            if action == "complete":
+                position = index.remove(todo_id)
+                if store is not None:
+                    store.update("todos", todo_id, completed=1)
+                else:
+                    update_record(TODO_FILE, todos, position, completed=True)
+                todo.completed = True
+            elif action == "delete":
+                position = index.remove(todo_id, shift=store is None)
+                if store is not None:
+                    store.delete("todos", todo_id)
+                else:
+                    delete_record(TODO_FILE, todos, position)
+            else:
+                if store is not None:
+                    store.update("todos", todo_id, priority=priority)
+                else:
+                    update_record(TODO_FILE, todos, index.positions[todo_id], priority=priority)
+                index.update(todo_id, priority=priority)
+    if todo is None:
+        text_to_speech(f"There's no open task {todo_id}")
+    elif action == "complete":
+        text_to_speech(f"Marked task {todo_id} as done: {todo.task}")
+    elif action == "delete":
+        text_to_speech(f"Deleted task {todo_id}: {todo.task}")
+    else:
+        level = next(name for name, value in TODO_PRIORITIES.items() if value == priority)
+        text_to_speech(f"Task {todo_id} is now {level if level == 'urgent' else level + ' priority'}")
+    return todo
+
+# Notes
+NOTES_INDEX_FILE = NOTES_FILE + ".idx"
+NOTE_STOPWORDS = {"a", "an", "the", "about", "for", "of", "on", "in", "to", "my", "me",
+                  "find", "search", "show", "note", "with", "any", "all"}
+
+def tail_lines(path, count, block_size=8192):
+    """Read the last `count` lines of a file by seeking backwards in blocks"""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b""
+        # One extra newline is needed to know the earliest line is complete
+        while position > 0 and data.count(b"\n") <= count:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    lines = data.decode("utf-8", errors="replace").splitlines()
+    return lines[-count:] if count else []
+
+def count_note_lines(path, since=None, block_size=1 << 20):
+    """Count notes by reading the file itself, optionally only those written at or after epoch `since`"""
+    with open(path, "rb") as f:
+        start = 0
+        if since is not None:
+            # Notes are appended in time order, so bisect for the first one at or after `since`
+            cutoff = datetime.datetime.fromtimestamp(since).strftime("[%Y-%m-%d %H:%M:%S]").encode()
+            low, high = 0, os.path.getsize(path)
+            while low < high:
+                middle = (low + high) // 2
+                f.seek(middle - 1 if middle else 0)
+                if middle:
+                    f.readline()  # to the first line starting at or after middle
+                line = f.readline()
+                # Past the last line counts as in range, so the search can settle at the end of the file
+                if line and line[:21] < cutoff:
+                    low = middle + 1
+                else:
+                    high = middle
+            f.seek(low - 1 if low else 0)
+            if low:
+                f.readline()
+            start = f.tell()
+        f.seek(start)
+        return sum(block.count(b"\n") for block in iter(functools.partial(f.read, block_size), b""))
+
+def note_words(text):
+    """Index terms for note text, with plurals folded so invoices matches invoice"""
+    return {w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w for w in tokenize(text)}
+
+def note_timestamp(line):
+    """Epoch seconds of a "[YYYY-MM-DD HH:MM:SS] text" note line, or None"""
+    try:
+        return datetime.datetime.fromisoformat(line[1:20]).timestamp()
+    except ValueError:
+        return None
+
+class NotesIndex:
+    """Sidecar index of NOTES_FILE: line offsets, timestamps and an inverted word index.
+
+    The index remembers how many bytes of the notes file it has seen and
+    catches up on anything appended since, so it never rescans old notes.
+    Catching up on a large file takes a while, so build() runs in the
+    background; until it is ready, counts come from the file itself.
+    """
+
+    def __init__(self, notes_path=NOTES_FILE, index_path=NOTES_INDEX_FILE):
+        self.notes_path = notes_path
+        self.conn = sqlite3.connect(index_path, check_same_thread=False)
+        self.lock = threading.RLock()
+        # The index can always be rebuilt from the notes file, so durability is traded for speed
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        with self.lock, self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+                CREATE TABLE IF NOT EXISTS lines (line INTEGER PRIMARY KEY, offset INTEGER NOT NULL, ts REAL);
+                CREATE INDEX IF NOT EXISTS idx_lines_ts ON lines (ts);
+                CREATE TABLE IF NOT EXISTS postings (word TEXT NOT NULL, line INTEGER NOT NULL);
+                CREATE INDEX IF NOT EXISTS idx_postings_word ON postings (word, line);
+            """)
+        self.ready = threading.Event()
+
+    def build(self):
+        """Catch up on the notes file, then serve counts and searches from the index"""
+        try:
+            self.catch_up()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Notes index error: {e}")
+            return
+        self.ready.set()
+        # Notes saved while the build was finishing were left for it; pick them up
+        self.catch_up()
+
+    def _indexed_bytes(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'indexed_bytes'").fetchone()
+        return row[0] if row else 0
+
+    def _indexed_lines(self):
+        row = self.conn.execute("SELECT MAX(line) FROM lines").fetchone()
+        return 0 if row[0] is None else row[0] + 1
+
+    def catch_up(self):
+        """Index notes appended to the file since the last update"""
+        size = os.path.getsize(self.notes_path) if os.path.exists(self.notes_path) else 0
+        with self.lock, self.conn:
+            indexed = self._indexed_bytes()
+            if size < indexed:
+                # The notes file was replaced or truncated; start over
+                self.conn.execute("DELETE FROM lines")
+                self.conn.execute("DELETE FROM postings")
+                indexed = 0
+            if size == indexed:
+                return
+            line = self._indexed_lines()
+            line_rows, posting_rows = [], []
+            with open(self.notes_path, "rb") as f:
+                f.seek(indexed)
+                offset = indexed
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        break  # a note still being written
+                    text = raw.decode("utf-8", errors="replace")
+                    line_rows.append((line, offset, note_timestamp(text)))
+                    posting_rows.extend((word, line) for word in note_words(text[22:]))
+                    line += 1
+                    offset += len(raw)
+                    if len(line_rows) >= 50000:
+                        # Committed in chunks, so a build cut short by exiting resumes where it stopped
+                        self._insert(line_rows, posting_rows, offset)
+                        self.conn.commit()
+                        line_rows, posting_rows = [], []
+            self._insert(line_rows, posting_rows, offset)
+
+    def _insert(self, line_rows, posting_rows, indexed_bytes):
+        self.conn.executemany("INSERT INTO lines (line, offset, ts) VALUES (?, ?, ?)", line_rows)
+        self.conn.executemany("INSERT INTO postings (word, line) VALUES (?, ?)", posting_rows)
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('indexed_bytes', ?)", (indexed_bytes,))
+
+    def add(self, offset, text):
+        """Index a note that was just appended at `offset`"""
+        if not self.ready.is_set():
+            return  # build() reads it from the file
+        with self.lock, self.conn:
+            if self._indexed_bytes() != offset:
+                self.conn.commit()
+                self.catch_up()
+                return
+            line = self._indexed_lines()
+            self._insert([(line, offset, note_timestamp(text))], [(word, line) for word in note_words(text[22:])],
+                         offset + len(text.encode("utf-8")))
+
+    def count(self, since=None):
+        """Number of notes, optionally only those written at or after epoch `since`"""
+        if not self.ready.is_set():
+            return count_note_lines(self.notes_path, since)
+        with self.lock:
+            if since is None:
+                return self._indexed_lines()
+            return self.conn.execute("SELECT COUNT(*) FROM lines WHERE ts >= ?", (since,)).fetchone()[0]
+
+    def search(self, query, limit=5):
+        """Most recent notes containing every word of the query; None while the index is being built"""
+        if not self.ready.is_set():
+            return None
+        words = [w for w in note_words(query) if w not in NOTE_STOPWORDS]
+        if not words:
+            return []
+        placeholders = ", ".join("?" * len(words))
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT lines.offset FROM postings JOIN lines USING (line) WHERE word IN ({placeholders}) "
+                f"GROUP BY line HAVING COUNT(DISTINCT word) = ? ORDER BY line DESC LIMIT ?",
+                (*words, len(words), limit)).fetchall()
+        results = []
+        with open(self.notes_path, "rb") as f:
+            for (offset,) in rows:
+                f.seek(offset)
+                results.append(f.readline().decode("utf-8", errors="replace").rstrip("\n"))
+        return results
+
+notes_indexes = {}
+
+def get_notes_index():
+    """Open the user's notes index on first use, catching up on notes written since in the background"""
+    user = current_user()
+    with init_lock:
+        if user not in notes_indexes:
+            index = notes_indexes[user] = NotesIndex(user_path(NOTES_FILE), user_path(NOTES_INDEX_FILE))
+            threading.Thread(target=index.build, name="notes-index", daemon=True).start()
+        return notes_indexes[user]
 
 def take_note(note_text):
     """Take a quick note"""
-    with open(NOTES_FILE, "a", encoding='utf-8') as f:
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        f.write(f"[{timestamp}] {note_text}\n")
+    # Binary mode so the byte offsets recorded in the index are exact on every platform
+    index = get_notes_index()
+    with data_lock:
+        with open(user_path(NOTES_FILE), "ab") as f:
+            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            line = f"[{timestamp}] {note_text}\n"
+            offset = f.tell()
+            f.write(line.encode('utf-8'))
+        index.add(offset, line)
     text_to_speech("Note saved successfully")
 
 def read_notes():
     """Read saved notes"""
-    if os.path.exists(NOTES_FILE):
-        with open(NOTES_FILE, "r", encoding='utf-8') as f:
-            notes = f.readlines()
-            if notes:
-                print("\n--- Your Recent Notes ---")
-                text_to_speech(f"You have {len(notes)} note{'s' if len(notes) != 1 else ''}")
-                for note in notes[-5:]:
-                    print(note.strip())
-            else:
-                text_to_speech("You have no notes")
+    count = get_notes_index().count() if os.path.exists(user_path(NOTES_FILE)) else 0
+    if count:
+        print("\n--- Your Recent Notes ---")
+        text_to_speech(f"You have {count} note{'s' if count != 1 else ''}")
+        for note in tail_lines(user_path(NOTES_FILE), 5):
+            print(note.strip())
     else:
         text_to_speech("You have no notes")
 
+def search_notes(query):
+    """Find notes containing the given words"""
+    matches = get_notes_index().search(query) if os.path.exists(user_path(NOTES_FILE)) else []
+    if matches is None:
+        text_to_speech("I'm still indexing your notes. Please ask me again in a minute")
+        return
+    if not matches:
+        text_to_speech(f"I couldn't find any notes about {query}")
+        return
+    print(f"\n--- Notes about '{query}' ---")
+    for note in matches:
+        print(note)
+    text_to_speech(f"I found {len(matches)} note{'s' if len(matches) != 1 else ''} about {query}", group="notes")
+    for note in matches:
+        text_to_speech(note[22:], group="notes")
+
+def count_notes(period=None):
+    """Count notes written today, this week, this month or ever"""
+    now = datetime.datetime.now()
+    start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "week":
+        start -= datetime.timedelta(days=start.weekday())
+    elif period == "month":
+        start = start.replace(day=1)
+    count = get_notes_index().count(None if period is None else start.timestamp()) if os.path.exists(user_path(NOTES_FILE)) else 0
+    when = {"today": " today", "week": " this week", "month": " this month"}.get(period, "")
+    text_to_speech(f"You wrote {count} note{'s' if count != 1 else ''}{when}")
+
+# Contacts
+CONTACT_FILLER = {"the", "for", "to", "my", "number", "of", "phone", "please", "up", "look", "s"}
+SOUNDEX_CODES = {c: str(d) for d, letters in enumerate(["aeiouyhw", "bfpv", "cgjkqsxz", "dt", "l", "mn", "r"])
+                 for c in letters}
+
+def soundex(word):
+    """Four character Soundex code of a word"""
+    word = "".join(c for c in word.lower() if c.isalpha())
+    if not word:
+        return ""
+    code, last = word[0].upper(), SOUNDEX_CODES.get(word[0], "")
+    for c in word[1:]:
+        digit = SOUNDEX_CODES.get(c, "0")
+        if digit != "0" and digit != last:
+            code += digit
+        # h and w do not separate letters with the same code; vowels do
+        if c not in "hw":
+            last = digit
+        if len(code) == 4:
+            break
+    return code.ljust(4, "0")
+
+def phonetic_key(word):
+    """Soundex with the first letter replaced by its code, so Catherine and Katherine agree"""
+    code = soundex(word)
+    return SOUNDEX_CODES.get(code[:1].lower(), "0") + code[1:] if code else ""
+
+def name_trigrams(name):
+    grams = set()
+    for word in name.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+class ContactIndex:
+    """Phonetic and character-trigram index over contact names.
+
+    Lookups gather candidates from the phonetic buckets of the spoken words
+    and from the rarest trigrams of the query, then rank them by trigram
+    similarity with a bonus for sounding alike. Indexing a large address book
+    takes seconds, so the assistant fills it in the background with build().
+    """
+
+    def __init__(self, names=()):
+        self.grams = {}
+        self.sounds = {}
+        self.name_grams = {}
+        self.name_sounds = {}
+        self.full_sounds = {}
+        self.ready = threading.Event()
+        for name in names:
+            self.add(name)
+        self.ready.set()
+
+    def build(self, load_names, chunk=250):
+        """Index the names load_names() returns, a chunk at a time so lookups and saves aren't held up"""
+        with data_lock:
+            names = load_names()
+        for start in range(0, len(names), chunk):
+            with data_lock:
+                for name in names[start:start + chunk]:
+                    self.add(name)
+        self.ready.set()
+
+    def add(self, name):
+        if name in self.name_grams:
+            return
+        grams = name_trigrams(name)
+        sounds = {phonetic_key(word) for word in name.split()}
+        self.name_grams[name] = grams
+        self.name_sounds[name] = sounds
+        for gram in grams:
+            self.grams.setdefault(gram, set()).add(name)
+        for sound in sounds:
+            self.sounds.setdefault(sound, set()).add(name)
+        self.full_sounds.setdefault(tuple(phonetic_key(word) for word in name.split()), set()).add(name)
+
+    def remove(self, name):
+        for gram in self.name_grams.pop(name, ()):
+            self.grams[gram].discard(name)
+        for sound in self.name_sounds.pop(name, ()):
+            self.sounds[sound].discard(name)
+        self.full_sounds.get(tuple(phonetic_key(word) for word in name.split()), set()).discard(name)
+
+    def lookup(self, query, limit=3, rare_grams=6, shortlist=32):
+        """Return up to `limit` (name, score) pairs, best first"""
+        words = [w for w in query.lower().split() if w not in CONTACT_FILLER]
+        if not words:
+            return []
+        query = " ".join(words)
+        if query in self.name_grams:
+            return [(query, 1.0)]
+        query_grams = name_trigrams(query)
+        query_sounds = {phonetic_key(word) for word in words}
+        candidates = set(self.full_sounds.get(tuple(phonetic_key(word) for word in words), ()))
+        # Candidates are counted by how many rare query trigrams and word sounds they share;
+        # Counter.update does the counting in C, and only the best few are scored in full
+        hits = collections.Counter()
+        # Short common words like "lee" sound like thousands of names; only use
+        # word buckets that are selective enough to be worth scoring
+        bucket_limit = 128 if len(words) == 1 else 64
+        for sound in query_sounds:
+            bucket = self.sounds.get(sound, ())
+            if len(bucket) <= bucket_limit:
+                hits.update(bucket)
+        postings = sorted((self.grams[g] for g in query_grams if g in self.grams), key=len)
+        for i, posting in enumerate(postings[:rare_grams]):
+            if i >= 3 and len(posting) > 512:
+                break  # common trigrams such as the start of a short word add cost, not precision
+            hits.update(posting)
+        # Names sharing two or more rare trigrams or sounds are the plausible ones;
+        # a full most_common() sort of every single hit costs more than scoring them
+        shared = [name for name, count in hits.items() if count >= 2]
+        candidates.update(shared if len(shared) <= shortlist else heapq.nlargest(shortlist, shared, key=hits.__getitem__))
+        gram_count, sound_count = len(query_grams), len(query_sounds)
+        name_grams, name_sounds = self.name_grams, self.name_sounds
+        scored = []
+        for name in candidates:
+            grams = name_grams[name]
+            shared = len(query_grams & grams)
+            # Half coverage of what was said, half overall similarity, so "sara" still finds "sarah connor"
+            score = (0.5 * shared / gram_count + 0.5 * shared / (gram_count + len(grams) - shared)
+                     + 0.3 * len(query_sounds & name_sounds[name]) / sound_count)
+            scored.append((score, name))
+        best = heapq.nlargest(limit, scored)
+        return [(name, round(min(score, 1.0), 3)) for score, name in best]
+
+contact_indexes = {}
+
+def get_contact_index():
+    """Start building the user's contact index in the background on first use"""
+    user = current_user()
+    with init_lock:
+        if user not in contact_indexes:
+            # Resolve the user's data here; the build thread has no session to find it by
+            if store is not None:
+                opened = store.data
+                load_names = lambda: [name for name, _ in opened.contacts(limit=-1)]
+            else:
+                data = contacts.data
+                load_names = lambda: list(data)
+            index = contact_indexes[user] = ContactIndex()
+            index.ready.clear()
+            threading.Thread(target=index.build, args=(load_names,), name="contact-index", daemon=True).start()
+        return contact_indexes[user]
+
 def add_contact(name, number):
     """Add a contact"""
-    contacts[name.lower()] = number
-    save_data(CONTACTS_FILE, contacts)
+    if store is not None:
+        store.set_contact(name.lower(), number)
+    else:
+        set_record(CONTACTS_FILE, contacts, name.lower(), number)
+    index = get_contact_index()
+    with data_lock:
+        index.add(name.lower())
     text_to_speech(f"Contact {name} added with number {number}")
 
-def get_contact(name):
-    """Get a contact"""
-    name_lower = name.lower()
-    if name_lower in contacts:
-        number = contacts[name_lower]
-        print(f"\n{name}: {number}")
-        text_to_speech(f"{name}'s number is {number}")
-    else:
+def lookup_number(name):
+    return store.get_contact(name) if store is not None else contacts.get(name)
+
+def get_contact(name, min_score=0.45):
+    """Get a contact, tolerating misheard names"""
+    index = get_contact_index()
+    if not index.ready.is_set():
+        # Exact names can be answered from the store while the index is still filling in
+        spoken = " ".join(w for w in name.lower().split() if w not in CONTACT_FILLER)
+        number = lookup_number(spoken)
+        if number is None:
+            text_to_speech("I'm still loading your contacts. Please ask me again in a moment")
+            return
+        print(f"\n{spoken.title()}: {number}")
+        text_to_speech(f"{spoken.title()}'s number is {number}")
+        return
+    with data_lock:
+        matches = index.lookup(name)
+    if not matches or matches[0][1] < min_score:
         text_to_speech(f"I couldn't find {name} in your contacts")
+        return
+    best = matches[0][0]
+    number = lookup_number(best)
+    print(f"\n{best.title()}: {number}")
+    others = [match for match, score in matches[1:] if score >= min_score]
+    if others:
+        print(f"Other matches: {', '.join(match.title() for match in others)}")
+    text_to_speech(f"{best.title()}'s number is {number}")
 
-def list_contacts():
-    """List all contacts"""
-    if not contacts:
+def list_contacts(page=1):
+    """List contacts, one page at a time"""
+    offset = (page - 1) * LIST_PAGE_SIZE
+    if store is not None:
+        total, page_contacts = store.count_contacts(), store.contacts(LIST_PAGE_SIZE, offset)
+    else:
+        total, page_contacts = len(contacts), list(contacts.items())[offset:offset + LIST_PAGE_SIZE]
+    list_pages[current_user(), "contacts"] = page
+    if not total:
         text_to_speech("Your contact list is empty")
         return
+    if not page_contacts:
+        text_to_speech(f"That's all {total} of your contacts")
+        return
     
     print("\n--- Your Contacts ---")
-    text_to_speech(f"You have {len(contacts)} contact{'s' if len(contacts) != 1 else ''}")
-    for name, number in contacts.items():
+    text_to_speech(f"You have {total} contact{'s' if total != 1 else ''}")
+    for name, number in page_contacts:
         print(f"{name.title()}: {number}")
+    if total > offset + len(page_contacts):
+        print(f"... and {total - offset - len(page_contacts)} more")
+        text_to_speech("Say more contacts to see the rest")
+
+# Calculations
+NUMBER_WORDS = {
+    "zero": 0, "oh": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14,
+    "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19, "twenty": 20,
+    "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90
+}
+NUMBER_SCALES = {"hundred": 100, "thousand": 1000, "million": 10 ** 6, "billion": 10 ** 9}
+# Matched in order, so longer phrases come first: "divided by" wins over "divide"
+OPERATOR_PHRASES = [
+    ("to the power of", "**"), ("raised to the power of", "**"), ("raised to", "**"), ("power of", "**"),
+    ("square root of", "sqrt"), ("square root", "sqrt"), ("multiplied by", "*"), ("divided by", "/"),
+    ("percent of", "percent *"), ("modulo", "mod"), ("power", "**"), ("times", "*"),
+    ("multiply", "*"), ("x", "*"), ("into", "*"), ("over", "/"), ("divide", "/"), ("plus", "+"),
+    ("minus", "-"), ("negative", "-"), ("sqrt", "sqrt"), ("squared", "squared"), ("cubed", "cubed"),
+    ("factorial of", "factorial"), ("percent", "percent"), ("%", "percent"), ("^", "**"), ("×", "*"), ("÷", "/"),
+    ("open bracket", "("), ("close bracket", ")"),
+]
+OPERATOR_SYMBOLS = dict(OPERATOR_PHRASES)
+OPERATOR_PATTERN = re.compile("|".join(
+    rf"(?<![a-z]){re.escape(phrase)}(?![a-z])" if phrase[0].isalpha() else re.escape(phrase)
+    for phrase, _ in OPERATOR_PHRASES))
+CALC_TOKEN = re.compile(r"\d+(?:\.\d+)?|\*\*|[-+*/^%()×÷]|[a-z]+")
+CALC_FUNCTIONS = {"sqrt": math.sqrt, "factorial": math.factorial}
+
+def read_number(words, i):
+    """Read a spoken number such as "twenty five" or "3 point 5"; returns (value, next index)"""
+    total, current, fraction, seen = 0, 0, None, False
+    while i < len(words):
+        word = words[i]
+        if word.replace(".", "", 1).isdigit() and not seen:
+            current = float(word) if "." in word else int(word)
+        elif word in NUMBER_WORDS and fraction is None:
+            current += NUMBER_WORDS[word]
+        elif word in NUMBER_SCALES and seen and fraction is None:
+            if NUMBER_SCALES[word] == 100:
+                current *= 100
+            else:
+                total += current * NUMBER_SCALES[word]
+                current = 0
+        elif word == "and" and seen and i + 1 < len(words) and words[i + 1] in NUMBER_WORDS:
+            pass
+        elif word == "point" and seen and fraction is None:
+            fraction = ""
+        elif fraction is not None and (word in NUMBER_WORDS and NUMBER_WORDS[word] < 10 or word.isdigit()):
+            fraction += str(NUMBER_WORDS.get(word, word))
+        else:
+            break
+        seen = True
+        i += 1
+    value = total + current
+    if fraction:
+        value = float(f"{value}.{fraction}")
+    return value, i
+
+@functools.lru_cache(maxsize=512)
+def normalize_expression(text):
+    """Turn a spoken calculation into space separated number and operator tokens; cached by the spoken text"""
+    text = OPERATOR_PATTERN.sub(lambda m: f" {OPERATOR_SYMBOLS[m.group(0)]} ", text.lower())
+    words = CALC_TOKEN.findall(text)
+    tokens, i = [], 0
+    while i < len(words):
+        word = words[i]
+        if word[0].isdigit() or word in NUMBER_WORDS:
+            value, i = read_number(words, i)
+            tokens.append(repr(value))
+            continue
+        if word in ("**", "*", "/", "+", "-", "mod", "(", ")", "sqrt", "factorial", "squared", "cubed", "percent"):
+            tokens.append(word)
+        i += 1
+    return " ".join(tokens)
+
+class ExpressionParser:
+    """Recursive descent parser from normalized tokens to a whitelisted Python AST"""
+
+    BINARY = {"+": ast.Add, "-": ast.Sub, "*": ast.Mult, "/": ast.Div, "mod": ast.Mod}
+
+    def __init__(self, normalized):
+        self.tokens = normalized.split()
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError("empty expression")
+        node = self.expression()
+        if self.peek() is not None:
+            raise ValueError(f"unexpected {self.peek()!r}")
+        return ast.fix_missing_locations(ast.Expression(node))
+
+    def expression(self):
+        node = self.term()
+        while self.peek() in ("+", "-"):
+            op = self.BINARY[self.take()]()
+            node = ast.BinOp(node, op, self.term())
+        return node
+
+    def term(self):
+        node = self.unary()
+        while self.peek() in ("*", "/", "mod"):
+            op = self.BINARY[self.take()]()
+            node = ast.BinOp(node, op, self.unary())
+        return node
+
+    def unary(self):
+        if self.peek() == "-":
+            self.take()
+            return ast.UnaryOp(ast.USub(), self.unary())
+        if self.peek() == "+":
+            self.take()
+            return self.unary()
+        return self.power()
+
+    def power(self):
+        node = self.postfix()
+        if self.peek() == "**":
+            self.take()
+            # Right associative: 2 ** 3 ** 2 is 2 ** 9
+            node = ast.BinOp(node, ast.Pow(), self.unary())
+        return node
+
+    def postfix(self):
+        node = self.atom()
+        while self.peek() in ("squared", "cubed", "percent", "factorial"):
+            token = self.take()
+            if token == "factorial":
+                node = ast.Call(ast.Name("factorial", ast.Load()), [node], [])
+            elif token == "percent":
+                node = ast.BinOp(node, ast.Div(), ast.Constant(100))
+            else:
+                node = ast.BinOp(node, ast.Pow(), ast.Constant(2 if token == "squared" else 3))
+        return node
+
+    def atom(self):
+        token = self.take()
+        if token is None:
+            raise ValueError("expression ends early")
+        if token == "(":
+            node = self.expression()
+            if self.take() != ")":
+                raise ValueError("missing closing bracket")
+            return node
+        if token in ("sqrt", "factorial"):
+            return ast.Call(ast.Name(token, ast.Load()), [self.unary()], [])
+        try:
+            return ast.Constant(float(token) if "." in token else int(token))
+        except ValueError:
+            raise ValueError(f"unexpected {token!r}")
+
+@functools.lru_cache(maxsize=512)
+def compile_expression(normalized):
+    """Compile normalized tokens to a callable; cached by the normalized text"""
+    code = compile(ExpressionParser(normalized).parse(), "<calculation>", "eval")
+    namespace = {"__builtins__": {}}
+    return lambda: eval(code, namespace, CALC_FUNCTIONS)
+
+def evaluate_expression(expression):
+    """Evaluate a spoken calculation; raises ValueError or ArithmeticError"""
+    return compile_expression(normalize_expression(expression))()
+
+def format_number(value):
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return f"{value:.10g}" if isinstance(value, float) else str(value)
+
+# Calculator processes
+# Expressions run in pre-started worker processes so "9 power 9999999" cannot
+# hold the GIL and stall listening, timers and other clients. Each evaluation
+# gets a CPU budget and the worker a memory cap; a worker that overruns
+# either, or the wall-clock timeout, is killed and replaced. Nothing is ever
+# evaluated in the assistant itself.
+CALC_WORKERS = 2
+CALC_TIMEOUT = 2.0  # seconds a caller waits before the worker is killed
+CALC_CPU_SECONDS = 1
+CALC_MEMORY_LIMIT = 256 * 2 ** 20  # bytes of address space per worker
+CALC_MEMO_SIZE = 256
+
+def calc_worker(conn):
+    """Worker process loop: evaluate normalized expressions from conn under CPU and memory limits"""
+    if resource is not None:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (CALC_MEMORY_LIMIT if hard == resource.RLIM_INFINITY
+                                                else min(CALC_MEMORY_LIMIT, hard), hard))
+    while True:
+        try:
+            normalized = conn.recv()
+        except EOFError:
+            return
+        if resource is not None:
+            # RLIMIT_CPU counts the whole process, so move the limit past what earlier jobs used;
+            # going over it raises SIGXCPU, which ends the worker
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            limit = math.ceil(usage.ru_utime + usage.ru_stime) + CALC_CPU_SECONDS
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            resource.setrlimit(resource.RLIMIT_CPU, (limit if hard == resource.RLIM_INFINITY else min(limit, hard), hard))
+        try:
+            conn.send(("ok", compile_expression(normalized)()))
+        except MemoryError:
+            conn.send(("timeout", None))  # over the memory cap: as much too big as running out of time
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+class CalcPool:
+    """Pre-started calculator processes with a hard timeout and a memo of recent results"""
+
+    def __init__(self, size=CALC_WORKERS):
+        self.size = size
+        # Spawned rather than forked: the assistant has threads holding locks at any time
+        self.context = multiprocessing.get_context("spawn")
+        self.idle = queue.Queue()
+        self.memo = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.started = False
+
+    def start(self):
+        """Begin starting the workers in the background; safe to call again"""
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+        for _ in range(self.size):
+            self._replace()
+
+    def _spawn(self):
+        conn, child = self.context.Pipe()
+        process = self.context.Process(target=calc_worker, args=(child,), name="calculator", daemon=True)
+        process.start()
+        child.close()
+        return process, conn
+
+    def _replace(self):
+        """Put a fresh worker in the idle queue without making the caller wait for it"""
+
+        def spawn():
+            try:
+                self.idle.put(self._spawn())
+            except Exception as e:
+                print(f"Calculator error: {e}")
+                self.idle.put(None)
+
+        threading.Thread(target=spawn, name="calculator-spawn", daemon=True).start()
+
+    def _retire(self, worker):
+        process, conn = worker
+        process.kill()
+        process.join()
+        conn.close()
+        self._replace()
+
+    def _run(self, normalized):
+        """(status, value) of one evaluation; "crashed" and "unavailable" are worker failures, not answers"""
+        worker = self.idle.get()
+        if worker is None:
+            # Processes could not be started; try again for the next caller rather than
+            # evaluating here, where a runaway expression would stall the assistant
+            self._replace()
+            return "unavailable", None
+        process, conn = worker
+        start = time_module.perf_counter()
+        try:
+            conn.send(normalized)
+            if conn.poll(CALC_TIMEOUT):
+                outcome = conn.recv()
+                self.idle.put(worker)
+                return outcome
+            status = "timeout"
+        except (EOFError, OSError):
+            # SIGXCPU is the CPU budget running out; any other end is the worker's own fault
+            process.join(1)
+            status = "timeout" if process.exitcode == -getattr(signal, "SIGXCPU", 0) else "crashed"
+        finally:
+            if tracer.enabled:
+                tracer.record("calculate", time_module.perf_counter() - start)
+        self._retire(worker)
+        return status, None
+
+    def evaluate(self, normalized):
+        """Value of a normalized expression; raises ValueError, ArithmeticError, TimeoutError or RuntimeError"""
+        compile_expression(normalized)  # parse errors are cheap to find here
+        with self.lock:
+            outcome = self.memo.get(normalized)
+            if outcome is not None:
+                self.memo.move_to_end(normalized)
+        if outcome is None:
+            self.start()
+            outcome = self._run(normalized)
+            if outcome[0] == "crashed":
+                outcome = self._run(normalized)  # once more, on a fresh worker
+            if outcome[0] in ("ok", "error", "timeout"):
+                # Timeouts are remembered too, so asking again is refused at once
+                with self.lock:
+                    self.memo[normalized] = outcome
+                    if len(self.memo) > CALC_MEMO_SIZE:
+                        self.memo.popitem(last=False)
+        status, value = outcome
+        if status == "ok":
+            return value
+        if status == "timeout":
+            raise TimeoutError("calculation ran out of time")
+        if status == "error":
+            raise ArithmeticError(value)
+        raise RuntimeError(f"calculator process {status}")
+
+calc_pool = LazyObject(CalcPool)
 
 def calculate(expression):
     """Perform calculations"""
     try:
-        expression = expression.replace("plus", "+").replace("minus", "-")
-        expression = expression.replace("times", "*").replace("multiply", "*").replace("multiplied by", "*")
-        expression = expression.replace("divided by", "/").replace("divide", "/")
-        expression = expression.replace("power", "**").replace("to the power of", "**")
-        expression = expression.replace("squared", "**2").replace("cubed", "**3")
-        expression = expression.replace("square root of", "math.sqrt(").replace("sqrt", "math.sqrt(")
-        
-        if "sqrt" in expression or "math.sqrt" in expression:
-            expression = expression.replace("math.sqrt(", "math.sqrt(") + ")" if expression.count("(") > expression.count(")") else expression
-        
-        result = eval(expression, {"__builtins__": {}, "math": math})
-        print(f"\nCalculation: {expression}")
-        print(f"Result: {result}")
-        text_to_speech(f"The answer is {result}")
-        return result
+        normalized = normalize_expression(expression)
+        result = calc_pool.evaluate(normalized)
+        spoken = format_number(result)
+    except TimeoutError:
+        text_to_speech("Sorry, that calculation is too big for me")
+        return None
     except Exception as e:
         text_to_speech("Sorry, I couldn't calculate that")
         return None
+    print(f"\nCalculation: {normalized}")
+    print(f"Result: {spoken}")
+    text_to_speech(f"The answer is {spoken}")
+    return result
+
+# Unit conversion
+# Each unit is (factor, offset) such that base = value * factor + offset
+UNIT_DEFINITIONS = {
+    "length": {
+        "meter": (1.0, 0.0), "kilometer": (1000.0, 0.0), "centimeter": (0.01, 0.0), "millimeter": (0.001, 0.0),
+        "mile": (1609.344, 0.0), "yard": (0.9144, 0.0), "foot": (0.3048, 0.0), "inch": (0.0254, 0.0),
+        "nautical mile": (1852.0, 0.0),
+    },
+    "mass": {
+        "kilogram": (1.0, 0.0), "gram": (0.001, 0.0), "milligram": (1e-6, 0.0), "pound": (0.45359237, 0.0),
+        "ounce": (0.028349523125, 0.0), "stone": (6.35029318, 0.0), "tonne": (1000.0, 0.0),
+    },
+    "temperature": {
+        "kelvin": (1.0, 0.0), "celsius": (1.0, 273.15), "fahrenheit": (5 / 9, 273.15 - 32 * 5 / 9),
+    },
+    "volume": {
+        "liter": (1.0, 0.0), "milliliter": (0.001, 0.0), "cubic meter": (1000.0, 0.0), "gallon": (3.785411784, 0.0),
+        "quart": (0.946352946, 0.0), "pint": (0.473176473, 0.0), "cup": (0.2365882365, 0.0),
+        "fluid ounce": (0.0295735295625, 0.0), "tablespoon": (0.01478676478125, 0.0),
+        "teaspoon": (0.00492892159375, 0.0),
+    },
+    "time": {
+        "second": (1.0, 0.0), "millisecond": (0.001, 0.0), "minute": (60.0, 0.0), "hour": (3600.0, 0.0),
+        "day": (86400.0, 0.0), "week": (604800.0, 0.0), "year": (31557600.0, 0.0),
+    },
+    "speed": {
+        "meter per second": (1.0, 0.0), "kilometer per hour": (1 / 3.6, 0.0), "mile per hour": (0.44704, 0.0),
+        "knot": (1852 / 3600, 0.0),
+    },
+}
+UNIT_ALIASES = {
+    "m": "meter", "metre": "meter", "km": "kilometer", "kilometre": "kilometer", "cm": "centimeter",
+    "centimetre": "centimeter", "mm": "millimeter", "millimetre": "millimeter", "feet": "foot", "ft": "foot",
+    "inches": "inch", "yd": "yard", "kg": "kilogram", "kilo": "kilogram", "g": "gram", "mg": "milligram",
+    "lb": "pound", "lbs": "pound", "oz": "ounce", "ton": "tonne", "c": "celsius", "centigrade": "celsius",
+    "f": "fahrenheit", "k": "kelvin", "litre": "liter", "l": "liter", "millilitre": "milliliter", "ml": "milliliter",
+    "sec": "second", "min": "minute", "hr": "hour", "ms": "millisecond", "mph": "mile per hour",
+    "kph": "kilometer per hour", "kmh": "kilometer per hour",
+}
+
+class UnitConverter:
+    """Converts between any two units of a dimension in O(1).
+
+    Every dimension gets precomputed scale and shift matrices, so a
+    conversion is value * scale[i][j] + shift[i][j]; the shift is only
+    non-zero between temperature scales.
+    """
+
+    def __init__(self, definitions, aliases):
+        self.units = {}
+        self.tables = {}
+        for dimension, units in definitions.items():
+            names = list(units)
+            scale = [[units[a][0] / units[b][0] for b in names] for a in names]
+            # Rounded so 0 celsius comes out as 32 fahrenheit rather than 31.999999999999986
+            shift = [[round((units[a][1] - units[b][1]) / units[b][0], 9) for b in names] for a in names]
+            self.tables[dimension] = (scale, shift)
+            for index, name in enumerate(names):
+                for alias in (name, self.plural(name)):
+                    self.units[alias] = (dimension, index, name)
+        for alias, name in aliases.items():
+            self.units[alias] = self.units[name]
+
+    @staticmethod
+    def plural(name):
+        words = name.split()
+        # "miles per hour" but "fluid ounces"
+        i = 0 if "per" in words else len(words) - 1
+        words[i] = words[i] + ("es" if words[i].endswith(("ch", "s")) else "s")
+        return " ".join(words)
+
+    def lookup(self, unit):
+        """Return (dimension, index, canonical name) for a spoken unit"""
+        unit = " ".join(w for w in unit.lower().replace(".", "").split() if w not in ("degree", "degrees"))
+        if unit not in self.units:
+            raise ValueError(f"Unknown unit: {unit}")
+        return self.units[unit]
+
+    def factors(self, from_unit, to_unit):
+        from_dimension, i, _ = self.lookup(from_unit)
+        to_dimension, j, _ = self.lookup(to_unit)
+        if from_dimension != to_dimension:
+            raise ValueError(f"Cannot convert {from_dimension} to {to_dimension}")
+        scale, shift = self.tables[from_dimension]
+        return scale[i][j], shift[i][j]
+
+    def convert(self, value, from_unit, to_unit):
+        scale, shift = self.factors(from_unit, to_unit)
+        return value * scale + shift
+
+    def convert_batch(self, values, from_unit, to_unit):
+        """Convert a whole sequence of values in one call; returns a NumPy array when NumPy is installed"""
+        scale, shift = self.factors(from_unit, to_unit)
+        if np is not None:
+            return np.asarray(values, dtype=float) * scale + shift
+        return [value * scale + shift for value in values]
+
+unit_converter = UnitConverter(UNIT_DEFINITIONS, UNIT_ALIASES)
+
+def convert_units(value, from_unit, to_unit):
+    """Convert between units"""
+    try:
+        result = unit_converter.convert(value, from_unit, to_unit)
+    except ValueError:
+        text_to_speech(f"Sorry, I can't convert from {from_unit} to {to_unit}")
+        return None
+    text_to_speech(f"{format_number(value)} {from_unit} is {result:.2f} {to_unit}")
+    print(f"{format_number(value)} {from_unit} = {result:.2f} {to_unit}")
+    return result
+
+# System monitoring
+SAMPLE_INTERVAL = float(os.environ.get("VIRUS_SAMPLE_INTERVAL", "5"))
+SAMPLE_HISTORY_SECONDS = 24 * 3600
+METRIC_NAMES = {"cpu": "CPU usage", "memory": "memory usage", "battery": "battery level"}
+
+class SystemSampler:
+    """Samples CPU, memory, battery and our own process into a fixed-size ring buffer"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL, history=SAMPLE_HISTORY_SECONDS):
+        self.interval = interval
+        self.samples = collections.deque(maxlen=max(1, int(history / interval)))
+        self.process = psutil.Process()
+        self.cpu_time = 0.0
+        self.started = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        # cpu_percent(None) measures since the previous call, so prime it once
+        psutil.cpu_percent(None)
+        self.process.cpu_percent(None)
+        self.primed = time_module.monotonic()
+
+    def start(self):
+        if self._thread is None:
+            self.started = time_module.monotonic()
+            self.sample()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        """Take one sample without blocking; returns it"""
+        # Only the very first sample can come too soon after priming to be meaningful
+        wait = self.primed + 0.1 - time_module.monotonic()
+        if wait > 0:
+            time_module.sleep(wait)
+        cost = time_module.thread_time()
+        battery = psutil.sensors_battery()
+        with self.process.oneshot():
+            process_cpu = self.process.cpu_percent(None)
+            process_rss = self.process.memory_info().rss
+        sample = {
+            "time": time_module.monotonic(),
+            "cpu": psutil.cpu_percent(None),
+            "memory": psutil.virtual_memory().percent,
+            "battery": battery.percent if battery else None,
+            "plugged": battery.power_plugged if battery else None,
+            "process_cpu": process_cpu,
+            "process_rss": process_rss
+        }
+        with self._lock:
+            self.samples.append(sample)
+            self.cpu_time += time_module.thread_time() - cost
+        return sample
+
+    def latest(self):
+        with self._lock:
+            return self.samples[-1] if self.samples else None
+
+    def summary(self, metric, seconds):
+        """min, max, mean and p95 of a metric over the last `seconds`, or None without data"""
+        cutoff = time_module.monotonic() - seconds
+        with self._lock:
+            values = sorted(s[metric] for s in reversed(self.samples) if s["time"] >= cutoff and s[metric] is not None)
+        if not values:
+            return None
+        return {
+            "min": values[0],
+            "max": values[-1],
+            "mean": sum(values) / len(values),
+            "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+            "samples": len(values)
+        }
 
-def convert_units(value, from_unit, to_unit):
-    """Convert between units"""
-    conversions = {
-        ("celsius", "fahrenheit"): lambda x: (x * 9/5) + 32,
-        ("fahrenheit", "celsius"): lambda x: (x - 32) * 5/9,
-        ("kilometers", "miles"): lambda x: x * 0.621371,
-        ("miles", "kilometers"): lambda x: x * 1.60934,
-        ("meters", "feet"): lambda x: x * 3.28084,
-        ("feet", "meters"): lambda x: x * 0.3048,
-        ("kilograms", "pounds"): lambda x: x * 2.20462,
-        ("pounds", "kilograms"): lambda x: x * 0.453592,
-    }
-    
-    key = (from_unit.lower(), to_unit.lower())
-    if key in conversions:
-        result = conversions[key](value)
-        text_to_speech(f"{value} {from_unit} is {result:.2f} {to_unit}")
-        print(f"{value} {from_unit} = {result:.2f} {to_unit}")
-    else:
-        text_to_speech(f"Sorry, I can't convert from {from_unit} to {to_unit}")
+    def overhead(self):
+        """Fraction of one core spent sampling since start"""
+        elapsed = time_module.monotonic() - self.started if self.started else 0
+        return self.cpu_time / elapsed if elapsed else 0.0
+
+sampler = None
+
+def get_sampler():
+    """Start the background system sampler on first use"""
+    global sampler
+    with init_lock:
+        if sampler is None:
+            sampler = SystemSampler().start()
+    return sampler
 
 def get_system_info():
     """Get system information"""
+    sample = get_sampler().latest()
     info = {
         "OS": platform.system(),
         "OS Version": platform.version(),
         "Machine": platform.machine(),
         "Processor": platform.processor(),
-        "CPU Usage": f"{psutil.cpu_percent(interval=1)}%",
-        "Memory Usage": f"{psutil.virtual_memory().percent}%",
-        "Battery": f"{psutil.sensors_battery().percent}%" if psutil.sensors_battery() else "Not Available"
+        "CPU Usage": f"{sample['cpu']}%",
+        "Memory Usage": f"{sample['memory']}%",
+        "Battery": f"{sample['battery']}%" if sample["battery"] is not None else "Not Available"
     }
     
     print("\n--- System Information ---")
@@ -289,9 +3198,40 @@ def get_system_info():
     
     text_to_speech(f"Your system is running {info['OS']} with {info['CPU Usage']} CPU usage and {info['Memory Usage']} memory usage")
 
-def open_application(app_name):
-    """Open applications on PC"""
-    apps = {
+def get_system_history(metric, statistic, seconds):
+    """Report the min, max, average or p95 of a metric over a recent window"""
+    summary = get_sampler().summary(metric, seconds)
+    count, unit = (seconds // 3600, "hour") if seconds % 3600 == 0 else (seconds // 60, "minute")
+    window = unit if count == 1 else f"{count} {unit}s"
+    if summary is None:
+        text_to_speech(f"I have no {METRIC_NAMES[metric]} readings for the last {window}")
+        return None
+    words = {"max": "peak", "min": "lowest", "mean": "average", "p95": "95th percentile"}
+    value = summary[statistic]
+    print(f"\n{METRIC_NAMES[metric]} over the last {window}: min {summary['min']:.1f}%, max {summary['max']:.1f}%, "
+          f"mean {summary['mean']:.1f}%, p95 {summary['p95']:.1f}% ({summary['samples']} samples)")
+    text_to_speech(f"Your {words[statistic]} {METRIC_NAMES[metric]} in the last {window} was {value:.0f}%")
+    return value
+
+def performance_report():
+    """Print per-stage latencies and speak the slowest stage"""
+    if not tracer.enabled:
+        text_to_speech("Tracing is off. Start me with the trace option to collect a performance report.")
+        return
+    if not tracer.stages:
+        text_to_speech("I have not timed anything yet")
+        return
+    print("\n--- Performance report ---")
+    print(tracer.report())
+    stage = max(tracer.stages, key=lambda name: tracer.percentile(name, 0.95))
+    text_to_speech(f"Over {tracer.turn} turns the slowest stage is {stage.replace('_', ' ')}, "
+                   f"at {tracer.percentile(stage, 0.95) * 1000:.0f} milliseconds at the 95th percentile")
+
+# Application launcher
+APPS_INDEX_FILE = "virus_apps.json"
+# Names that work without the index, per platform
+BUILTIN_APPS = {
+    "Windows": {
         "notepad": "notepad.exe",
         "calculator": "calc.exe",
         "paint": "mspaint.exe",
@@ -299,22 +3239,246 @@ def open_application(app_name):
         "file explorer": "explorer.exe",
         "task manager": "taskmgr.exe",
         "control panel": "control.exe",
-        "settings": "ms-settings:",
-        "browser": "start chrome" if platform.system() == "Windows" else "open -a 'Google Chrome'",
-    }
-    
-    app_name_lower = app_name.lower()
-    if app_name_lower in apps:
+        "settings": "start ms-settings:",
+        "browser": "start chrome",
+    },
+    "Darwin": {"browser": "open -a 'Google Chrome'"},
+}
+DESKTOP_FIELD_CODES = re.compile(r"%[fFuUdDnNickvm]")
+# Programs on $PATH that must never start from a voice command, whatever they are called
+SYSTEM_COMMANDS = {
+    "shutdown", "reboot", "poweroff", "halt", "init", "telinit", "systemctl", "loginctl", "sudo", "su", "doas",
+    "pkexec", "runas", "rm", "rmdir", "del", "dd", "mkfs", "fdisk", "parted", "format", "diskpart", "kill",
+    "killall", "pkill", "taskkill", "passwd", "chmod", "chown", "mount", "umount", "logout", "bcdedit",
+}
+
+def app_key(text):
+    """Index key for an application name, so GNOME-Terminal becomes gnome terminal"""
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+def app_dirs():
+    """Directories of launcher entries, lowest precedence first.
+
+    Only programs installed to be launched by name are indexed for fuzzy
+    matching; bare executables on $PATH are left to find_executable().
+    """
+    dirs = []
+    system = platform.system()
+    if system == "Darwin":
+        dirs += ["/System/Applications", "/Applications", os.path.expanduser("~/Applications")]
+    elif system != "Windows":
+        data_dirs = os.environ.get("XDG_DATA_DIRS") or "/usr/local/share:/usr/share"
+        data_home = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+        dirs += [os.path.join(d, "applications") for d in reversed(data_dirs.split(":"))]
+        dirs += ["/var/lib/flatpak/exports/share/applications", os.path.join(data_home, "applications")]
+    return list(dict.fromkeys(d for d in dirs if d))
+
+def read_desktop_entry(path):
+    """(names, argv) from a .desktop file, or None for hidden entries and ones that are not applications"""
+    fields, in_entry = {}, False
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith("["):
+                    if in_entry:
+                        break
+                    in_entry = line == "[Desktop Entry]"
+                elif in_entry and "=" in line:
+                    key, _, value = line.partition("=")
+                    fields.setdefault(key.strip(), value.strip())
+    except OSError:
+        return None
+    if (fields.get("Type", "Application") != "Application" or "true" in (fields.get("NoDisplay"), fields.get("Hidden"))
+            or not fields.get("Name") or not fields.get("Exec")):
+        return None
+    try:
+        argv = shlex.split(DESKTOP_FIELD_CODES.sub("", fields["Exec"]).replace("%%", "%"))
+    except ValueError:
+        return None
+    # "Web Browser" and "Text Editor" let people ask for the kind of program
+    names = [app_key(fields[key]) for key in ("GenericName", "Name") if fields.get(key)]
+    return names, argv
+
+def scan_app_dir(directory, previous=None):
+    """{file name: [mtime, {name: command}]} for the launcher entries in a directory.
+
+    Files whose mtime matches their entry in previous are not read again.
+    """
+    files, previous = {}, previous or {}
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return files
+    for entry in entries:
+        stem, extension = os.path.splitext(entry.name)
+        if extension not in (".desktop", ".app"):
+            continue
         try:
-            if platform.system() == "Windows":
-                subprocess.Popen(apps[app_name_lower], shell=True)
-            else:
-                os.system(apps[app_name_lower])
-            text_to_speech(f"Opening {app_name}")
-        except Exception as e:
-            text_to_speech(f"Sorry, I couldn't open {app_name}")
-    else:
-        text_to_speech(f"I don't know how to open {app_name}")
+            if not (entry.is_file() or extension == ".app"):
+                continue
+            mtime = entry.stat().st_mtime
+        except OSError:
+            continue
+        known = previous.get(entry.name)
+        if known is not None and known[0] == mtime:
+            files[entry.name] = known
+            continue
+        found = {}
+        if extension == ".desktop":
+            desktop = read_desktop_entry(entry.path)
+            if desktop:
+                found = dict.fromkeys(desktop[0], desktop[1])
+        else:
+            found[app_key(stem)] = ["open", "-a", entry.path]
+        found.pop("", None)
+        if found:
+            files[entry.name] = [mtime, found]
+    return files
+
+class AppIndex:
+    """Installed applications by spoken name, scanned once and persisted.
+
+    Each directory is saved with its mtime, which changes whenever an entry
+    is added or removed, so a refresh only rescans the directories that
+    changed, and within those only the files that changed. Names are
+    matched with the fuzzy contact index.
+    """
+
+    def __init__(self, path=APPS_INDEX_FILE):
+        self.path = path
+        self.dirs = {}  # directory -> {"mtime": ..., "files": {file name: [mtime, {name: command}]}}
+        self.apps = {}
+        self.names = ContactIndex()
+        self.lock = threading.Lock()
+        try:
+            with open(path, encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("version") == SNAPSHOT_VERSION:
+                self.dirs = saved["dirs"]
+        except (OSError, ValueError, AttributeError, KeyError):
+            pass
+
+    def refresh(self, directories=None):
+        """Rescan the directories whose mtime changed; returns how many were scanned"""
+        directories = app_dirs() if directories is None else directories
+        with self.lock:
+            current, scanned = {}, 0
+            for directory in directories:
+                try:
+                    mtime = os.stat(directory).st_mtime
+                except OSError:
+                    continue
+                known = self.dirs.get(directory)
+                if known is None or known["mtime"] != mtime:
+                    known = {"mtime": mtime, "files": scan_app_dir(directory, known and known["files"])}
+                    scanned += 1
+                current[directory] = known
+            if self.apps and not scanned and list(current) == list(self.dirs):
+                return 0
+            apps = {}
+            for known in current.values():
+                for _, found in known["files"].values():
+                    apps.update(found)
+            for name in self.apps.keys() - apps.keys():
+                self.names.remove(name)
+            for name in apps.keys() - self.apps.keys():
+                self.names.add(name)
+            changed = scanned or list(current) != list(self.dirs)
+            self.dirs, self.apps = current, apps
+            if changed:
+                self.save()
+            return scanned
+
+    def save(self):
+        temp = self.path + ".tmp"
+        try:
+            with open(temp, 'w', encoding="utf-8") as f:
+                f.write(json.dumps({"version": SNAPSHOT_VERSION, "dirs": self.dirs}))
+            os.replace(temp, self.path)
+        except OSError as e:
+            print(f"Could not save the application index: {e}")
+
+    def lookup(self, spoken, min_score=0.5, fuzzy=True):
+        """(name, command) of the best match for a spoken application name, or None"""
+        query = app_key(spoken)
+        with self.lock:
+            if query in self.apps:
+                return query, self.apps[query]
+            if not fuzzy:
+                return None
+            matches = self.names.lookup(query, limit=1)
+            if matches and matches[0][1] >= min_score:
+                return matches[0][0], self.apps[matches[0][0]]
+        return None
+
+class AppLauncher:
+    """Starts programs from an asyncio loop on its own thread, never waiting for them to exit"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name="launcher", daemon=True).start()
+
+    def launch(self, command):
+        """Spawn an argv list or shell string; returns a future for the process"""
+        return asyncio.run_coroutine_threadsafe(self._spawn(command, time_module.perf_counter()), self.loop)
+
+    async def _spawn(self, command, requested):
+        options = {"stdin": subprocess.DEVNULL, "stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+        if platform.system() != "Windows":
+            options["start_new_session"] = True  # Ctrl+C in the assistant should not close the app
+        if isinstance(command, str):
+            process = await asyncio.create_subprocess_shell(command, **options)
+        else:
+            process = await asyncio.create_subprocess_exec(*command, **options)
+        if tracer.enabled:
+            tracer.record("spawn", time_module.perf_counter() - requested)
+        self.loop.create_task(process.wait())  # reap it whenever it exits
+        return process
+
+def find_executable(spoken, search_path=None):
+    """(name, [path]) of a program on $PATH whose name is exactly what was said, or None.
+
+    sbin directories and SYSTEM_COMMANDS are never searched, so a misheard
+    request cannot start shutdown or rm.
+    """
+    key = app_key(spoken)
+    if not key:
+        return None
+    directories = (os.environ.get("PATH", "") if search_path is None else search_path).split(os.pathsep)
+    search_path = os.pathsep.join(d for d in directories if d and os.path.basename(d.rstrip("/\\")) != "sbin")
+    for candidate in dict.fromkeys((key.replace(" ", "-"), key.replace(" ", "_"), key.replace(" ", ""))):
+        path = shutil.which(candidate, path=search_path)
+        if path is not None:
+            stem = os.path.splitext(os.path.basename(path))[0].lower()
+            if app_key(stem) == key and stem not in SYSTEM_COMMANDS:
+                return key, [path]
+    return None
+
+app_index = LazyObject(AppIndex)
+launcher = LazyObject(AppLauncher)
+
+def open_application(app_name, timeout=5):
+    """Open applications on PC"""
+    builtin = BUILTIN_APPS.get(platform.system(), {})
+    name, command = app_name.lower(), builtin.get(app_name.lower())
+    if command is None:
+        app_index.refresh()
+        # A launcher entry by name, then a program by its exact name, then the nearest launcher entry
+        match = app_index.lookup(app_name, fuzzy=False) or find_executable(app_name) or app_index.lookup(app_name)
+        if match is None:
+            text_to_speech(f"I don't know how to open {app_name}")
+            return None
+        name, command = match
+    try:
+        # Only the spawn is waited for; the application runs on its own
+        process = launcher.launch(command).result(timeout)
+    except Exception as e:
+        print(f"Launch error: {e}")
+        text_to_speech(f"Sorry, I couldn't open {name}")
+        return None
+    text_to_speech(f"Opening {name}")
+    return process
 
 def get_weather_info():
     """Get weather information"""
@@ -343,40 +3507,482 @@ def tell_joke():
     print(f"\n{joke}")
     text_to_speech(joke)
 
+# Meetings calendar
+MEETING_TIME_FORMAT = "%Y-%m-%d %H:%M"
+MEETING_MINUTES = 60
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+MONTHS = ["january", "february", "march", "april", "may", "june", "july", "august", "september", "october",
+          "november", "december"]
+ORDINALS = {
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5, "sixth": 6, "seventh": 7, "eighth": 8,
+    "ninth": 9, "tenth": 10, "eleventh": 11, "twelfth": 12, "thirteenth": 13, "fourteenth": 14, "fifteenth": 15,
+    "sixteenth": 16, "seventeenth": 17, "eighteenth": 18, "nineteenth": 19, "twentieth": 20, "thirtieth": 30
+}
+# Hour used when only a part of the day is given, as in "tomorrow morning"
+DAY_PARTS = {"morning": 9, "noon": 12, "midday": 12, "afternoon": 14, "evening": 18, "tonight": 20, "night": 20}
+TIME_UNITS = {"minute": 1, "minutes": 1, "min": 1, "mins": 1, "hour": 60, "hours": 60, "day": 1440, "days": 1440,
+              "week": 10080, "weeks": 10080}
+
+def when_tokens(text):
+    """Lowercase words of a spoken time, with spoken numbers and ordinals turned into digits"""
+    text = re.sub(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b",
+                  lambda m: f"{MONTHS[int(m[2]) - 1]} {int(m[3])} {m[1]}" if 1 <= int(m[2]) <= 12 else m[0],
+                  text.lower())
+    text = re.sub(r"(?<![a-z])([ap])\.?\s?m(?![a-z])\.?", r" \1m", text)
+    words = re.findall(r"\d+:\d\d|\d+|[a-z]+", text)
+    tokens = []
+    i = 0
+    while i < len(words):
+        word = words[i]
+        value = ORDINALS.get(word, NUMBER_WORDS.get(word) if word != "oh" else None)
+        if value is None:
+            # "5th" arrives as "5" and "th"
+            if not (word in ("st", "nd", "rd", "th") and tokens and tokens[-1].isdigit()):
+                tokens.append(word)
+            i += 1
+            continue
+        # "twenty five" and "twenty third" are one number
+        if value in (20, 30, 40, 50) and i + 1 < len(words):
+            units = ORDINALS.get(words[i + 1], NUMBER_WORDS.get(words[i + 1]))
+            if units is not None and 1 <= units <= 9:
+                value += units
+                i += 1
+        tokens.append(str(value))
+        i += 1
+    return tokens
+
+def read_duration(tokens, i):
+    """(minutes, next index) for a span such as "an hour and a half" at tokens[i], or None"""
+    total = 0
+    while i < len(tokens):
+        count = None
+        if tokens[i].isdigit():
+            count, i = int(tokens[i]), i + 1
+        elif tokens[i] in ("a", "an"):
+            count, i = 1, i + 1
+        elif tokens[i] == "half":
+            count, i = 0.5, i + 1
+            if i < len(tokens) and tokens[i] in ("a", "an"):
+                i += 1
+        if count is None or i >= len(tokens) or tokens[i] not in TIME_UNITS:
+            break
+        unit = TIME_UNITS[tokens[i]]
+        total += count * unit
+        i += 1
+        if tokens[i:i + 3] == ["and", "a", "half"]:
+            total += unit / 2
+            i += 3
+        elif tokens[i:i + 1] == ["and"]:
+            i += 1
+    return (int(total), i) if total else None
+
+def read_clock(tokens, i):
+    """(hour, minute, meridiem given, next index) for a clock time at tokens[i], or None"""
+    word = tokens[i]
+    following = tokens[i + 1] if i + 1 < len(tokens) else None
+    if word in ("noon", "midday", "midnight"):
+        return (0 if word == "midnight" else 12), 0, True, i + 1
+    # In "from 2 to 3" the "to" starts the end time rather than meaning minutes before 3
+    ranged = i > 0 and tokens[i - 1] in ("from", "between")
+    if (word in ("half", "quarter") or word.isdigit() and not ranged) and following in ("past", "after", "to", "before"):
+        if i + 2 >= len(tokens) or not tokens[i + 2].isdigit():
+            return None
+        minutes = {"half": 30, "quarter": 15}.get(word) or int(word)
+        if minutes > (59 if following in ("past", "after") else 60):
+            return None  # "330 to 5" is not a time
+        hour = int(tokens[i + 2])
+        hour, minute = (hour, minutes) if following in ("past", "after") else ((hour - 1) % 24, 60 - minutes)
+        i += 3
+    elif ":" in word:
+        hour, minute = map(int, word.split(":"))
+        i += 1
+    elif word.isdigit() and len(word) in (3, 4):
+        hour, minute = int(word[:-2]), int(word[-2:])  # "1530", or "330" from "3.30"
+        i += 1
+    elif word.isdigit():
+        hour, minute = int(word), 0
+        i += 1
+        if following == "oh" and i + 1 < len(tokens) and tokens[i + 1].isdigit() and int(tokens[i + 1]) < 10:
+            minute, i = int(tokens[i + 1]), i + 2  # "three oh five"
+        elif following is not None and following.isdigit() and len(following) == 2:
+            minute, i = int(following), i + 1  # "three thirty", "15 45"
+    else:
+        return None
+    if hour > 24 or minute > 59:
+        return None
+    hour %= 24
+    meridiem = False
+    if i < len(tokens) and tokens[i] in ("am", "pm"):
+        if hour > 12:
+            return None
+        hour = hour % 12 + (12 if tokens[i] == "pm" else 0)
+        meridiem, i = True, i + 1
+    elif tokens[i:i + 2] == ["o", "clock"]:
+        i += 2
+    if tokens[i:i + 2] == ["in", "the"] and i + 2 < len(tokens) and tokens[i + 2] in ("morning", "afternoon", "evening"):
+        if not meridiem and tokens[i + 2] != "morning" and hour < 12:
+            hour += 12
+        meridiem, i = True, i + 3
+    return hour, minute, meridiem, i
+
+def read_day(tokens, i, today):
+    """(date, next index) for a spoken day at tokens[i], or None"""
+    word = tokens[i]
+    if word in ("today", "tonight"):
+        return today, i + 1
+    if word == "tomorrow":
+        return today + datetime.timedelta(days=1), i + 1
+    if tokens[i:i + 3] == ["day", "after", "tomorrow"]:
+        return today + datetime.timedelta(days=2), i + 3
+    if tokens[i:i + 2] == ["next", "week"]:
+        return today + datetime.timedelta(days=7), i + 2
+    j = i + 1 if word in ("next", "this", "on") else i
+    if j < len(tokens) and tokens[j] in WEEKDAYS:
+        ahead = (WEEKDAYS.index(tokens[j]) - today.weekday()) % 7
+        if ahead == 0 and word != "this":
+            ahead = 7
+        return today + datetime.timedelta(days=ahead), j + 1
+    month = day = None
+    if word in MONTHS:
+        j = i + 1 + (tokens[i + 1:i + 2] == ["the"])
+        if j < len(tokens) and tokens[j].isdigit():
+            month, day, j = MONTHS.index(word) + 1, int(tokens[j]), j + 1
+    elif word.isdigit():
+        j = i + 1 + (tokens[i + 1:i + 2] == ["of"])
+        if j < len(tokens) and tokens[j] in MONTHS:
+            month, day, j = MONTHS.index(tokens[j]) + 1, int(word), j + 1
+    elif word == "the" and i + 1 < len(tokens) and tokens[i + 1].isdigit():
+        found = read_day(tokens, i + 1, today)
+        if found:
+            return found
+        following = tokens[i + 2] if i + 2 < len(tokens) else None
+        if following not in ("am", "pm", "o", "past", "to") and 1 <= int(tokens[i + 1]) <= 31:
+            # "on the 5th": this month, or next month once the day has passed
+            day, j = int(tokens[i + 1]), i + 2
+            month = today.month if day >= today.day else today.month % 12 + 1
+            year = today.year + (month < today.month)
+            try:
+                return datetime.date(year, month, day), j
+            except ValueError:
+                return None
+    if month is None:
+        return None
+    year = None
+    if j < len(tokens) and tokens[j].isdigit() and len(tokens[j]) == 4:
+        year, j = int(tokens[j]), j + 1
+    try:
+        date = datetime.date(year or today.year, month, day)
+        if year is None and date < today:
+            date = date.replace(year=today.year + 1)
+    except ValueError:
+        return None
+    return date, j
+
+def parse_when(text, now=None):
+    """(start, end) datetimes for a spoken time like "tomorrow at 3 pm for an hour", or None"""
+    now = now or datetime.datetime.now()
+    tokens = when_tokens(text)
+    day = clock = end_clock = moment = minutes = part = None
+    i = 0
+    while i < len(tokens):
+        word = tokens[i]
+        if word in DAY_PARTS and part is None:
+            part = word
+        if word == "in" and (found := read_duration(tokens, i + 1)):
+            moment, i = now + datetime.timedelta(minutes=found[0]), found[1]
+        elif word == "for" and (found := read_duration(tokens, i + 1)):
+            minutes, i = found
+        elif word in ("until", "till", "to", "and") and clock and i + 1 < len(tokens) and (found := read_clock(tokens, i + 1)):
+            end_clock, i = found[:3], found[3]
+        elif day is None and (found := read_day(tokens, i, now.date())):
+            day, i = found
+        elif clock is None and (found := read_clock(tokens, i)):
+            clock, i = found[:3], found[3]
+        else:
+            i += 1
+    if clock is None and day is None and part is None:
+        if moment is None:
+            return None
+        start = moment.replace(second=0, microsecond=0)
+    else:
+        if clock is not None:
+            hour, minute, meridiem = clock
+            # Without am or pm, an hour from 1 to 7 is a meeting in the afternoon
+            if not meridiem and (1 <= hour <= 7 or part in ("afternoon", "evening", "tonight", "night") and hour < 12):
+                hour += 12
+        else:
+            hour, minute = DAY_PARTS.get(part, 9), 0
+        date = day or (moment or now).date()
+        start = datetime.datetime.combine(date, datetime.time(hour, minute))
+        if day is None and moment is None and start < now:
+            start += datetime.timedelta(days=1)
+    if end_clock is not None:
+        hour, minute, meridiem = end_clock
+        end = datetime.datetime.combine(start.date(), datetime.time(hour, minute))
+        if end <= start and not meridiem and hour < 12:
+            end += datetime.timedelta(hours=12)
+        if end <= start:
+            end += datetime.timedelta(days=1)
+    else:
+        end = start + datetime.timedelta(minutes=minutes or MEETING_MINUTES)
+    return start, end
+
+class MeetingIndex:
+    """Meetings sorted by start time, answering range, next and overlap queries by binary search"""
+
+    def __init__(self, records=()):
+        entries = sorted(filter(None, map(self._entry, records)), key=lambda entry: entry[0])
+        self.starts = [entry[0] for entry in entries]
+        self.entries = entries  # (start, end, meeting)
+        # Bounds how far back an overlapping meeting can start
+        self.longest = max((end - start for start, end, _ in entries), default=datetime.timedelta(0))
+
+    @staticmethod
+    def _entry(meeting):
+        try:
+            start = datetime.datetime.fromisoformat(meeting["time"])
+            end = (datetime.datetime.fromisoformat(meeting["end_time"]) if meeting.get("end_time")
+                   else start + datetime.timedelta(minutes=MEETING_MINUTES))
+        except (TypeError, ValueError, KeyError):
+            # Older meetings kept the raw spoken time; read it relative to when it was said
+            try:
+                created = datetime.datetime.fromisoformat(meeting["created"])
+            except (TypeError, ValueError, KeyError):
+                return None
+            try:
+                when = parse_when(str(meeting.get("time", "")), created)
+            except ValueError:
+                when = None  # one unreadable meeting must not stop the rest from loading
+            if when is None:
+                return None
+            start, end = when
+        return start, end, meeting
+
+    def add(self, meeting):
+        entry = self._entry(meeting)
+        if entry is None:
+            return False
+        i = bisect.bisect_right(self.starts, entry[0])
+        self.starts.insert(i, entry[0])
+        self.entries.insert(i, entry)
+        self.longest = max(self.longest, entry[1] - entry[0])
+        return True
+
+    def between(self, start, end):
+        """Meetings starting in [start, end), in order"""
+        return self.entries[bisect.bisect_left(self.starts, start):bisect.bisect_left(self.starts, end)]
+
+    def next_after(self, moment):
+        i = bisect.bisect_left(self.starts, moment)
+        return self.entries[i] if i < len(self.entries) else None
+
+    def overlapping(self, start, end):
+        """Meetings that share any time with [start, end)"""
+        candidates = self.entries[bisect.bisect_right(self.starts, start - self.longest):
+                                  bisect.bisect_left(self.starts, end)]
+        return [entry for entry in candidates if entry[1] > start]
+
+meeting_indexes = {}
+
+def get_meeting_index():
+    """Load the user's meetings into the index once, on first use"""
+    user = current_user()
+    with init_lock:
+        if user not in meeting_indexes:
+            meeting_indexes[user] = MeetingIndex(store.meetings() if store is not None else meetings)
+        return meeting_indexes[user]
+
+def spoken_when(moment, now=None):
+    """Describe a datetime the way a person would say it"""
+    now = now or datetime.datetime.now()
+    days = (moment.date() - now.date()).days
+    clock = moment.strftime("%I:%M %p").lstrip("0")
+    if days == 0:
+        return f"today at {clock}"
+    if days == 1:
+        return f"tomorrow at {clock}"
+    if 1 < days < 7:
+        return f"on {moment:%A} at {clock}"
+    return f"on {moment:%A, %B} {moment.day} at {clock}"
+
 def create_meeting(title, time_str):
     """Create a meeting/event"""
+    when = parse_when(time_str)
+    if when is None:
+        text_to_speech(f"I couldn't tell when {time_str} is. Try something like tomorrow at 3 pm")
+        return None
+    start, end = when
+    index = get_meeting_index()
     meeting = {
         "title": title,
-        "time": time_str,
+        "time": start.strftime(MEETING_TIME_FORMAT),
+        "end_time": end.strftime(MEETING_TIME_FORMAT),
         "created": datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
     }
-    meetings_file = "virus_meetings.json"
-    meetings = load_data(meetings_file)
-    meetings.append(meeting)
-    save_data(meetings_file, meetings)
-    text_to_speech(f"Meeting '{title}' scheduled for {time_str}")
+    with data_lock:
+        clashes = index.overlapping(start, end)
+        if store is not None:
+            meeting["id"] = store.add("meetings", meeting)
+        else:
+            append_record(MEETINGS_FILE, meetings, meeting)
+        index.add(meeting)
+    reply = f"Meeting '{title}' scheduled for {spoken_when(start)}"
+    if clashes:
+        other_start, _, other = clashes[0]
+        reply += f". It overlaps with {other['title']} at {other_start.strftime('%I:%M %p').lstrip('0')}"
+    text_to_speech(reply)
+    return meeting
 
-def process_command(command):
-    """Process voice commands"""
-    if not command:
-        return True
-    
-    # Greetings
-    if any(word in command for word in ["hello", "hi", "hey virus", "hey"]):
-        greetings = [
-            "Hello! How can I help you?",
-            "Hi there! What can I do for you?",
-            "Hey! I'm Virus, your PC assistant. What do you need?",
-            "Hello! Ready to assist you."
-        ]
-        text_to_speech(random.choice(greetings))
-    
-    # Identity
-    elif "your name" in command or "who are you" in command:
-        text_to_speech("I am Virus, your personal voice assistant for PC. I can help you with tasks, reminders, calculations, system information, and much more!")
-    
-    elif "what can you do" in command or "help" in command or "your features" in command:
-        help_text = """
+def show_meetings(text=""):
+    """Read out the meetings on the day mentioned, today by default, or over the coming week"""
+    now = datetime.datetime.now()
+    tokens = when_tokens(text)
+    day = next(filter(None, (read_day(tokens, i, now.date()) for i in range(len(tokens)))), None)
+    if day is None and "week" in tokens:
+        start, end, label = now, now + datetime.timedelta(days=7), "this week"
+    else:
+        date = day[0] if day else now.date()
+        start = datetime.datetime.combine(date, datetime.time())
+        end = start + datetime.timedelta(days=1)
+        label = spoken_when(start, now).rsplit(" at ", 1)[0]
+        if day is None:
+            start = now  # what is left of today
+    index = get_meeting_index()
+    # For the rest of today, a meeting already under way still counts
+    found = index.overlapping(start, end) if day is None and end - start < datetime.timedelta(days=1) else index.between(start, end)
+    if not found:
+        text_to_speech(f"You have no meetings {label}")
+        return found
+    print(f"\n--- Meetings {label} ---")
+    text_to_speech(f"You have {len(found)} meeting{'s' if len(found) != 1 else ''} {label}", group="meetings")
+    for meeting_start, meeting_end, meeting in found[:LIST_PAGE_SIZE]:
+        print(f"{meeting_start:%a %d %b %H:%M}-{meeting_end:%H:%M}  {meeting['title']}")
+        text_to_speech(f"{meeting['title']} {spoken_when(meeting_start, now)}", group="meetings")
+    if len(found) > LIST_PAGE_SIZE:
+        text_to_speech(f"and {len(found) - LIST_PAGE_SIZE} more", group="meetings")
+    return found
+
+def next_meeting():
+    """Say which meeting comes up next"""
+    found = get_meeting_index().next_after(datetime.datetime.now())
+    if found is None:
+        text_to_speech("You have no upcoming meetings")
+        return None
+    start, _, meeting = found
+    text_to_speech(f"Your next meeting is {meeting['title']} {spoken_when(start)}")
+    return meeting
+
+# Intent routing
+class IntentRouter:
+    """Compiled keyword/phrase index that picks the best intent in one pass"""
+
+    def __init__(self):
+        self.intents = {}
+        self._trie = None
+        self._prematched = (None, None)
+
+    def intent(self, name, keywords=(), phrases=(), weak=(), priority=0):
+        """Register a handler for an intent.
+
+        Keywords score 1, phrases score one point per word and weak phrases
+        (generic words like "what is") score 0.5, so they only win when
+        nothing more specific matched.
+        """
+        def decorator(func):
+            self.intents[name] = {
+                "handler": func,
+                "keywords": list(keywords),
+                "phrases": list(phrases),
+                "weak": list(weak),
+                "priority": priority,
+                "order": len(self.intents)
+            }
+            self._trie = None
+            self._prematched = (None, None)
+            return func
+        return decorator
+
+    def compile(self):
+        """Build the token trie from every registered intent"""
+        trie = {}
+        for name, spec in self.intents.items():
+            entries = [(k, 1.0) for k in spec["keywords"]]
+            entries += [(p, float(len(tokenize(p)))) for p in spec["phrases"]]
+            entries += [(w, 0.5) for w in spec["weak"]]
+            for text, weight in entries:
+                node = trie
+                for token in tokenize(text):
+                    node = node.setdefault(token, {})
+                node.setdefault(None, []).append((name, weight))
+        self._trie = trie
+        return trie
+
+    def scores(self, command):
+        """Score every intent hit by the command; returns {name: (score, first position)}"""
+        trie = self._trie if self._trie is not None else self.compile()
+        tokens = tokenize(command)
+        hits = {}
+        for i in range(len(tokens)):
+            node = trie
+            for token in tokens[i:]:
+                node = node.get(token)
+                if node is None:
+                    break
+                for name, weight in node.get(None, ()):
+                    score, first = hits.get(name, (0.0, i))
+                    hits[name] = (score + weight, min(first, i))
+        return hits
+
+    def prematch(self, partial):
+        """Match a partial hypothesis early so the final result is often already resolved"""
+        self._prematched = (partial, self._match(partial))
+
+    def match(self, command):
+        """Return (name, handler) of the best scoring intent, or (None, None)"""
+        partial, result = self._prematched
+        if partial is not None and partial == command:
+            return result
+        return self._match(command)
+
+    def _match(self, command):
+        hits = self.scores(command)
+        if not hits:
+            return None, None
+
+        def rank(name):
+            score, first = hits[name]
+            spec = self.intents[name]
+            return (-score, first, -spec["priority"], spec["order"])
+
+        best = min(hits, key=rank)
+        return best, self.intents[best]["handler"]
+
+def tokenize(text):
+    """Split text into lowercase word tokens"""
+    return re.findall(r"[a-z0-9]+(?:'[a-z]+)?", text.lower())
+
+router = IntentRouter()
+intent = router.intent
+
+# Greetings
+@intent("greeting", keywords=["hello", "hi"], weak=["hey", "hey virus"])
+def handle_greeting(command):
+    greetings = [
+        "Hello! How can I help you?",
+        "Hi there! What can I do for you?",
+        "Hey! I'm Virus, your PC assistant. What do you need?",
+        "Hello! Ready to assist you."
+    ]
+    text_to_speech(random.choice(greetings))
+
+# Identity
+@intent("identity", phrases=["your name", "who are you"])
+def handle_identity(command):
+    text_to_speech("I am Virus, your personal voice assistant for PC. I can help you with tasks, reminders, calculations, system information, and much more!")
+
+@intent("help", keywords=["help"], phrases=["what can you do", "your features"])
+def handle_help(command):
+    help_text = """
 I am Virus, your PC assistant. I can:
 - Tell time and date
 - Set timers, alarms, and reminders
@@ -388,196 +3994,677 @@ I am Virus, your PC assistant. I can:
 - Get system information
 - Tell jokes
 - Flip coins and roll dice
-- Create meetings
+- Schedule meetings and read your calendar
 - And much more!
 """
-        print(help_text)
-        text_to_speech("I can do many things like manage your schedule, take notes, perform calculations, open applications, tell you system information, and help you stay organized. Just ask me!")
-    
-    # Time and Date
-    elif "time" in command and "timer" not in command:
-        get_current_time()
-    
-    elif "date" in command or "what day" in command or "today" in command:
-        get_current_date()
-    
-    # Timer
-    elif "timer" in command or "set a timer" in command:
+    print(help_text)
+    text_to_speech("I can do many things like manage your schedule, take notes, perform calculations, open applications, tell you system information, and help you stay organized. Just ask me!")
+
+# Time and Date
+@intent("time", keywords=["time"], phrases=["what time"])
+def handle_time(command):
+    get_current_time()
+
+@intent("date", keywords=["date", "today"], phrases=["what day"])
+def handle_date(command):
+    get_current_date()
+
+# Timer
+@intent("timer", keywords=["timer", "timers"], phrases=["set a timer"])
+def handle_timer(command):
+    if "cancel" in command or "stop" in command:
+        cancel_timer()
+        return
+    try:
+        if "minute" in command:
+            mins = int(''.join([c for c in command.split("minute")[0].split()[-1] if c.isdigit()]))
+            set_timer(mins * 60, f"{mins} minute timer")
+        elif "second" in command:
+            secs = int(''.join([c for c in command.split("second")[0].split()[-1] if c.isdigit()]))
+            set_timer(secs, f"{secs} second timer")
+        elif "hour" in command:
+            hrs = int(''.join([c for c in command.split("hour")[0].split()[-1] if c.isdigit()]))
+            set_timer(hrs * 3600, f"{hrs} hour timer")
+        else:
+            text_to_speech("Please specify the timer duration, like 5 minutes or 30 seconds")
+    except:
+        text_to_speech("I couldn't understand the timer duration. Please try again.")
+
+# Alarm
+@intent("alarm", keywords=["alarm", "alarms"], phrases=["wake me"])
+def handle_alarm(command):
+    if "cancel" in command or "turn off" in command or "stop" in command:
+        cancel_alarm()
+        return
+    text_to_speech("What time should I set the alarm for? Say it in 24-hour format, like 07 30")
+    alarm_input = speech_to_text()
+    if alarm_input:
         try:
-            if "minute" in command:
-                mins = int(''.join([c for c in command.split("minute")[0].split()[-1] if c.isdigit()]))
-                set_timer(mins * 60, f"{mins} minute timer")
-            elif "second" in command:
-                secs = int(''.join([c for c in command.split("second")[0].split()[-1] if c.isdigit()]))
-                set_timer(secs, f"{secs} second timer")
-            elif "hour" in command:
-                hrs = int(''.join([c for c in command.split("hour")[0].split()[-1] if c.isdigit()]))
-                set_timer(hrs * 3600, f"{hrs} hour timer")
+            digits = ''.join([c for c in alarm_input if c.isdigit() or c == ':'])
+            if len(digits) >= 4:
+                if ':' not in digits:
+                    alarm_time = f"{digits[:2]}:{digits[2:4]}"
+                else:
+                    alarm_time = digits[:5]
+                set_alarm(alarm_time, "Wake up alarm")
             else:
-                text_to_speech("Please specify the timer duration, like 5 minutes or 30 seconds")
+                text_to_speech("Invalid time format")
         except:
-            text_to_speech("I couldn't understand the timer duration. Please try again.")
-    
-    # Alarm
-    elif "alarm" in command or "wake me" in command:
-        text_to_speech("What time should I set the alarm for? Say it in 24-hour format, like 07 30")
-        alarm_input = speech_to_text()
-        if alarm_input:
-            try:
-                digits = ''.join([c for c in alarm_input if c.isdigit() or c == ':'])
-                if len(digits) >= 4:
-                    if ':' not in digits:
-                        alarm_time = f"{digits[:2]}:{digits[2:4]}"
-                    else:
-                        alarm_time = digits[:5]
-                    set_alarm(alarm_time, "Wake up alarm")
-                else:
-                    text_to_speech("Invalid time format")
-            except:
-                text_to_speech("I couldn't set the alarm")
-    
-    # Reminders
-    elif "remind" in command:
-        if "show" in command or "list" in command or "what are" in command:
-            show_reminders()
-        else:
-            text_to_speech("What should I remind you about?")
-            reminder_text = speech_to_text()
-            if reminder_text:
-                add_reminder(reminder_text)
-    
-    # To-Do List
-    elif "todo" in command or "to do" in command or "task" in command:
-        if "add" in command or "new" in command or "create" in command:
-            text_to_speech("What task should I add?")
-            task = speech_to_text()
-            if task:
-                add_todo(task)
-        elif "show" in command or "list" in command or "what" in command:
-            show_todos()
+            text_to_speech("I couldn't set the alarm")
+
+@intent("snooze", keywords=["snooze"])
+def handle_snooze(command):
+    try:
+        minutes = int(''.join([c for c in command.split("minute")[0].split()[-1] if c.isdigit()])) if "minute" in command else 5
+    except ValueError:
+        minutes = 5
+    snooze_alarm(minutes)
+
+# Reminders
+@intent("reminder", keywords=["remind", "reminder", "reminders"])
+def handle_reminder(command):
+    if "more" in tokenize(command):
+        show_reminders(list_pages.get((current_user(), "reminders"), 0) + 1)
+    elif "show" in command or "list" in command or "what are" in command:
+        show_reminders()
+    elif (match := re.search(r"\bremind me to\s+(.+)$", command)):
+        add_reminder(match.group(1))
+    else:
+        text_to_speech("What should I remind you about?")
+        reminder_text = speech_to_text()
+        if reminder_text:
+            add_reminder(reminder_text)
+
+# To-Do List
+# "add buy milk to my to do list" carries the task with it
+TODO_INLINE = re.compile(r"\b(?:add|put)\s+(.+?)\s+(?:to|on)\s+(?:my\s+|the\s+)?(?:to ?do|to-do|task)s?(?:\s+list)?$")
+TODO_PLACEHOLDER = re.compile(r"(?:a |an |the )?(?:new )?(?:task|item|todo|to do)")
+
+@intent("todo", keywords=["todo", "task", "tasks"], phrases=["to do", "to do list", "do next", "what next"])
+def handle_todo(command):
+    words = tokenize(command)
+    todo_id = task_number(words)
+    if todo_id is not None and any(w in words for w in ("done", "complete", "completed", "finish", "finished", "tick")):
+        change_todo(todo_id, "complete")
+    elif todo_id is not None and any(w in words for w in ("delete", "remove", "drop", "cancel")):
+        change_todo(todo_id, "delete")
+    elif todo_id is not None and ("urgent" in words or any(w.startswith("priorit") for w in words)):
+        level = next((TODO_PRIORITY_WORDS[w] for w in words if w in TODO_PRIORITY_WORDS), TODO_PRIORITIES["high"])
+        change_todo(todo_id, "priority", level)
+    elif "next" in words:
+        next_todo()
+    elif "more" in words:
+        show_todos(get_todo_index().page + 1)
+    elif (match := TODO_INLINE.search(command)) and not TODO_PLACEHOLDER.fullmatch(match.group(1)):
+        add_todo(match.group(1))
+    elif "add" in command or "new" in command or "create" in command:
+        text_to_speech("What task should I add?")
+        task = speech_to_text()
+        if task:
+            add_todo(task)
+    elif "show" in command or "list" in command or "what" in command:
+        show_todos()
+    else:
+        text_to_speech("What task should I add to your to-do list?")
+        task = speech_to_text()
+        if task:
+            add_todo(task)
+
+# Notes
+@intent("note", keywords=["note", "notes"], phrases=["write this down"])
+def handle_note(command):
+    if "how many" in command:
+        period = next((p for p in ("today", "week", "month") if p in command), None)
+        count_notes(period)
+    elif "find" in command or "search" in command or "about" in command:
+        query = re.sub(r"\b(find|search|for|notes?|about)\b", " ", command).strip()
+        if query:
+            search_notes(" ".join(query.split()))
         else:
-            text_to_speech("What task should I add to your to-do list?")
-            task = speech_to_text()
-            if task:
-                add_todo(task)
-    
-    # Notes
-    elif "note" in command or "write this down" in command:
-        if "read" in command or "show" in command or "my notes" in command:
-            read_notes()
+            text_to_speech("What should I search your notes for?")
+    elif "read" in command or "show" in command or "my notes" in command:
+        read_notes()
+    else:
+        text_to_speech("What should I note down?")
+        note = speech_to_text()
+        if note:
+            take_note(note)
+
+# Contacts
+@intent("contact", keywords=["contact", "contacts"], phrases=["number of", "phone number"], weak=["call"])
+def handle_contact(command):
+    words = set(tokenize(command))
+    if words & {"add", "new", "save"}:
+        text_to_speech("What is the contact name?")
+        name = speech_to_text()
+        if name:
+            text_to_speech("What is the phone number?")
+            number = speech_to_text()
+            if number:
+                add_contact(name, number)
+    elif "more" in words:
+        list_contacts(list_pages.get((current_user(), "contacts"), 0) + 1)
+    elif words & {"show", "list", "all"}:
+        list_contacts()
+    else:
+        contact_name = " ".join(w for w in tokenize(command) if w not in {"contact", "contacts", "find", "get", "call", "what", "is", "what's"})
+        if contact_name:
+            get_contact(contact_name)
         else:
-            text_to_speech("What should I note down?")
-            note = speech_to_text()
-            if note:
-                take_note(note)
-    
-    # Contacts
-    elif "contact" in command:
-        if "add" in command or "new" in command or "save" in command:
-            text_to_speech("What is the contact name?")
+            text_to_speech("Which contact do you want?")
             name = speech_to_text()
             if name:
-                text_to_speech("What is the phone number?")
-                number = speech_to_text()
-                if number:
-                    add_contact(name, number)
-        elif "show" in command or "list" in command or "all" in command:
-            list_contacts()
-        elif "find" in command or "get" in command or "call" in command:
-            contact_name = command.replace("contact", "").replace("find", "").replace("get", "").replace("call", "").strip()
-            if contact_name:
-                get_contact(contact_name)
-            else:
-                text_to_speech("Which contact do you want?")
-                name = speech_to_text()
-                if name:
-                    get_contact(name)
-    
-    # Calculations
-    elif any(word in command for word in ["calculate", "what is", "plus", "minus", "times", "divided", "multiply"]):
-        expression = command.replace("calculate", "").replace("what is", "").replace("what's", "").strip()
-        if expression:
-            calculate(expression)
-    
-    # Unit Conversion
-    elif "convert" in command:
+                get_contact(name)
+
+# Calculations
+@intent("calculate", keywords=["calculate", "plus", "minus", "times", "divided", "multiply", "percent", "squared", "cubed", "power", "factorial"],
+        phrases=["square root"], weak=["what is", "what's"])
+def handle_calculate(command):
+    expression = command.replace("calculate", "").replace("what is", "").replace("what's", "").strip()
+    if expression:
+        calculate(expression)
+
+# Unit Conversion
+@intent("convert", keywords=["convert"])
+def handle_convert(command):
+    try:
+        words = command.replace("convert", "").split()
+        value, i = read_number(words, 0)
+        rest = words[i:]
+        split = next(k for k, w in enumerate(rest) if w in ("to", "into", "in") and k > 0)
+        from_unit, to_unit = " ".join(rest[:split]), " ".join(rest[split + 1:])
+        if i == 0 or not to_unit:
+            raise ValueError(command)
+        convert_units(value, from_unit, to_unit)
+    except:
+        text_to_speech("Please say convert followed by value, unit, to, and target unit")
+
+# System Info
+@intent("system", keywords=["system", "battery", "cpu", "memory"])
+def handle_system(command):
+    words = set(tokenize(command))
+    statistic = next((stat for stat, keys in (("max", {"peak", "max", "maximum", "highest"}),
+                                              ("min", {"lowest", "min", "minimum"}),
+                                              ("mean", {"average", "mean"}), ("p95", {"p95", "percentile"}))
+                      if words & keys), None)
+    if statistic is None:
+        get_system_info()
+        return
+    metric = next((m for m in METRIC_NAMES if m in command), "cpu")
+    match = re.search(r"(\d+|an?|one)?\s*(minute|hour)", command)
+    seconds = 3600
+    if match:
+        count = int(match.group(1)) if match.group(1) and match.group(1).isdigit() else 1
+        seconds = count * (60 if match.group(2) == "minute" else 3600)
+    get_system_history(metric, statistic, seconds)
+
+@intent("performance", keywords=["latency"], phrases=["performance report"])
+def handle_performance(command):
+    performance_report()
+
+# Open Applications
+@intent("open", keywords=["open"])
+def handle_open(command):
+    app = command.replace("open", "").strip()
+    if app:
+        open_application(app)
+    else:
+        text_to_speech("Which application should I open?")
+
+# Weather
+@intent("weather", keywords=["weather"])
+def handle_weather(command):
+    get_weather_info()
+
+# Definition
+@intent("define", keywords=["define", "definition"], phrases=["meaning of"])
+def handle_define(command):
+    word = command.replace("define", "").replace("definition", "").replace("meaning of", "").strip()
+    if word:
+        get_definitions(word)
+
+# Fun Features
+@intent("coin", keywords=["coin"], phrases=["flip a coin", "coin flip"])
+def handle_coin(command):
+    flip_coin()
+
+@intent("dice", keywords=["dice", "die"], phrases=["roll a dice", "roll dice", "dice roll"])
+def handle_dice(command):
+    if "sided" in command:
         try:
-            parts = command.replace("convert", "").strip().split()
-            value = float(parts[0])
-            from_unit = parts[1]
-            to_unit = parts[3] if "to" in parts else parts[-1]
-            convert_units(value, from_unit, to_unit)
+            sides = int(''.join([c for c in command.split("sided")[0].split()[-1] if c.isdigit()]))
+            roll_dice(sides)
         except:
-            text_to_speech("Please say convert followed by value, unit, to, and target unit")
-    
-    # System Info
-    elif "system" in command or "battery" in command or "cpu" in command or "memory" in command:
-        get_system_info()
-    
-    # Open Applications
-    elif "open" in command:
-        app = command.replace("open", "").strip()
-        if app:
-            open_application(app)
+            roll_dice()
+    else:
+        roll_dice()
+
+@intent("joke", keywords=["joke"], phrases=["make me laugh", "tell me a joke"])
+def handle_joke(command):
+    tell_joke()
+
+# Meeting
+@intent("meeting", keywords=["meeting", "meetings", "schedule", "calendar", "agenda"],
+        phrases=["what's on", "what is on", "next meeting"])
+def handle_meeting(command):
+    words = set(tokenize(command))
+    if "next" in words:
+        next_meeting()
+        return
+    if words & {"what", "what's", "any", "show", "list", "calendar", "agenda"}:
+        show_meetings(command)
+        return
+    text_to_speech("What is the meeting title?")
+    title = speech_to_text()
+    if title:
+        text_to_speech("When is the meeting?")
+        meeting_time = speech_to_text()
+        if meeting_time:
+            create_meeting(title, meeting_time)
+
+@intent("quiet", keywords=["quiet", "silence"], phrases=["stop talking", "shut up"])
+def handle_quiet(command):
+    speech.cancel()
+
+# Exit
+@intent("exit", keywords=["exit", "quit", "bye", "goodbye"], weak=["stop"])
+def handle_exit(command):
+    text_to_speech("Goodbye! Have a great day!")
+    return False
+
+UNKNOWN_RESPONSES = [
+    "I'm not sure about that. Try asking me something else.",
+    "I didn't quite get that. Could you rephrase?",
+    "I'm still learning. Try saying 'help' to see what I can do.",
+    "Sorry, I don't understand that command yet."
+]
+
+# Chained commands
+# "and", "then", "also" and commas may separate the clauses of one command
+CLAUSE_BREAK = re.compile(r"(\s*,?\s+(?:and then|and also|and|then|also)\s+|\s*[,;]\s*)")
+CLAUSE_WORKERS = 4
+
+class ClauseBatch:
+    """The clauses of one chained command, with their held-back replies and storage writes.
+
+    Clauses run in order, and neighbours that touch different state run
+    concurrently. One that asks a follow-up question waits until every
+    earlier clause has finished, so questions come in the order the user
+    chained them.
+    """
+
+    def __init__(self, count):
+        self.replies = [[] for _ in range(count)]
+        self.done = [False] * count
+        self.journals = {}  # journal file -> collection, flushed once at the end
+        self.stores = set()  # SQLite stores with uncommitted changes
+        self.turn = threading.Condition()
+
+    def reply(self, clause, text):
+        with self.turn:
+            self.replies[clause].append(text)
+
+    def finish(self, clause):
+        with self.turn:
+            self.done[clause] = True
+            self.turn.notify_all()
+
+    def take_replies(self, upto):
+        """Remove and return the replies of clauses up to and including upto"""
+        with self.turn:
+            lines = [text for replies in self.replies[:upto + 1] for text in replies]
+            for replies in self.replies[:upto + 1]:
+                replies.clear()
+        return lines
+
+    @contextlib.contextmanager
+    def conversation(self, clause):
+        """Speak and listen directly while a clause asks its follow-up question"""
+        with self.turn:
+            self.turn.wait_for(lambda: all(self.done[:clause]))
+        session_state.batch = None
+        try:
+            # What the earlier clauses said, then the question itself
+            lines = self.take_replies(clause)
+            if lines:
+                text_to_speech(combine_replies(lines))
+            yield
+        finally:
+            session_state.batch = self
+
+    def commit(self):
+        """Write the held-back changes: one flush per journal, one commit per database"""
+        for filename, data in self.journals.items():
+            flush_journal(filename, data)
+        for opened in self.stores:
+            opened.commit()
+
+def clause_routes(text):
+    """Whether text names an intent by more than a weak phrase"""
+    return any(score >= 1 for score, _ in router.scores(text).values())
+
+def split_clauses(command):
+    """Split a chained command into clauses that each name an intent.
+
+    A piece only starts a new clause when it and the clause before it both
+    route on their own, so "remind me to buy bread and milk" stays whole.
+    """
+    parts = CLAUSE_BREAK.split(command)
+    clauses = [parts[0]]
+    for separator, part in zip(parts[1::2], parts[2::2]):
+        if clause_routes(part) and clause_routes(clauses[-1]):
+            clauses.append(part)
         else:
-            text_to_speech("Which application should I open?")
-    
-    # Weather
-    elif "weather" in command:
-        get_weather_info()
-    
-    # Definition
-    elif "define" in command or "definition" in command or "meaning of" in command:
-        word = command.replace("define", "").replace("definition", "").replace("meaning of", "").strip()
-        if word:
-            get_definitions(word)
-    
-    # Fun Features
-    elif "flip a coin" in command or "coin flip" in command:
-        flip_coin()
-    
-    elif "roll a dice" in command or "roll dice" in command or "dice roll" in command:
-        if "sided" in command:
+            clauses[-1] += separator + part
+    return [clause.strip() for clause in clauses if clause.strip()]
+
+# State an intent shares with another intent; None for intents that must run on their own
+CLAUSE_STATE = {"snooze": "alarm", "quiet": None, "exit": None}
+
+def clause_waves(clauses):
+    """Group clause numbers into waves that run one after another.
+
+    A clause joins the wave before it only when its intent touches state no
+    clause in that wave touches, so "set a timer and cancel the timer" runs
+    in the order it was said.
+    """
+    waves, states = [], set()
+    for i, clause in enumerate(clauses):
+        name, _ = router.match(clause)
+        state = CLAUSE_STATE.get(name, name)
+        if waves and state is not None and None not in states and state not in states:
+            waves[-1].append(i)
+            states.add(state)
+        else:
+            waves.append([i])
+            states = {state}
+    return waves
+
+def combine_replies(lines):
+    """Join replies into one confirmation, each ending as a sentence"""
+    return " ".join(line if line[-1:] in ".!?" else line + "." for line in lines if line)
+
+clause_pool = LazyObject(lambda: concurrent_futures.ThreadPoolExecutor(CLAUSE_WORKERS, thread_name_prefix="clause"))
+
+def run_clause(batch, clause, command):
+    session_state.batch, session_state.clause = batch, clause
+    try:
+        return dispatch(command)
+    finally:
+        session_state.batch = None
+        batch.finish(clause)
+
+def run_clauses(clauses):
+    """Run the clauses of a chained command in order, independent neighbours together, then flush storage and reply once"""
+    batch = ClauseBatch(len(clauses))
+    session = current_session()
+    futures = []
+    for wave in clause_waves(clauses):
+        started = [clause_pool.submit(run_in_session, session, run_clause, batch, i, clauses[i]) for i in wave]
+        concurrent_futures.wait(started)
+        futures += started
+        if not all([future.result() for future in started]):
+            break  # "exit" ends the chain; the clauses after it are not run
+    with tracer.span("commit", clauses=len(clauses)):
+        batch.commit()
+    lines = batch.take_replies(len(clauses) - 1)
+    if lines:
+        text_to_speech(combine_replies(lines))
+    return all([future.result() for future in futures])
+
+def dispatch(command):
+    """Run the handler of the command's intent; False when the assistant should exit"""
+    name, handler = router.match(command)
+    if handler is None:
+        text_to_speech(random.choice(UNKNOWN_RESPONSES))
+        return True
+
+    with tracer.span("dispatch", intent=name):
+        return handler(command) is not False
+
+def process_command(command):
+    """Process voice commands"""
+    if not command:
+        return True
+    clauses = split_clauses(command)
+    if len(clauses) > 1:
+        return run_clauses(clauses)
+    return dispatch(command)
+
+# Server mode
+SERVER_PORT = int(os.environ.get("VIRUS_PORT", 8765))
+SERVER_WORKERS = int(os.environ.get("VIRUS_WORKERS", 8))
+SERVER_ANSWER_TIMEOUT = 60
+USER_NAME = re.compile(r"[a-z0-9_-]{1,32}")
+
+class ClientSession:
+    """One connected client: its user namespace, its replies and its answers to follow-up questions"""
+
+    def __init__(self, server, loop, writer):
+        self.server = server
+        self.loop = loop
+        self.writer = writer
+        self.user = None
+        self.answers = queue.Queue()
+        self.busy = False
+        self.closed = False
+
+    def send(self, message):
+        """Queue a JSON line for the client; safe to call from any thread"""
+        self.loop.call_soon_threadsafe(self.write, message)
+
+    def write(self, message):
+        if not self.closed and not self.writer.is_closing():
+            self.writer.write((json.dumps(message) + "\n").encode())
+
+    def say(self, text):
+        if self.closed:
+            # Alarms and timers can outlive the connection that set them; server.sessions
+            # belongs to the loop thread, so the user's live session is looked up there
             try:
-                sides = int(''.join([c for c in command.split("sided")[0].split()[-1] if c.isdigit()]))
-                roll_dice(sides)
-            except:
-                roll_dice()
+                self.loop.call_soon_threadsafe(self.redirect, text)
+            except RuntimeError:  # the server has stopped
+                print(f"\n[{self.user or 'local'}] Virus: {text}")
+            return
+        self.send({"type": "say", "text": text})
+
+    def redirect(self, text):
+        """Pass a reply for this closed session to another of its user's sessions; runs on the loop thread"""
+        other = next((s for s in self.server.sessions if s.user == self.user and not s.closed), None)
+        if other is not None:
+            other.write({"type": "say", "text": text})
         else:
-            roll_dice()
-    
-    elif "joke" in command or "make me laugh" in command or "tell me a joke" in command:
-        tell_joke()
-    
-    # Meeting
-    elif "meeting" in command or "schedule" in command:
-        text_to_speech("What is the meeting title?")
-        title = speech_to_text()
-        if title:
-            text_to_speech("When is the meeting?")
-            meeting_time = speech_to_text()
-            if meeting_time:
-                create_meeting(title, meeting_time)
-    
-    # Exit
-    elif "exit" in command or "quit" in command or "bye" in command or "goodbye" in command or "stop" in command:
-        text_to_speech("Goodbye! Have a great day!")
-        return False
-    
-    # Unknown
-    else:
-        responses = [
-            "I'm not sure about that. Try asking me something else.",
-            "I didn't quite get that. Could you rephrase?",
-            "I'm still learning. Try saying 'help' to see what I can do.",
-            "Sorry, I don't understand that command yet."
-        ]
-        text_to_speech(random.choice(responses))
-    
-    return True
+            print(f"\n[{self.user or 'local'}] Virus: {text}")
+
+    def listen(self):
+        """Ask the client for a follow-up answer and wait for it"""
+        if self.closed:
+            return ""
+        self.send({"type": "listen"})
+        try:
+            return self.answers.get(timeout=SERVER_ANSWER_TIMEOUT).lower()
+        except queue.Empty:
+            return ""
+
+class AssistantServer:
+    """Serves text commands to many clients over a local socket.
+
+    Each line a client sends is a command, or the answer to a follow-up
+    question while a command is running. Replies are JSON lines: "say" for
+    speech, "listen" when an answer is wanted and "done" when the turn ends.
+    A client can send "user <name>" to work on its own copy of the data.
+    Commands run on a bounded pool of worker threads.
+    """
+
+    def __init__(self, workers=SERVER_WORKERS):
+        self.workers = workers
+        self.pool = concurrent_futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="virus-worker")
+        self.sessions = set()
+        self.armed_users = {None}  # the local user's alarms are armed at startup
+        self.ready = threading.Event()
+        self.address = None
+
+    async def serve(self, address=str(SERVER_PORT)):
+        """Listen on a port, host:port or Unix socket path until cancelled"""
+        router.compile()
+        host, _, port = address.rpartition(":")
+        if port.isdigit():
+            server = await asyncio.start_server(self.handle_client, host or "127.0.0.1", int(port))
+            self.address = server.sockets[0].getsockname()[:2]
+        else:
+            server = await asyncio.start_unix_server(self.handle_client, path=address)
+            self.address = address
+        self.ready.set()
+        mark_first_listen()
+        async with server:
+            await server.serve_forever()
+
+    async def handle_client(self, reader, writer):
+        session = ClientSession(self, asyncio.get_running_loop(), writer)
+        self.sessions.add(session)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                text = line.decode('utf-8', 'replace').strip()
+                if session.busy:
+                    session.answers.put(text)
+                elif text.lower().startswith("user "):
+                    await self.set_user(session, text[5:].strip().lower())
+                elif text:
+                    session.busy = True
+                    asyncio.ensure_future(self.turn(session, text.lower()))
+        except ConnectionError:
+            pass
+        finally:
+            session.closed = True
+            session.answers.put("")
+            self.sessions.discard(session)
+            writer.close()
+
+    async def set_user(self, session, user):
+        if not USER_NAME.fullmatch(user):
+            session.write({"type": "error", "text": "User names are 1 to 32 letters, digits, - or _"})
+            return
+        session.user = user
+        if user not in self.armed_users:
+            self.armed_users.add(user)
+            await asyncio.get_running_loop().run_in_executor(self.pool, run_in_session, session, rearm_alarms)
+        session.write({"type": "user", "user": user})
+
+    async def turn(self, session, command):
+        start = time_module.perf_counter()
+        try:
+            keep_going = await asyncio.get_running_loop().run_in_executor(
+                self.pool, run_in_session, session, process_command, command)
+        except Exception as e:
+            session.write({"type": "error", "text": str(e)})
+            keep_going = True
+        # Replies queued by the worker have been written by now, so "done" comes last
+        session.write({"type": "done", "ms": round((time_module.perf_counter() - start) * 1000, 3)})
+        session.busy = False
+        if not keep_going:
+            session.writer.close()
 
-def main():
+def serve(address):
+    """Run the assistant as a server for text clients"""
+    # Replies go to the clients; nothing is spoken on the server itself
+    speech.engine = RecordingEngine()
+    speech.cache = None
+    rearm_alarms()
+    calc_pool.start()
+    server = AssistantServer()
+    print(f"Serving on {address} with {server.workers} workers. Press Ctrl+C to stop.")
+    try:
+        asyncio.run(server.serve(address))
+    except KeyboardInterrupt:
+        pass
+
+def print_startup_report():
+    """Print import and initialization timings collected so far"""
+    print("\n--- Startup report ---")
+    for label, seconds in sorted(startup_timings.items(), key=lambda item: -item[1]):
+        print(f"{label:<32} {seconds * 1000:9.1f} ms")
+    if first_listen is not None:
+        print(f"{'time to first listen':<32} {first_listen * 1000:9.1f} ms")
+
+def warm_up():
+    """Open the microphone and start the sampler, speech renders, app index, calculators, notes and contact indexes while the greeting plays"""
+    try:
+        get_listener()
+        get_sampler()
+        speech.prerender(static_phrases())
+        app_index.refresh()
+        calc_pool.start()
+        get_notes_index()
+        get_contact_index()
+    except Exception as e:
+        print(f"Warm-up error: {e}")
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="VIRUS - PC Voice Assistant")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print import and initialization timings when the first turn starts")
+    parser.add_argument("--text", action="store_true",
+                        help="read commands from stdin instead of the microphone, without speech output")
+    parser.add_argument("--transcript", metavar="FILE",
+                        help="replay commands from a transcript file instead of the microphone, without speech output")
+    parser.add_argument("--trace", nargs="?", const="", metavar="FILE",
+                        help="time each pipeline stage, appending spans to FILE as JSON lines when given")
+    parser.add_argument("--performance-report", metavar="FILE",
+                        help="print per-stage latencies from a trace file and exit")
+    parser.add_argument("--prerender-speech", action="store_true",
+                        help="render the fixed phrases into the speech cache and exit")
+    parser.add_argument("--wake-word", action=argparse.BooleanOptionalAction, default=None,
+                        help=f"wait for '{WAKE_PHRASE}' before recognizing a command (default: on once enrolled)")
+    parser.add_argument("--enroll-wake-word", action="store_true",
+                        help="record the wake phrase as templates for the keyword spotter and exit")
+    parser.add_argument("--serve", nargs="?", const=str(SERVER_PORT), metavar="ADDRESS",
+                        help="serve text clients on a port, host:port or Unix socket path instead of the microphone")
+    return parser.parse_args(argv)
+
+def use_text_input(lines, interactive=False):
+    """Drive the assistant from text and keep speech output silent"""
+    global text_input
+    text_input = TextInput(lines, interactive)
+    speech.engine = RecordingEngine()
+    speech.cache = None
+
+def main(argv=None):
     """Main function"""
+    global startup_report, wake_word
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    startup_report = args.startup_report
+    if args.performance_report:
+        print(Tracer().load(args.performance_report).report())
+        return
+    if args.trace is not None:
+        tracer.enable(args.trace)
+    if args.serve is not None:
+        serve(args.serve)
+        return
+    if args.enroll_wake_word:
+        enroll_wake_word()
+        return
+    wake_word = args.wake_word
+    if args.prerender_speech:
+        phrases = static_phrases()
+        speech.prerender(phrases)
+        speech.wait_rendered()
+        print(f"Rendered {len(phrases)} phrases into {SPEECH_CACHE_DIR}" if speech.cache is not None
+              else "The speech cache needs a TTS engine that can save to file and an audio player")
+        return
+    if args.transcript:
+        with open(args.transcript, encoding='utf-8') as f:
+            use_text_input(f.readlines())
+    elif args.text:
+        use_text_input(sys.stdin, interactive=sys.stdin.isatty())
+    # The engine and microphone come up in the background while the banner prints
+    speech.start()
+    if text_input is None:
+        threading.Thread(target=warm_up, daemon=True).start()
+
     print("=" * 70)
     print(" " * 20 + "VIRUS - PC Voice Assistant")
     print("=" * 70)
@@ -586,19 +4673,35 @@ def main():
     print("Say 'exit' to quit.")
     print("=" * 70)
     
+    rearm_alarms()
     text_to_speech("Hello! I am Virus, your personal voice assistant for PC. How can I help you today?")
     
     while True:
+        tracer.begin_turn()
         try:
-            command = speech_to_text()
+            if text_input is not None:
+                mark_first_listen()
+                command = text_input.command()
+                if command is None:
+                    break
+            else:
+                command = speech_to_text(gated=True)
             if command and not process_command(command):
                 break
+            if command and wake_gate is not None:
+                wake_gate.extend()
         except KeyboardInterrupt:
             text_to_speech("Goodbye!")
             break
         except Exception as e:
             print(f"Error: {e}")
             text_to_speech("Sorry, I encountered an error")
+    speech.wait_idle(timeout=10)
+    if tracer.enabled and tracer.stages:
+        print("\n--- Performance report ---")
+        print(tracer.report())
+
+startup_timings["import app"] = time_module.perf_counter() - STARTUP_STARTED
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,892 @@
+"""Micro-benchmarks for the VIRUS assistant.
+
+Run all benchmarks with `python benchmark.py`, or a single one with
+`python benchmark.py <name>`.
+"""
+import concurrent.futures
+import contextlib
+import gc
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import app
+
+# Commands recorded from real sessions
+COMMAND_CORPUS = [
+    "what is the time",
+    "what time is it",
+    "what's the date today",
+    "set a timer for 5 minutes",
+    "set a timer for 30 seconds",
+    "remind me about the timer",
+    "show my reminders",
+    "add a task to my to do list",
+    "what are my tasks",
+    "take a note",
+    "read my notes",
+    "add a new contact",
+    "find contact john",
+    "calculate 25 times 4",
+    "what is 12 plus 30",
+    "convert 5 kilometers to miles",
+    "how is my battery",
+    "open notepad",
+    "what's the weather like",
+    "define serendipity",
+    "flip a coin",
+    "roll a 20 sided dice",
+    "tell me a joke",
+    "schedule a meeting",
+    "wake me up tomorrow",
+    "hey virus",
+    "what can you do",
+    "who are you",
+    "something completely unrelated",
+    "goodbye",
+]
+
+# Directory of recorded WAV utterances used by the audio benchmarks
+AUDIO_FIXTURES = os.environ.get("VIRUS_AUDIO_FIXTURES", os.path.join("fixtures", "audio"))
+# Wake-word clips: templates/ to enroll from, positive/ starting with the phrase, negative/ without it
+WAKE_FIXTURES = os.environ.get("VIRUS_WAKE_FIXTURES", os.path.join("fixtures", "wake"))
+
+BENCHMARKS = {}
+
+def benchmark(func):
+    BENCHMARKS[func.__name__.replace("bench_", "")] = func
+    return func
+
+def _wav_fixtures():
+    if not os.path.isdir(AUDIO_FIXTURES):
+        print(f"No audio fixtures in {AUDIO_FIXTURES}; set VIRUS_AUDIO_FIXTURES to a directory of WAV files")
+        return []
+    return sorted(os.path.join(AUDIO_FIXTURES, f) for f in os.listdir(AUDIO_FIXTURES) if f.endswith(".wav"))
+
+def _time_per_call(func, items, repeat=200):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            func(item)
+    return (time.perf_counter() - start) / (repeat * len(items))
+
+@benchmark
+def bench_router():
+    """Dispatch cost per command as synthetic intents are added"""
+    print(f"{'intents':>8} {'us/command':>12}")
+    for extra in (0, 100, 500, 1000):
+        router = app.IntentRouter()
+        router.intents = dict(app.router.intents)
+        for i in range(extra):
+            router.intent(f"synthetic_{i}", keywords=[f"kw{i}"], phrases=[f"do thing {i}"])(lambda command: None)
+        router.compile()
+        per_call = _time_per_call(router.match, COMMAND_CORPUS)
+        print(f"{len(router.intents):>8} {per_call * 1e6:>12.2f}")
+
+@benchmark
+def bench_scheduler(pending=10000, window=5.0):
+    """Thread count and wakeups with 10k pending alarms"""
+    scheduler = app.Scheduler()
+    threads_before = threading.active_count()
+    start = time.perf_counter()
+    for i in range(pending):
+        scheduler.schedule(random.uniform(3600, 86400), lambda: None, f"alarm {i}")
+    schedule_time = time.perf_counter() - start
+    wakeups_before = scheduler.wakeups
+    time.sleep(window)
+    wakeups = scheduler.wakeups - wakeups_before
+    print(f"pending jobs:       {scheduler.pending()}")
+    print(f"schedule cost:      {schedule_time / pending * 1e6:.2f} us/alarm")
+    print(f"threads added:      {threading.active_count() - threads_before} (one per alarm before)")
+    print(f"wakeups per minute: {wakeups * 60 / window:.1f} (two per alarm before)")
+
+@benchmark
+def bench_listener():
+    """Per-turn capture latency of the persistent listener on WAV fixtures"""
+    for path in _wav_fixtures():
+        listener = app.Listener(source=app.sr.AudioFile(path), calibration=0.2).start()
+        while listener.get(timeout=30) is not None:
+            pass
+        stats = listener.stats()
+        if listener.error:
+            print(f"{os.path.basename(path)}: {listener.error}")
+        elif stats["turns"]:
+            print(f"{os.path.basename(path)}: {stats['turns']} turns, calibration {stats['calibration'] * 1000:.0f} ms once, "
+                  f"handoff mean {stats['mean'] * 1000:.2f} ms, max {stats['max'] * 1000:.2f} ms")
+
+@benchmark
+def bench_backends():
+    """Real-time factor and end-of-speech-to-result latency per recognition backend"""
+    fixtures = _wav_fixtures()
+    print(f"{'backend':>8} {'fixture':>24} {'RTF':>7} {'latency ms':>11}")
+    for name in app.BACKENDS:
+        try:
+            backend = app.make_backend(name)
+        except RuntimeError as e:
+            print(f"{name:>8} skipped: {e}")
+            continue
+        for path in fixtures:
+            with app.sr.AudioFile(path) as source:
+                duration = source.DURATION
+                try:
+                    if backend.streaming:
+                        start = time.perf_counter()
+                        while backend.stream(source) is not None:
+                            pass
+                        elapsed = time.perf_counter() - start
+                        latency = backend.last_result_latency
+                    else:
+                        audio = app.sr.Recognizer().record(source)
+                        start = time.perf_counter()
+                        backend.recognize(audio)
+                        elapsed = latency = time.perf_counter() - start
+                except (app.sr.UnknownValueError, app.sr.RequestError) as e:
+                    print(f"{name:>8} {os.path.basename(path):>24} failed: {e!r}")
+                    continue
+            print(f"{name:>8} {os.path.basename(path):>24} {elapsed / duration:>7.3f} {latency * 1000:>11.1f}")
+
+@benchmark
+def bench_storage(records=100000):
+    """Per-write cost of journal appends versus full rewrites, and replay time"""
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'size':>8} {'rewrite ms/write':>17} {'journal ms/write':>17}")
+        for size in (1000, 10000, records):
+            items = [{"task": f"task {i}", "created": "2024-01-01 09:00", "completed": False} for i in range(size)]
+            legacy = os.path.join(tmp, f"legacy_{size}.json")
+            start = time.perf_counter()
+            for _ in range(10):
+                with open(legacy, 'w') as f:
+                    json.dump(items, f, indent=2)
+            rewrite = (time.perf_counter() - start) / 10
+            filename = os.path.join(tmp, f"journal_{size}.json")
+            data = list(items)
+            app.save_data(filename, data)
+            start = time.perf_counter()
+            for i in range(200):
+                app.append_record(filename, data, {"task": f"extra {i}", "created": "2024-01-01 09:00", "completed": False})
+            journal = (time.perf_counter() - start) / 200
+            print(f"{size:>8} {rewrite * 1000:>17.2f} {journal * 1000:>17.3f}")
+
+        filename = os.path.join(tmp, "replay.json")
+        with open(filename + app.JOURNAL_SUFFIX, 'w') as f:
+            for i in range(records):
+                f.write(json.dumps({"seq": i + 1, "op": "append", "value": {"task": f"task {i}", "completed": False}}) + "\n")
+        start = time.perf_counter()
+        data = app.load_data(filename)
+        print(f"replaying {len(data)} journal records: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+@benchmark
+def bench_sqlite(records=200000):
+    """Startup and active-list query latency: JSON lists versus SQLite"""
+    items = [{"text": f"reminder {i}", "time": f"2024-01-01 {i % 24:02d}:00", "created": "2024-01-01 09:00",
+              "completed": i % 10 != 0} for i in range(records)]
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "reminders.json")
+        with open(filename, 'w') as f:
+            json.dump(items, f)
+        start = time.perf_counter()
+        data = app.load_data(filename)
+        json_load = time.perf_counter() - start
+        start = time.perf_counter()
+        active = [r for r in data if not r.get("completed", False)][:app.LIST_PAGE_SIZE]
+        json_query = time.perf_counter() - start
+
+        path = os.path.join(tmp, "virus.db")
+        store = app.SQLiteStore(path)
+        with store.transaction():
+            for item in items:
+                store.add("reminders", item)
+        store.conn.close()
+        start = time.perf_counter()
+        store = app.SQLiteStore(path)
+        sqlite_open = time.perf_counter() - start
+        start = time.perf_counter()
+        store.count_active("reminders")
+        store.active("reminders")
+        sqlite_query = time.perf_counter() - start
+    print(f"{records} reminders")
+    print(f"json:   startup {json_load * 1000:8.1f} ms, active page {json_query * 1000:8.2f} ms")
+    print(f"sqlite: startup {sqlite_open * 1000:8.1f} ms, active page {sqlite_query * 1000:8.2f} ms")
+
+@benchmark
+def bench_notes(size_mb=int(os.environ.get("VIRUS_NOTES_MB", 1024))):
+    """Tail, count and search on a large notes file"""
+    words = ["invoice", "meeting", "groceries", "call", "project", "budget", "dentist", "travel", "report", "ideas"]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "notes.txt")
+        base = app.datetime.datetime(2024, 1, 1, 9, 0)
+        with open(path, "wb") as f:
+            written, i = 0, 0
+            while written < size_mb * 1024 * 1024:
+                stamp = base + app.datetime.timedelta(seconds=i)  # one note a second
+                line = f"[{stamp:%Y-%m-%d %H:%M:%S}] note {i} about {words[i % 10]} and {words[(i * 7) % 10]}\n".encode()
+                f.write(line)
+                written += len(line)
+                i += 1
+        print(f"notes file: {written / 1024 / 1024:.0f} MB, {i} notes")
+
+        start = time.perf_counter()
+        with open(path, encoding="utf-8") as f:
+            notes = sum(1 for _ in f)
+        print(f"full scan (old read_notes): {(time.perf_counter() - start) * 1000:10.1f} ms")
+        start = time.perf_counter()
+        app.tail_lines(path, 5)
+        print(f"tail_lines last 5:          {(time.perf_counter() - start) * 1000:10.3f} ms")
+
+        # Counts since a time, from the file and then the index: the first half, the last note, none
+        half = notes // 2
+        periods = {(base + app.datetime.timedelta(seconds=seconds)).timestamp(): expected
+                   for seconds, expected in ((half, notes - half), (notes - 1, 1), (notes, 0), (-60, notes))}
+        index = app.NotesIndex(path, os.path.join(tmp, "notes.idx"))
+        start = time.perf_counter()
+        assert index.count() == notes
+        print(f"count while building:       {(time.perf_counter() - start) * 1000:10.1f} ms")
+        start = time.perf_counter()
+        for since, expected in periods.items():
+            assert index.count(since) == expected, f"{index.count(since)} notes since {since}, expected {expected}"
+        print(f"count since while building: {(time.perf_counter() - start) / len(periods) * 1000:10.1f} ms")
+        start = time.perf_counter()
+        index.build()
+        print(f"initial index build:        {(time.perf_counter() - start) * 1000:10.1f} ms")
+        start = time.perf_counter()
+        assert index.count() == notes
+        print(f"count:                      {(time.perf_counter() - start) * 1000:10.3f} ms")
+        assert all(index.count(since) == expected for since, expected in periods.items())
+        start = time.perf_counter()
+        index.search("notes about invoices")
+        print(f"search:                     {(time.perf_counter() - start) * 1000:10.3f} ms")
+        with open(path, "ab") as f:
+            line = "[2024-01-02 09:00:00] one more invoice\n"
+            offset = f.tell()
+            f.write(line.encode())
+        start = time.perf_counter()
+        index.add(offset, line)
+        print(f"incremental add:            {(time.perf_counter() - start) * 1000:10.3f} ms")
+        index.conn.close()
+
+FIRST_NAMES = ["john", "katherine", "michael", "stephen", "sarah", "geoff", "carl", "philip", "jennifer", "sean",
+               "ashley", "brian", "megan", "eric", "zoe", "nicholas", "rachel", "jeremy", "lindsay", "marc"]
+LAST_NAMES = ["smith", "jones", "brown", "king", "connor", "lee", "sagan", "wright", "thompson", "fischer",
+              "nguyen", "schmidt", "o'neil", "macdonald", "reid", "gray", "kowalski", "hughes", "moore", "white"]
+# (what the recognizer heard, who was meant)
+MISHEARD_NAMES = [
+    ("jon smyth", "john smith"), ("catherine jones", "katherine jones"), ("micheal brown", "michael brown"),
+    ("steven king", "stephen king"), ("sara connor", "sarah connor"), ("jeff lee", "geoff lee"),
+    ("karl sagan", "carl sagan"), ("phillip right", "philip wright"), ("jenifer tomson", "jennifer thompson"),
+    ("shawn fisher", "sean fischer"), ("ashlee win", "ashley nguyen"), ("bryan smith", "brian schmidt"),
+    ("megan oneal", "megan o'neil"), ("erik mcdonald", "eric macdonald"), ("zoey reed", "zoe reid"),
+    ("nicolas grey", "nicholas gray"), ("rachael kowalsky", "rachel kowalski"), ("jeremy hues", "jeremy hughes"),
+    ("lindsey more", "lindsay moore"), ("mark white", "marc white"),
+]
+
+@benchmark
+def bench_contacts(contacts=100000, queries=500, target=0.001):
+    """Fuzzy contact lookup latency and accuracy on misheard names"""
+    rng = random.Random(7)
+    names = {f"{first} {last}" for first in FIRST_NAMES for last in LAST_NAMES}
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    while len(names) < contacts:
+        first = "".join(rng.choice(letters) for _ in range(rng.randint(3, 8)))
+        last = "".join(rng.choice(letters) for _ in range(rng.randint(4, 9)))
+        names.add(f"{first} {last}")
+    start = time.perf_counter()
+    index = app.ContactIndex()
+    index.build(lambda: list(names))
+    print(f"background index build for {len(names)} contacts: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    # The hand-picked mishearings, plus random contacts with one letter misheard
+    cases = list(MISHEARD_NAMES)
+    for name in rng.sample(sorted(names), queries):
+        position = rng.choice([i for i, char in enumerate(name) if char != " "])
+        cases.append((name[:position] + rng.choice(letters) + name[position + 1:], name))
+    latencies, correct, misheard_correct = [], 0, 0
+    for i, (heard, meant) in enumerate(cases):
+        start = time.perf_counter()
+        matches = index.lookup(heard)
+        latencies.append(time.perf_counter() - start)
+        hit = bool(matches) and matches[0][0] == meant
+        correct += hit
+        misheard_correct += hit and i < len(MISHEARD_NAMES)
+    latencies.sort()
+    exact = sum(heard in names for heard, _ in MISHEARD_NAMES)
+    print(f"top-1 accuracy: {misheard_correct}/{len(MISHEARD_NAMES)} hand-picked "
+          f"(exact-match lookup would find {exact}), {correct}/{len(cases)} overall")
+    p99 = _percentile(latencies, 0.99)
+    print(f"lookup latency: p50 {_percentile(latencies, 0.5) * 1e6:.0f} us, p99 {p99 * 1e6:.0f} us, "
+          f"max {latencies[-1] * 1e6:.0f} us (target p99 {target * 1e6:.0f} us)")
+    assert p99 < target, f"p99 lookup took {p99 * 1e6:.0f} us"
+
+SPOKEN_CALCULATIONS = [
+    "5 plus 3", "12 minus 7", "25 times 4", "100 divided by 8", "2 power 10", "9 squared", "3 cubed",
+    "square root of 144", "sqrt 2", "15 multiplied by 3 plus 2", "7 plus 8 times 2", "1000 minus 1 divided by 3",
+    "6 times 7", "81 divided by 9", "2 plus 2", "10 power 3", "12 squared minus 4", "50 plus 25 plus 12",
+]
+
+def legacy_calculate(expression):
+    """The replace+eval path calculate() used before the expression compiler"""
+    expression = expression.replace("plus", "+").replace("minus", "-")
+    expression = expression.replace("times", "*").replace("multiply", "*").replace("multiplied by", "*")
+    expression = expression.replace("divided by", "/").replace("divide", "/")
+    expression = expression.replace("power", "**").replace("to the power of", "**")
+    expression = expression.replace("squared", "**2").replace("cubed", "**3")
+    expression = expression.replace("square root of", "math.sqrt(").replace("sqrt", "math.sqrt(")
+    if "sqrt" in expression or "math.sqrt" in expression:
+        expression = expression.replace("math.sqrt(", "math.sqrt(") + ")" if expression.count("(") > expression.count(")") else expression
+    try:
+        return eval(expression, {"__builtins__": {}, "math": app.math})
+    except Exception:
+        return None
+
+@benchmark
+def bench_calculate():
+    """Per-expression throughput: replace+eval versus the cached expression compiler"""
+    legacy = _time_per_call(legacy_calculate, SPOKEN_CALCULATIONS)
+    def cold(expression):
+        app.normalize_expression.cache_clear()
+        app.compile_expression.cache_clear()
+        return app.evaluate_expression(expression)
+    uncached = _time_per_call(cold, SPOKEN_CALCULATIONS, repeat=20)
+    cached = _time_per_call(app.evaluate_expression, SPOKEN_CALCULATIONS)
+    failures = sum(legacy_calculate(e) is None for e in SPOKEN_CALCULATIONS)
+    print(f"replace + eval:      {legacy * 1e6:8.2f} us/expression ({failures}/{len(SPOKEN_CALCULATIONS)} failed)")
+    print(f"compiler, cold:      {uncached * 1e6:8.2f} us/expression")
+    print(f"compiler, LRU warm:  {cached * 1e6:8.2f} us/expression")
+    assert cached < legacy, "a repeated calculation is slower than replace + eval"
+
+@benchmark
+def bench_units(count=1000000):
+    """Scalar versus batch unit conversion throughput for 1M values"""
+    values = [random.uniform(-50, 50) for _ in range(count)]
+    converter = app.unit_converter
+    start = time.perf_counter()
+    for value in values:
+        converter.convert(value, "celsius", "fahrenheit")
+    scalar = time.perf_counter() - start
+    start = time.perf_counter()
+    converter.convert_batch(values, "celsius", "fahrenheit")
+    batch = time.perf_counter() - start
+    kind = "NumPy" if app.np is not None else "list fallback, NumPy not installed"
+    print(f"scalar: {count / scalar / 1e6:8.2f} M values/s")
+    print(f"batch:  {count / batch / 1e6:8.2f} M values/s ({kind})")
+    if app.np is not None:
+        array = app.np.asarray(values)
+        start = time.perf_counter()
+        converter.convert_batch(array, "celsius", "fahrenheit")
+        print(f"batch from ndarray: {count / (time.perf_counter() - start) / 1e6:8.2f} M values/s")
+
+@benchmark
+def bench_sampler(interval=1.0, duration=10.0):
+    """Background sampler overhead as a share of one core"""
+    sampler = app.SystemSampler(interval=interval).start()
+    time.sleep(duration)
+    sampler.stop()
+    overhead = sampler.overhead()
+    print(f"{len(sampler.samples)} samples at {interval}s: {sampler.cpu_time * 1000:.1f} ms CPU, "
+          f"{overhead * 100:.3f}% of one core ({'ok' if overhead < 0.01 else 'over the 1% budget'})")
+    start = time.perf_counter()
+    sampler.summary("cpu", 3600)
+    print(f"summary over the buffer: {(time.perf_counter() - start) * 1e6:.0f} us")
+
+# Follow-up answers for corpus commands that ask a question
+REPLAY_ANSWERS = {
+    "remind me about the timer": ["check the oven"],
+    "add a task to my to do list": ["buy milk"],
+    "take a note": ["the meeting moved to thursday"],
+    "add a new contact": ["john smith", "555 0100"],
+    "schedule a meeting": ["project review", "tomorrow at 10"],
+    "wake me up tomorrow": ["07 30"],
+}
+
+# Commands that would leave the benchmark or start other programs
+REPLAY_SKIP = {"open notepad", "goodbye"}
+
+def _percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+@benchmark
+def bench_replay(commands=5000):
+    """End-to-end turns per second from a replayed transcript, with per-intent latency"""
+    corpus = [c for c in COMMAND_CORPUS if c not in REPLAY_SKIP]
+    lines = []
+    for command in random.Random(1).choices(corpus, k=commands):
+        lines.append(command)
+        lines.extend("> " + answer for answer in REPLAY_ANSWERS.get(command, []))
+    latencies = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, 'w') as devnull:
+        os.chdir(tmp)
+        app.use_text_input(lines)
+        app.speech.start()
+        try:
+            with contextlib.redirect_stdout(devnull):
+                start = time.perf_counter()
+                while (command := app.text_input.command()) is not None:
+                    name = app.router.match(command)[0] or "unknown"
+                    began = time.perf_counter()
+                    app.process_command(command)
+                    latencies.setdefault(name, []).append(time.perf_counter() - began)
+                elapsed = time.perf_counter() - start
+                app.speech.wait_idle(timeout=10)
+        finally:
+            os.chdir(cwd)
+    print(f"{commands} commands in {elapsed:.2f} s: {commands / elapsed:.0f} commands/s")
+    print(f"{'intent':>10} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, values in sorted(latencies.items()):
+        values.sort()
+        print(f"{name:>10} {len(values):>6} " + " ".join(f"{_percentile(values, p) * 1000:>8.3f}" for p in (0.5, 0.95, 0.99)))
+
+@benchmark
+def bench_tracing(calls=200000):
+    """Cost of a traced stage with tracing off and on"""
+    def stage():
+        pass
+    def traced(tracer):
+        with tracer.span("stage"):
+            stage()
+    start = time.perf_counter()
+    for _ in range(calls):
+        stage()
+    bare = (time.perf_counter() - start) / calls
+    tracer = app.Tracer()
+    start = time.perf_counter()
+    for _ in range(calls):
+        traced(tracer)
+    off = (time.perf_counter() - start) / calls
+    tracer.enable()
+    start = time.perf_counter()
+    for _ in range(calls):
+        traced(tracer)
+    on = (time.perf_counter() - start) / calls
+    with tempfile.TemporaryDirectory() as tmp:
+        tracer = app.Tracer()
+        tracer.enable(os.path.join(tmp, "trace.jsonl"))
+        start = time.perf_counter()
+        for _ in range(calls // 10):
+            traced(tracer)
+        exported = (time.perf_counter() - start) / (calls // 10)
+        tracer.export.close()
+    print(f"untraced:            {bare * 1e9:8.0f} ns/call")
+    print(f"tracing off:         {off * 1e9:8.0f} ns/call (+{(off - bare) * 1e9:.0f} ns)")
+    print(f"tracing on:          {on * 1e9:8.0f} ns/call")
+    print(f"tracing with export: {exported * 1e9:8.0f} ns/call")
+
+@benchmark
+def bench_speech_cache(phrases=10):
+    """Time to first audio for live synthesis versus cached clips"""
+    try:
+        engine = app.init_engine()
+    except Exception as e:
+        print(f"No TTS engine available: {e}")
+        return
+    player = app.ClipPlayer()
+    if not player.available:
+        print("No audio player found; install paplay, aplay or ffplay")
+        return
+    texts = app.static_phrases()[:phrases]
+    started = []
+    engine.connect('started-utterance', lambda name: started.append(time.perf_counter()))
+    live = []
+    for text in texts:
+        start = time.perf_counter()
+        engine.say(text)
+        engine.runAndWait()
+        live.append(started[-1] - start)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = app.SpeechCache(tmp)
+        voice = (engine.getProperty('voice'), engine.getProperty('rate'), engine.getProperty('volume'))
+        keys = [cache.key(text, *voice) for text in texts]
+        start = time.perf_counter()
+        for text, key in zip(texts, keys):
+            cache.render(engine, text, key)
+        render = (time.perf_counter() - start) / len(texts)
+        cached = []
+        for key in keys:
+            start = time.perf_counter()
+            player.start(cache.get(key))
+            cached.append(time.perf_counter() - start)
+            player.wait()
+    live.sort()
+    cached.sort()
+    print(f"render per phrase: {render * 1000:.0f} ms")
+    print(f"live   time to first audio: median {live[len(live) // 2] * 1000:7.1f} ms, max {live[-1] * 1000:7.1f} ms")
+    print(f"cached time to first audio: median {cached[len(cached) // 2] * 1000:7.1f} ms, max {cached[-1] * 1000:7.1f} ms")
+
+@benchmark
+def bench_meetings(events=100000, queries=10000):
+    """Day, next and overlap queries over a large calendar: sorted index versus a linear scan"""
+    rng = random.Random(7)
+    base = app.datetime.datetime(2024, 1, 1, 8, 0)
+    records = []
+    for i in range(events):
+        start = base + app.datetime.timedelta(minutes=15 * rng.randrange(events * 4))
+        end = start + app.datetime.timedelta(minutes=rng.choice((15, 30, 60, 90)))
+        records.append({"title": f"meeting {i}", "time": start.strftime(app.MEETING_TIME_FORMAT),
+                        "end_time": end.strftime(app.MEETING_TIME_FORMAT), "created": "2024-01-01 08:00"})
+    start = time.perf_counter()
+    index = app.MeetingIndex(records)
+    print(f"{events} meetings, index built in {(time.perf_counter() - start) * 1000:.0f} ms")
+    span = index.starts[-1] - index.starts[0]
+    days = [index.starts[0] + span * rng.random() for _ in range(queries)]
+    day = app.datetime.timedelta(days=1)
+    hour = app.datetime.timedelta(hours=1)
+
+    def linear_day(moment):
+        return [r for r in records if moment <= app.datetime.datetime.fromisoformat(r["time"]) < moment + day]
+
+    for label, func, count in (("day (index)", lambda m: index.between(m, m + day), queries),
+                               ("next (index)", index.next_after, queries),
+                               ("overlap (index)", lambda m: index.overlapping(m, m + hour), queries),
+                               ("day (linear scan)", linear_day, 20)):
+        per_query = _time_per_call(func, days[:count], repeat=1)
+        print(f"{label:<18} {per_query * 1e6:10.1f} us/query")
+    start = time.perf_counter()
+    for moment in days[:1000]:
+        index.add({"title": "new", "time": moment.strftime(app.MEETING_TIME_FORMAT), "created": "2024-01-01 08:00"})
+    print(f"{'insert':<18} {(time.perf_counter() - start) / 1000 * 1e6:10.1f} us/meeting")
+    start = time.perf_counter()
+    for text in ["tomorrow at 3 pm for 30 minutes", "next friday at quarter past ten", "march fifth at noon"] * 1000:
+        app.parse_when(text)
+    print(f"{'parse_when':<18} {(time.perf_counter() - start) / 3000 * 1e6:10.1f} us/phrase")
+
+@benchmark
+def bench_wake():
+    """Wake-word gate false-accept and false-reject rates, and its CPU cost against real time"""
+    folders = {name: os.path.join(WAKE_FIXTURES, name) for name in ("templates", "positive", "negative")}
+    if not all(os.path.isdir(folder) for folder in folders.values()):
+        print(f"No wake-word fixtures in {WAKE_FIXTURES}; set VIRUS_WAKE_FIXTURES to a directory "
+              "with templates/, positive/ and negative/ folders of WAV files")
+        return
+    spotter = app.KeywordSpotter.from_directory(folders["templates"])
+    vad = app.EnergyVAD()
+    print(f"{len(spotter.templates)} templates, threshold {spotter.threshold:.2f}")
+    print(f"{'clips':>8} {'count':>6} {'passed':>7} {'rate':>7} {'audio s':>8} {'CPU ms/clip':>12} {'CPU %':>7}")
+    for name, label in (("positive", "false reject"), ("negative", "false accept")):
+        clips = [app.read_wav(os.path.join(folders[name], f)) for f in sorted(os.listdir(folders[name]))
+                 if f.endswith(".wav")]
+        if not clips:
+            continue
+        passed = 0
+        start = time.process_time()
+        for samples in clips:
+            span = vad.speech_span(samples)
+            if span is not None and spotter.spot(samples[span[0]:span[1]]) is not None:
+                passed += 1
+        cpu = time.process_time() - start
+        audio = sum(len(samples) for samples in clips) / app.WAKE_RATE
+        rate = (len(clips) - passed if name == "positive" else passed) / len(clips)
+        print(f"{name:>8} {len(clips):>6} {passed:>7} {rate:>7.1%} {audio:>8.1f} "
+              f"{cpu / len(clips) * 1000:>12.2f} {cpu / audio:>7.2%}  ({label})")
+    print("Negative clips never reach the full recognizer; each one is a recognition call avoided")
+
+@benchmark
+def bench_todos(sizes=(100, 10000, 100000)):
+    """To-do listing, "what next", lookup and reprioritize cost as the list grows: index versus a scan"""
+    rng = random.Random(7)
+    print(f"{'tasks':>8} {'build ms':>9} {'top 5 us':>9} {'next us':>8} {'by id us':>9} {'change us':>10} {'scan us':>9}")
+    for size in sizes:
+        records = [app.Todo.from_json({"id": i + 1, "task": f"task {i}", "created": "2024-01-01 09:00",
+                                       "completed": rng.random() < 0.3, "priority": rng.randrange(4),
+                                       "due": f"2024-{rng.randint(1, 12):02}-{rng.randint(1, 28):02} 09:00"
+                                       if rng.random() < 0.5 else None}) for i in range(size)]
+        start = time.perf_counter()
+        index = app.TodoIndex(records)
+        build = time.perf_counter() - start
+        ids = [rng.randint(1, size) for _ in range(1000)]
+        top = _time_per_call(lambda _: index.top(app.TODO_SUMMARY_SIZE), [None], repeat=1000)
+        best = _time_per_call(lambda _: index.top(1), [None], repeat=1000)
+        lookup = _time_per_call(index.get, ids, repeat=10)
+        change = _time_per_call(lambda i: index.get(i) and index.update(i, priority=rng.randrange(4)), ids, repeat=1)
+        # What listing cost before: filter every record, then order the open ones
+        scan = _time_per_call(lambda _: sorted((r for r in records if not r.completed),
+                                               key=app.TodoIndex._entry)[:app.TODO_SUMMARY_SIZE], [None], repeat=5)
+        print(f"{size:>8} {build * 1000:>9.1f} {top * 1e6:>9.1f} {best * 1e6:>8.1f} {lookup * 1e6:>9.2f} "
+              f"{change * 1e6:>10.1f} {scan * 1e6:>9.0f}")
+
+@benchmark
+def bench_launcher(app_dirs=4, desktop_entries=2000, launches=200):
+    """App index build and refresh time over thousands of entries, and command-to-spawn latency"""
+    rng = random.Random(7)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    with tempfile.TemporaryDirectory() as tmp:
+        dirs = []
+        for d in range(app_dirs):
+            applications = os.path.join(tmp, f"applications{d}")
+            os.makedirs(applications)
+            for i in range(desktop_entries):
+                words = " ".join("".join(rng.choice(letters) for _ in range(rng.randint(4, 9))).title()
+                                 for _ in range(rng.randint(1, 3)))
+                with open(os.path.join(applications, f"app{i}.desktop"), 'w') as f:
+                    f.write(f"[Desktop Entry]\nType=Application\nName={words}\nExec=/usr/bin/app{d}_{i} %U\n")
+            dirs.append(applications)
+        saved = os.path.join(tmp, "apps.json")
+
+        start = time.perf_counter()
+        index = app.AppIndex(saved)
+        index.refresh(dirs)
+        print(f"{len(index.apps)} apps in {len(dirs)} directories")
+        print(f"{'full scan':<22} {(time.perf_counter() - start) * 1000:9.1f} ms")
+        start = time.perf_counter()
+        index = app.AppIndex(saved)
+        index.refresh(dirs)
+        print(f"{'load saved index':<22} {(time.perf_counter() - start) * 1000:9.1f} ms")
+        print(f"{'refresh, no changes':<22} {_time_per_call(lambda _: index.refresh(dirs), [None], 20) * 1000:9.2f} ms")
+        start = time.perf_counter()
+        with open(os.path.join(applications, "new.desktop"), 'w') as f:
+            f.write("[Desktop Entry]\nType=Application\nName=Brand New Editor\nExec=/usr/bin/bne\n")
+        scanned = index.refresh(dirs)
+        print(f"{'refresh, one new app':<22} {(time.perf_counter() - start) * 1000:9.1f} ms ({scanned} directory rescanned)")
+        names = rng.sample(sorted(index.apps), 100)
+        misheard = [name[:-1] if len(name) > 4 else name for name in names]
+        found = sum((index.lookup(spoken) or (None,))[0] == name for spoken, name in zip(misheard, names))
+        print(f"{'fuzzy lookup':<22} {_time_per_call(index.lookup, misheard, 10) * 1e6:9.1f} us "
+              f"({found}/{len(names)} names with the last letter dropped)")
+
+        # Bare programs start only when named exactly, and never from sbin or the system commands
+        search_path = []
+        for directory, programs in (("bin", ["file", "gsettings", "shutdown", "gnome-terminal"]), ("sbin", ["reboot"])):
+            directory = os.path.join(tmp, directory)
+            os.makedirs(directory)
+            for program in programs:
+                with open(os.path.join(directory, program), 'w') as f:
+                    f.write("#!/bin/sh\n")
+                os.chmod(os.path.join(directory, program), 0o755)
+            search_path.append(directory)
+        search_path = os.pathsep.join(search_path)
+        for spoken in ("shut down", "shutdown", "reboot", "files", "settings"):
+            assert app.find_executable(spoken, search_path) is None, f"{spoken!r} started a program"
+        assert app.find_executable("gnome terminal", search_path)[1] == [os.path.join(tmp, "bin", "gnome-terminal")]
+        print(f"{'bare programs':<22} exact names only; shutdown, reboot, files and settings refused")
+
+    latencies = []
+    for _ in range(launches):
+        start = time.perf_counter()
+        app.launcher.launch(["sleep", "0.5"]).result()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    print(f"{'command to spawn':<22} p50 {_percentile(latencies, 0.5) * 1000:.2f} ms, "
+          f"p95 {_percentile(latencies, 0.95) * 1000:.2f} ms, max {latencies[-1] * 1000:.2f} ms")
+    start = time.perf_counter()
+    os.system("sleep 0.5")
+    print(f"{'os.system, same app':<22} {(time.perf_counter() - start) * 1000:9.1f} ms blocked until it exited")
+
+CHAINED_COMMANDS = [
+    "add buy milk to my todo list and set a timer for 5 minutes and remind me to call mom",
+    "remind me to water the plants and add pay rent to my to do list",
+    "add book flights to my todo list, add pack bags to my todo list and remind me to check in",
+    "what time is it and flip a coin and tell me a joke",
+]
+
+@benchmark
+def bench_chained(rounds=200):
+    """Chained commands as one utterance versus one turn per clause: turns, disk syncs and time per action"""
+    fsync = os.fsync
+    syncs = [0]
+
+    def counting_fsync(fd):
+        syncs[0] += 1
+        fsync(fd)
+
+    cwd = os.getcwd()
+    print(f"{'mode':>10} {'actions':>8} {'turns':>6} {'replies':>8} {'fsyncs':>7} {'fsyncs/action':>14} {'ms/action':>10}")
+    for mode in ("separate", "chained"):
+        with tempfile.TemporaryDirectory() as tmp, open(os.devnull, 'w') as devnull:
+            os.chdir(tmp)
+            app.use_text_input([])
+            app.speech.start()
+            app.os.fsync = counting_fsync
+            syncs[0] = 0
+            spoken = len(app.speech.engine.spoken)
+            turns = actions = 0
+            try:
+                with contextlib.redirect_stdout(devnull):
+                    start = time.perf_counter()
+                    for _ in range(rounds):
+                        for command in CHAINED_COMMANDS:
+                            clauses = app.split_clauses(command)
+                            actions += len(clauses)
+                            for turn in (clauses if mode == "separate" else [command]):
+                                turns += 1
+                                app.process_command(turn)
+                    elapsed = time.perf_counter() - start
+                    app.speech.wait_idle(timeout=10)
+            finally:
+                app.os.fsync = fsync
+                os.chdir(cwd)
+            replies = len(app.speech.engine.spoken) - spoken
+        print(f"{mode:>10} {actions:>8} {turns:>6} {replies:>8} {syncs[0]:>7} {syncs[0] / actions:>14.2f} "
+              f"{elapsed / actions * 1000:>10.3f}")
+
+    # A clause that depends on an earlier one has to see what it did
+    command = "set a timer for 1 minute and cancel the timer"
+    spoken = len(app.speech.engine.spoken)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        app.process_command(command)
+        app.speech.wait_idle(timeout=10)
+    replies = app.speech.engine.spoken[spoken:]
+    assert replies == ["1 minute timer set for 60 seconds. 1 minute timer cancelled."], f"{command!r} replied {replies}"
+    print(f"in order: {command!r}")
+
+def _reminder_footprint(layout, count):
+    """Build count reminders in a fresh process; returns RSS growth and filter timings"""
+    rng = random.Random(7)
+    base = int(app.datetime.datetime(2024, 1, 1).timestamp())
+    rss = app.psutil.Process().memory_info().rss
+    start = time.perf_counter()
+    if layout == "dicts":
+        data = [{"text": f"reminder {i}", "time": app.format_epoch(base + 60 * rng.randrange(525600)),
+                 "created": "2024-01-01 09:00", "completed": rng.random() < 0.3} for i in range(count)]
+    else:
+        created = base + 9 * 3600
+        data = app.RecordList(app.Reminder, (app.Reminder(text=f"reminder {i}", time=base + 60 * rng.randrange(525600),
+                                                          created=created, completed=rng.random() < 0.3)
+                                             for i in range(count)))
+    build = time.perf_counter() - start
+    gc.collect()
+    grown = app.psutil.Process().memory_info().rss - rss
+    cutoff = base + 60 * 525600 // 4
+    if layout == "dicts":
+        cutoff_text = app.format_epoch(cutoff)
+        filters = {"active only": lambda: [r for r in data if not r.get("completed", False)],
+                   "due before T": lambda: [r for r in data if not r.get("completed", False) and r["time"] < cutoff_text],
+                   "count active": lambda: sum(1 for r in data if not r.get("completed", False))}
+    else:
+        filters = {"active only": data.open_records,
+                   "due before T": lambda: data.due_before(cutoff),
+                   "count active": data.count_open}
+    timings = {}
+    for name, func in filters.items():
+        start = time.perf_counter()
+        for _ in range(3):
+            func()
+        timings[name] = (time.perf_counter() - start) / 3
+    return grown, build, timings
+
+@benchmark
+def bench_records(count=1000000):
+    """Memory and filter throughput of reminders as plain dicts versus slotted records with columns"""
+    results = {}
+    for layout in ("dicts", "records"):
+        # A fresh process each, so memory freed by one layout is not reused by the other
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1) as pool:
+            results[layout] = pool.submit(_reminder_footprint, layout, count).result()
+    print(f"{count} reminders ({'numpy' if app.np is not None else 'no numpy'} for time columns)")
+    print(f"{'layout':>8} {'RSS MB':>8} {'build s':>8} " + " ".join(f"{name + ' M/s':>17}" for name in results["dicts"][2]))
+    for layout, (grown, build, timings) in results.items():
+        print(f"{layout:>8} {grown / 2 ** 20:>8.0f} {build:>8.2f} "
+              + " ".join(f"{count / seconds / 1e6:>17.1f}" for seconds in timings.values()))
+
+# Takes about two seconds of CPU inline, twice the calculator's budget
+RUNAWAY_CALCULATION = "what is 9 power 3000000"
+SANDBOX_COMMANDS = ["what time is it", "calculate 25 times 4", "flip a coin", "what's the date"]
+
+class InlineCalculator:
+    """Stands in for app.calc_pool to evaluate on the calling thread, as calculate() used to"""
+
+    @staticmethod
+    def evaluate(normalized):
+        return app.compile_expression(normalized)()
+
+@benchmark
+def bench_sandbox(rounds=3):
+    """Other commands answered while a runaway calculation runs: inline eval versus calculator processes"""
+    # Also a check: fails unless the calculator processes refuse each runaway within
+    # CALC_TIMEOUT while other commands keep answering promptly
+    print(f"{'mode':>8} {'runaway s':>10} {'answered':>9} {'p50 ms':>8} {'max ms':>8}")
+    for mode in ("inline", "pool"):
+        pool = InlineCalculator() if mode == "inline" else app.CalcPool()
+        runaway, latencies = [], []
+        # None of these commands touch data files, and spawned workers start in this directory
+        with open(os.devnull, 'w') as devnull:
+            app.use_text_input([])
+            app.speech.start()
+            spoken = len(app.speech.engine.spoken)
+            calc_pool, app.calc_pool = app.calc_pool, pool
+            try:
+                if mode == "pool":
+                    pool.start()
+
+                def run_runaway():
+                    start = time.perf_counter()
+                    app.process_command(RUNAWAY_CALCULATION)
+                    runaway.append(time.perf_counter() - start)
+
+                with contextlib.redirect_stdout(devnull):
+                    for _ in range(rounds):
+                        if mode == "pool":
+                            # Wait for the worker killed last round to be replaced and finish importing
+                            while pool.idle.qsize() < pool.size:
+                                time.sleep(0.01)
+                            pool.memo.clear()
+                            for expression in ("1 + 1", "2 + 2"):
+                                pool.evaluate(expression)
+                            pool.memo.clear()
+                        thread = threading.Thread(target=run_runaway)
+                        # Latency counts from when a command was due, so a stalled interpreter shows up;
+                        # taken before start(), which itself can wait for the runaway to let go of the GIL
+                        due = time.perf_counter() + 0.05
+                        thread.start()
+                        commands = itertools.cycle(SANDBOX_COMMANDS)
+                        while True:
+                            time.sleep(max(0.0, due - time.perf_counter()))
+                            app.process_command(next(commands))
+                            latencies.append(time.perf_counter() - due)
+                            if not thread.is_alive():
+                                break
+                            due = time.perf_counter() + 0.01
+                        thread.join()
+                    app.speech.wait_idle(timeout=10)
+                refused = app.speech.engine.spoken[spoken:].count("Sorry, that calculation is too big for me")
+            finally:
+                app.calc_pool = calc_pool
+        latencies.sort()
+        print(f"{mode:>8} {sum(runaway) / rounds:>10.2f} {len(latencies):>9} "
+              f"{_percentile(latencies, 0.5) * 1000:>8.2f} {latencies[-1] * 1000:>8.2f}")
+    # The pool run is the last one measured
+    assert refused == rounds, f"{refused} of {rounds} runaway calculations were refused"
+    assert max(runaway) < app.CALC_TIMEOUT + 0.5, f"a runaway calculation took {max(runaway):.2f} s to be killed"
+    assert len(latencies) >= 10 * rounds, f"only {len(latencies)} commands answered during the runaway"
+    assert latencies[-1] < 0.25, f"a command waited {latencies[-1] * 1000:.0f} ms during the runaway"
+    print(f"ok: runaways refused within {app.CALC_TIMEOUT:.1f} s while other commands kept answering")
+    pool = app.CalcPool()
+    pool.evaluate("1 + 1")
+    fresh = _time_per_call(lambda e: (pool.memo.clear(), pool.evaluate(e)),
+                           [app.normalize_expression(e) for e in SPOKEN_CALCULATIONS], repeat=20)
+    memo = _time_per_call(pool.evaluate, [app.normalize_expression(e) for e in SPOKEN_CALCULATIONS])
+    print(f"worker round trip:   {fresh * 1e6:8.2f} us/expression")
+    print(f"memo hit:            {memo * 1e6:8.2f} us/expression")
+
+    # A worker that dies for its own reasons is replaced and the expression retried, a pool that
+    # cannot start workers refuses rather than evaluating inline, and neither failure is memoized
+    while pool.idle.qsize() < pool.size:
+        time.sleep(0.01)
+    pool.memo.clear()
+    pool.idle.queue[0][0].kill()
+    assert pool.evaluate("6 * 7") == 42, "a calculation failed after its worker died"
+    broken = app.CalcPool(size=1)
+    broken._spawn = lambda: 1 / 0
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        try:
+            broken.evaluate("2 + 2")
+            raise AssertionError("a pool without workers answered")
+        except RuntimeError:
+            pass
+    assert not broken.memo, "a worker failure was memoized"
+    print("ok: dead workers retried, no inline fallback, failures not memoized")
+
+def main(argv):
+    names = argv or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark: {name}. Available: {', '.join(BENCHMARKS)}")
+            return 1
+        print(f"\n== {name}: {BENCHMARKS[name].__doc__} ==")
+        BENCHMARKS[name]()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,90 @@
+"""Load test for the assistant's server mode.
+
+Starts a server in a scratch directory, or targets a running one with
+--address, and drives it with concurrent clients. Each client works as its
+own user and replays the benchmark command corpus, answering follow-up
+questions. Reports turns per second and latency percentiles.
+
+    python loadtest.py --clients 1 10 50 --turns 200
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+import app
+from benchmark import COMMAND_CORPUS, REPLAY_ANSWERS, REPLAY_SKIP
+
+async def open_connection(address):
+    if isinstance(address, str):
+        return await asyncio.open_unix_connection(address)
+    return await asyncio.open_connection(*address)
+
+async def run_client(address, user, commands, latencies):
+    reader, writer = await open_connection(address)
+    writer.write(f"user {user}\n".encode())
+    await writer.drain()
+    await reader.readline()
+    for command in commands:
+        answers = list(REPLAY_ANSWERS.get(command, []))
+        start = time.perf_counter()
+        writer.write((command + "\n").encode())
+        await writer.drain()
+        while True:
+            message = json.loads(await reader.readline())
+            if message["type"] == "listen":
+                writer.write(((answers.pop(0) if answers else "") + "\n").encode())
+                await writer.drain()
+            elif message["type"] == "done":
+                break
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+async def run_load(address, clients, turns):
+    corpus = [c for c in COMMAND_CORPUS if c not in REPLAY_SKIP]
+    rng = random.Random(clients)
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(address, f"load{i}", rng.choices(corpus, k=turns), latencies)
+                           for i in range(clients)))
+    return time.perf_counter() - start, sorted(latencies)
+
+def start_server(workers):
+    server = app.AssistantServer(workers)
+    threading.Thread(target=asyncio.run, args=(server.serve("127.0.0.1:0"),), daemon=True).start()
+    server.ready.wait()
+    return server.address
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--turns", type=int, default=100, help="commands per client")
+    parser.add_argument("--workers", type=int, default=app.SERVER_WORKERS)
+    parser.add_argument("--address", help="host:port or Unix socket path of a running server")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.address:
+            host, _, port = args.address.rpartition(":")
+            address = (host or "127.0.0.1", int(port)) if port.isdigit() else args.address
+        else:
+            os.chdir(tmp)
+            app.speech.engine = app.RecordingEngine()
+            app.speech.cache = None
+            address = start_server(args.workers)
+        print(f"{'clients':>8} {'turns':>7} {'turns/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for clients in args.clients:
+            # Handlers also print to the console; keep that out of the results
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                elapsed, latencies = asyncio.run(run_load(address, clients, args.turns))
+            p = lambda fraction: latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000
+            print(f"{clients:>8} {len(latencies):>7} {len(latencies) / elapsed:>9.0f} "
+                  f"{p(0.5):>8.2f} {p(0.95):>8.2f} {p(0.99):>8.2f} {latencies[-1] * 1000:>8.2f}")
+
+if __name__ == '__main__':
+    main()